@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+依伺服器回應自動調整的爬取控制器
+以 AIMD（加法增加、乘法減少）調整每個主機的同時請求數與請求速率：回應快且為 200 時逐步放寬，
+遇到 429/503、連線錯誤或延遲明顯上升時立即減半，並以加入隨機抖動的指數退避重試
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+from circuit_breaker import STATE_CLOSED, BreakerRegistry, backoff_delay, get_shared_breakers
+from crawl_governor import HostRateGovernor, get_shared_governor
+
+logger = logging.getLogger(__name__)
+
+# 伺服器要求放慢速度的狀態碼
+THROTTLE_STATUSES = {429, 503}
+# 值得重試的狀態碼
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+DEFAULT_MAX_RETRIES = 3
+# 等待名額時的檢查間隔（秒）
+POLL_INTERVAL = 0.05
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 標頭（秒數或 HTTP 日期）"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RequestTicket:
+    """一次請求的名額，呼叫端在回應後填入 status 與 retry_after"""
+
+    def __init__(self, url: str, host: str):
+        self.url = url
+        self.host = host
+        self.status: Optional[int] = None
+        self.retry_after: Optional[float] = None
+        self.cancelled = False
+        self.started = time.monotonic()
+
+
+class AdaptiveCrawlController:
+    def __init__(self, governor: Optional[HostRateGovernor] = None, initial_limit: float = 1,
+                 min_limit: float = 1, max_limit: float = 4, rate_per_slot: Optional[float] = None,
+                 increase_step: float = 1.0, decrease_factor: float = 0.5, latency_tolerance: float = 2.0,
+                 backoff_base: float = 1.0, backoff_cap: float = 60.0, max_retries: int = DEFAULT_MAX_RETRIES,
+                 breakers: Optional[BreakerRegistry] = None):
+        """
+        初始化自適應爬取控制器
+
+        Args:
+            governor: 主機速率控制器，速率會隨同時請求數調整；未提供時只控制同時請求數
+            initial_limit: 每個主機起始的同時請求數
+            min_limit: 同時請求數下限
+            max_limit: 同時請求數上限
+            rate_per_slot: 每個同時請求名額對應的每秒請求數，預設為 governor 目前速率除以 initial_limit
+            increase_step: 每完成一輪（limit 個）健康回應增加的名額
+            decrease_factor: 遇到限流或延遲上升時名額乘上的比例
+            latency_tolerance: 平均延遲超過基準延遲幾倍時視為伺服器壅塞
+            backoff_base: 退避的基準秒數
+            backoff_cap: 退避的上限秒數
+            max_retries: 建議的最多重試次數
+            breakers: 斷路器集合，主機斷路器開啟時直接拒絕請求；未提供時使用共用的斷路器
+        """
+        self.governor = governor
+        self.initial_limit = initial_limit
+        self.min_limit = min_limit
+        self.max_limit = max(max_limit, min_limit)
+        if rate_per_slot is None and governor is not None:
+            rate_per_slot = governor.rate_per_second / max(initial_limit, 1e-9)
+        self.rate_per_slot = rate_per_slot
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.max_retries = max_retries
+        self.breakers = breakers or get_shared_breakers()
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, Dict] = {}
+
+    def _state(self, host: str) -> Dict:
+        """取得主機狀態，不存在時建立（呼叫前需持有鎖）"""
+        state = self._hosts.get(host)
+        if state is None:
+            state = {
+                'limit': float(min(max(self.initial_limit, self.min_limit), self.max_limit)),
+                'in_flight': 0,
+                'latency_avg': None,
+                'latency_base': None,
+                'samples': 0,
+                'cooldown_until': 0.0,
+                'last_decrease': 0.0,
+                'failures': 0,
+                'requests': 0,
+                'throttled': 0,
+                'errors': 0,
+                'increases': 0,
+                'decreases': 0
+            }
+            self._hosts[host] = state
+        return state
+
+    def _try_enter(self, host: str) -> float:
+        """嘗試取得名額，成功回傳 0，否則回傳建議等待秒數"""
+        now = time.monotonic()
+        with self._lock:
+            is_new = host not in self._hosts
+            state = self._state(host)
+            limit = state['limit']
+        # 新主機以起始名額對應的速率開始
+        if is_new:
+            self._apply_rate(host, limit)
+
+        with self._lock:
+            if now < state['cooldown_until']:
+                return state['cooldown_until'] - now
+            if state['in_flight'] >= max(int(state['limit']), 1):
+                return POLL_INTERVAL
+            state['in_flight'] += 1
+            state['requests'] += 1
+            return 0.0
+
+    def _apply_rate(self, host: str, limit: float):
+        if self.governor is not None and self.rate_per_slot:
+            self.governor.set_rate(host, limit * self.rate_per_slot)
+
+    def _decrease(self, state: Dict, now: float) -> bool:
+        """乘法減少（呼叫前需持有鎖），同一輪回應中只減少一次"""
+        interval = max(state['latency_avg'] or 0.0, 1.0)
+        if now - state['last_decrease'] < interval:
+            return False
+        state['limit'] = max(self.min_limit, state['limit'] * self.decrease_factor)
+        state['last_decrease'] = now
+        state['decreases'] += 1
+        return True
+
+    def _release(self, ticket: RequestTicket):
+        """歸還名額並依回應調整"""
+        now = time.monotonic()
+        latency = now - ticket.started
+        status = ticket.status
+        changed = False
+
+        with self._lock:
+            state = self._state(ticket.host)
+            state['in_flight'] = max(0, state['in_flight'] - 1)
+
+            if ticket.cancelled:
+                # 呼叫端取消，不代表伺服器狀況
+                pass
+            elif status is None or status in THROTTLE_STATUSES or status >= 500:
+                # 限流或錯誤：減半並暫停這個主機一段時間
+                if status in THROTTLE_STATUSES:
+                    state['throttled'] += 1
+                else:
+                    state['errors'] += 1
+                delay = ticket.retry_after
+                if delay is None:
+                    delay = backoff_delay(state['failures'], self.backoff_base, self.backoff_cap)
+                state['failures'] += 1
+                state['cooldown_until'] = max(state['cooldown_until'], now + delay)
+                changed = self._decrease(state, now)
+            elif 200 <= status < 400:
+                state['failures'] = 0
+                state['samples'] += 1
+                average = state['latency_avg']
+                state['latency_avg'] = latency if average is None else average * 0.8 + latency * 0.2
+                base = state['latency_base']
+                # 基準延遲立即跟隨下降，緩慢跟隨上升
+                state['latency_base'] = latency if base is None or latency < base else base + (latency - base) * 0.01
+
+                congested = (state['samples'] >= 5 and
+                             state['latency_avg'] > state['latency_base'] * self.latency_tolerance)
+                if congested:
+                    changed = self._decrease(state, now)
+                elif state['limit'] < self.max_limit:
+                    # 每個回應增加 step / limit，完成一輪約增加 step 個名額
+                    state['limit'] = min(self.max_limit, state['limit'] + self.increase_step / state['limit'])
+                    state['increases'] += 1
+                    changed = True
+            limit = state['limit']
+
+        if not ticket.cancelled:
+            breaker = self.breakers.host(ticket.url)
+            if status is None or status in THROTTLE_STATUSES or status >= 500:
+                breaker.record_failure(f"HTTP {status}" if status else "連線錯誤或逾時", source=ticket.url)
+            else:
+                breaker.record_success()
+
+        if changed:
+            self._apply_rate(ticket.host, limit)
+            if status is not None and (status in THROTTLE_STATUSES or status >= 500):
+                logger.warning(f"🐢 {ticket.host} 回應 {status}，同時請求數降為 {limit:.1f}")
+
+    @asynccontextmanager
+    async def slot(self, url: str):
+        """
+        取得一個請求名額（asyncio 版本），並等待速率控制器
+
+        用法:
+            async with controller.slot(url) as ticket:
+                response = ...
+                ticket.status = response.status
+        """
+        host = urlparse(url).netloc or url
+        # 主機斷路器開啟時立即放棄，不等待逾時
+        self.breakers.host(url).check()
+        while True:
+            wait = self._try_enter(host)
+            if not wait:
+                break
+            await asyncio.sleep(min(wait, 1.0))
+
+        ticket = RequestTicket(url, host)
+        try:
+            if self.governor is not None:
+                await self.governor.acquire(url)
+            ticket.started = time.monotonic()
+            yield ticket
+        except asyncio.CancelledError:
+            ticket.cancelled = True
+            raise
+        finally:
+            self._release(ticket)
+
+    @contextmanager
+    def slot_sync(self, url: str):
+        """取得一個請求名額（同步版本）"""
+        host = urlparse(url).netloc or url
+        self.breakers.host(url).check()
+        while True:
+            wait = self._try_enter(host)
+            if not wait:
+                break
+            time.sleep(min(wait, 1.0))
+
+        ticket = RequestTicket(url, host)
+        try:
+            if self.governor is not None:
+                self.governor.acquire_sync(url)
+            ticket.started = time.monotonic()
+            yield ticket
+        finally:
+            self._release(ticket)
+
+    def should_retry(self, status: Optional[int], attempt: int, url: Optional[str] = None) -> bool:
+        """是否應該重試（status 為 None 代表連線錯誤或逾時），主機斷路器已開啟時不再重試"""
+        if url is not None and self.breakers.host(url).state != STATE_CLOSED:
+            return False
+        return attempt < self.max_retries and (status is None or status in RETRYABLE_STATUSES)
+
+    def retry_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """重試前的等待秒數，伺服器有提供 Retry-After 時優先使用"""
+        if retry_after is not None:
+            return min(retry_after, self.backoff_cap)
+        return backoff_delay(attempt, self.backoff_base, self.backoff_cap)
+
+    def get_limit(self, url: str) -> float:
+        """取得主機目前的同時請求數上限"""
+        host = urlparse(url).netloc or url
+        with self._lock:
+            return self._state(host)['limit']
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """取得各主機的調整統計"""
+        with self._lock:
+            return {
+                host: {
+                    'limit': round(state['limit'], 2),
+                    'rate_per_second': round(state['limit'] * self.rate_per_slot, 3) if self.rate_per_slot else None,
+                    'requests': state['requests'],
+                    'throttled': state['throttled'],
+                    'errors': state['errors'],
+                    'increases': state['increases'],
+                    'decreases': state['decreases'],
+                    'latency_avg': round(state['latency_avg'], 3) if state['latency_avg'] is not None else None,
+                    'latency_base': round(state['latency_base'], 3) if state['latency_base'] is not None else None
+                }
+                for host, state in self._hosts.items()
+            }
+
+    def log_stats(self):
+        """輸出各主機的調整統計"""
+        for host, stats in self.get_stats().items():
+            rate = f"，{stats['rate_per_second']} 個請求/秒" if stats['rate_per_second'] is not None else ""
+            logger.info(f"📈 {host}: 同時請求數 {stats['limit']}{rate}，限流 {stats['throttled']} 次，"
+                        f"錯誤 {stats['errors']} 次，平均延遲 {stats['latency_avg']}s")
+
+
+async def goto_with_backoff(controller: AdaptiveCrawlController, page, url: str,
+                            wait_until: str = 'load', timeout: int = 30000):
+    """
+    以 Playwright 開啟頁面，依回應狀態調整速度，遇到限流或逾時以指數退避重試
+
+    Returns:
+        最後一次的 Playwright Response
+    """
+    attempt = 0
+    while True:
+        response = None
+        error = None
+        async with controller.slot(url) as ticket:
+            try:
+                response = await page.goto(url, wait_until=wait_until, timeout=timeout)
+                if response is not None:
+                    ticket.status = response.status
+                    ticket.retry_after = parse_retry_after(response.headers.get('retry-after'))
+                else:
+                    ticket.status = 200
+            except Exception as e:
+                error = e
+
+        if not controller.should_retry(ticket.status, attempt, url):
+            if error is not None:
+                raise error
+            return response
+
+        delay = controller.retry_delay(attempt, ticket.retry_after)
+        logger.info(f"🔁 {url} 回應 {ticket.status or error}，{delay:.1f} 秒後重試 ({attempt + 1}/{controller.max_retries})")
+        await asyncio.sleep(delay)
+        attempt += 1
+
+
+_shared_controller = None
+
+
+def resolve_controller(controller: Optional[AdaptiveCrawlController] = None,
+                       governor: Optional[HostRateGovernor] = None) -> AdaptiveCrawlController:
+    """爬蟲建構子共用：優先使用傳入的控制器，其次以傳入的速率控制器建立，否則使用共用控制器"""
+    if controller is not None:
+        return controller
+    if governor is not None:
+        return AdaptiveCrawlController(governor=governor)
+    return get_shared_controller()
+
+
+def get_shared_controller() -> AdaptiveCrawlController:
+    """取得所有爬蟲共用的自適應控制器，搭配共用的速率控制器"""
+    global _shared_controller
+    if _shared_controller is None:
+        _shared_controller = AdaptiveCrawlController(governor=get_shared_governor())
+    return _shared_controller
@@ -9,16 +9,38 @@ import asyncio
 import json
 import re
 from datetime import datetime
-from playwright.async_api import async_playwright
 import logging
 import random
+from typing import Optional
+from browser_pool import BrowserPool
+from adaptive_controller import AdaptiveCrawlController, goto_with_backoff, resolve_controller
+from circuit_breaker import CircuitOpenError, RetryPolicy
+from crawl_governor import HostRateGovernor
+from request_blocking import ResourceBlocker
+from dom_batch_extractor import extract_listing_tiles
 
 # 設定日誌
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 class AppleRefurbishedScraperWithHeaders:
-    def __init__(self):
+    def __init__(self, browser_pool: Optional[BrowserPool] = None,
+                 governor: Optional[HostRateGovernor] = None,
+                 resource_blocker: Optional[ResourceBlocker] = None,
+                 controller: Optional[AdaptiveCrawlController] = None):
+        # 共用瀏覽器池，未提供時於每次爬取時自行建立
+        self.browser_pool = browser_pool
+        
+        # 對 apple.com 的請求頻率由所有爬蟲共用的自適應控制器依伺服器回應調整
+        self.controller = resolve_controller(controller, governor)
+        self.governor = self.controller.governor
+        
+        # 類別頁面失敗時重試，持續失敗的類別由斷路器直接略過
+        self.retry_policy = RetryPolicy(breakers=self.controller.breakers)
+        
+        # 中止不需要解析的圖片、字型、影片與追蹤請求
+        self.resource_blocker = resource_blocker or ResourceBlocker()
+
         # 完整的 Headers 模擬真實瀏覽器
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -63,6 +85,9 @@ class AppleRefurbishedScraperWithHeaders:
         # 設定地理位置為台灣
         await context.set_geolocation({'latitude': 25.0330, 'longitude': 121.5654})
         
+        # 套用請求攔截規則
+        await self.resource_blocker.attach(context)
+        
         return context
 
     async def human_like_delay(self, min_seconds=1, max_seconds=3):
@@ -74,99 +99,115 @@ class AppleRefurbishedScraperWithHeaders:
         """使用完整 Headers 爬取指定 URL"""
         logger.info(f"開始爬取 {category_name}: {url}")
         
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(
-                headless=False,
-                args=[
-                    '--no-sandbox',
-                    '--disable-blink-features=AutomationControlled',
-                    '--disable-web-security',
-                    '--disable-features=VizDisplayCompositor',
-                    '--disable-dev-shm-usage'
-                ]
-            )
+        async def scrape_once():
+            if self.browser_pool:
+                return await self._scrape_in_pool(self.browser_pool, url, category_name)
             
-            context = await self.setup_browser_context(browser)
-            page = await context.new_page()
+            async with BrowserPool() as pool:
+                return await self._scrape_in_pool(pool, url, category_name)
+        
+        try:
+            return await self.retry_policy.run(scrape_once, category=category_name)
+        except CircuitOpenError as e:
+            logger.warning(f"⛔ 略過 {category_name}: {e}")
+            return False
+        except Exception as e:
+            logger.error(f"爬取 {category_name} 時發生錯誤: {e}")
+            return False
+
+    async def _scrape_in_pool(self, pool: BrowserPool, url, category_name):
+        """從瀏覽器池借出分頁並爬取頁面，失敗時拋出例外交由重試策略處理"""
+        async with pool.page(self.setup_browser_context, profile='headers') as page:
+            # 訪問頁面（由自適應控制器決定何時可以發出請求，限流時自動退避）
+            logger.info(f"訪問 {url}")
+            await goto_with_backoff(self.controller, page, url,
+                                    wait_until=self.resource_blocker.wait_until, timeout=60000)
+        
+            # 模擬滾動
+            await page.evaluate('window.scrollTo(0, document.body.scrollHeight/2)')
+            await self.human_like_delay(1, 2)
+            await page.evaluate('window.scrollTo(0, 0)')
+            await self.human_like_delay(1, 2)
+        
+            # 取得頁面標題
+            title = await page.title()
+            logger.info(f"頁面標題: {title}")
+        
+            # 取得頁面內容
+            content = await page.content()
+        
+            # 檢查是否有產品
+            if '整修品' in content or 'refurbished' in content.lower():
+                logger.info(f"✅ {category_name} 頁面載入成功，包含整修品資訊")
             
-            try:
-                # 訪問頁面
-                logger.info(f"訪問 {url}")
-                await page.goto(url, wait_until='networkidle', timeout=60000)
-                
-                # 模擬人類行為
-                await self.human_like_delay(2, 4)
-                
-                # 模擬滾動
-                await page.evaluate('window.scrollTo(0, document.body.scrollHeight/2)')
-                await self.human_like_delay(1, 2)
-                await page.evaluate('window.scrollTo(0, 0)')
-                await self.human_like_delay(1, 2)
-                
-                # 取得頁面標題
-                title = await page.title()
-                logger.info(f"頁面標題: {title}")
-                
-                # 取得頁面內容
-                content = await page.content()
-                
-                # 檢查是否有產品
-                if '整修品' in content or 'refurbished' in content.lower():
-                    logger.info(f"✅ {category_name} 頁面載入成功，包含整修品資訊")
-                    
-                    # 嘗試找到產品元素
-                    selectors = [
-                        'div[data-testid="product-tile"]',
-                        '.rf-serp-productcard',
-                        'a[href*="/product/"]'
-                    ]
-                    
-                    for selector in selectors:
-                        elements = await page.query_selector_all(selector)
-                        if elements:
-                            logger.info(f"找到 {len(elements)} 個產品元素 (選擇器: {selector})")
-                            break
-                    
-                    # 檢查是否有特定產品
-                    if category_name == 'homepod':
-                        if 'HomePod (第 2 代)' in content:
-                            logger.info("✅ 確認找到 HomePod (第 2 代) 產品")
-                    elif category_name == 'accessories':
-                        if 'AirPods' in content and 'HomePod' in content:
-                            logger.info("✅ 確認找到 AirPods 和 HomePod 配件")
-                    
-                else:
-                    logger.warning(f"⚠️ {category_name} 頁面可能沒有整修品或載入失敗")
-                
-                return True
-                
-            except Exception as e:
-                logger.error(f"爬取 {category_name} 時發生錯誤: {e}")
-                return False
-            finally:
-                await page.close()
-                await context.close()
-                await browser.close()
+                # 在瀏覽器內一次取得所有產品卡片
+                listing = await extract_listing_tiles(page)
+                if listing['tiles']:
+                    logger.info(f"找到 {len(listing['tiles'])} 個產品元素 (選擇器: {listing['selector']})")
+            
+                # 檢查是否有特定產品
+                if category_name == 'homepod':
+                    if 'HomePod (第 2 代)' in content:
+                        logger.info("✅ 確認找到 HomePod (第 2 代) 產品")
+                elif category_name == 'accessories':
+                    if 'AirPods' in content and 'HomePod' in content:
+                        logger.info("✅ 確認找到 AirPods 和 HomePod 配件")
+            
+            else:
+                logger.warning(f"⚠️ {category_name} 頁面可能沒有整修品或載入失敗")
+        
+            return True
 
-    async def test_all_categories(self):
-        """測試所有類別的爬取"""
+    async def test_all_categories(self, concurrency: int = 1):
+        """
+        測試所有類別的爬取
+        
+        Args:
+            concurrency: 同時爬取的類別數量，請求頻率由共用的主機速率控制器限制
+        """
         logger.info("🚀 開始測試所有類別的爬取...")
         logger.info(f"📅 測試時間: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         logger.info(f"🌐 使用者代理: {self.headers['User-Agent']}")
+        logger.info(f"🔀 同時爬取類別數: {concurrency}")
         
-        results = {}
+        self.resource_blocker.reset()
         
-        for category_name, url in self.categories.items():
-            logger.info(f"\n{'='*50}")
-            logger.info(f"測試 {category_name}")
-            logger.info(f"{'='*50}")
-            
-            success = await self.scrape_with_headers(url, category_name)
-            results[category_name] = success
-            
-            # 休息一下避免被封鎖
-            await self.human_like_delay(3, 6)
+        # 整輪測試共用同一個瀏覽器，避免每個類別都冷啟動 Chromium
+        owns_pool = self.browser_pool is None
+        if owns_pool:
+            self.browser_pool = BrowserPool(max_contexts=max(concurrency, 1))
         
+        semaphore = asyncio.Semaphore(max(concurrency, 1))
+        
+        async def run_category(category_name, url):
+            async with semaphore:
+                logger.info(f"\n{'='*50}")
+                logger.info(f"測試 {category_name}")
+                logger.info(f"{'='*50}")
+                
+                success = await self.scrape_with_headers(url, category_name)
+                return category_name, success
+        
+        try:
+            outcomes = await asyncio.gather(*[
+                run_category(category_name, url)
+                for category_name, url in self.categories.items()
+            ])
+        finally:
+            if owns_pool:
+                await self.browser_pool.close()
+                self.browser_pool = None
+        
+        results = dict(outcomes)
+        
+        governor_stats = self.governor.get_stats()
+        for host, stats in governor_stats.items():
+            logger.info(f"⏱️ {host}: {stats['requests']} 個請求，速率控制等待 {stats['waited_seconds']} 秒")
+        self.controller.log_stats()
+        self.controller.breakers.log_report()
+        
+        self.resource_blocker.log_report()
+
         # 顯示結果
         print("\n" + "="*60)
         print("📊 Headers 測試結果")
@@ -186,7 +227,7 @@ class AppleRefurbishedScraperWithHeaders:
 
 async def main():
     scraper = AppleRefurbishedScraperWithHeaders()
-    await scraper.test_all_categories()
+    await scraper.test_all_categories(concurrency=3)
 
 if __name__ == "__main__":
     asyncio.run(main()) 
\ No newline at end of file
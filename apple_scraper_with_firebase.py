@@ -5,11 +5,12 @@ Apple 整修品爬蟲 + Firebase 備份整合系統
 """
 
 import asyncio
-import json
 import os
 from datetime import datetime
 from apple_scraper import AppleRefurbishedScraper
 from firebase_backup import FirebaseBackup
+from listing_fingerprint import ListingFingerprintStore, listing_fingerprint
+from result_writer import write_json_atomic, write_json_records
 
 class AppleScraperWithFirebase:
     def __init__(self, firebase_service_account: str = None):
@@ -21,6 +22,7 @@ class AppleScraperWithFirebase:
         """
         self.scraper = AppleRefurbishedScraper()
         self.firebase_backup = FirebaseBackup(firebase_service_account) if firebase_service_account else None
+        self.fingerprints = ListingFingerprintStore()
         
     async def scrape_and_backup(self, backup_to_firebase: bool = True):
         """
@@ -79,10 +81,18 @@ class AppleScraperWithFirebase:
             for category, file_path in categories.items():
                 category_data = products.get(category, [])
                 
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    json.dump(category_data, f, ensure_ascii=False, indent=2)
+                # 產品與價格和上次寫入時相同就不重寫檔案
+                fingerprint = listing_fingerprint(category_data)
+                if category_data and os.path.exists(file_path) and self.fingerprints.unchanged(category, fingerprint):
+                    print(f"⏭️ {category}: 列表與上次相同，略過寫入")
+                    total_saved += len(category_data)
+                    continue
+                
+                # 逐筆寫出後原子替換，查詢系統不會讀到寫到一半的檔案
+                write_json_records(file_path, category_data)
                 
                 if category_data:
+                    self.fingerprints.record(category, fingerprint, len(category_data))
                     print(f"💾 {category}: {len(category_data)} 個產品已儲存到 {file_path}")
                     total_saved += len(category_data)
                 else:
@@ -102,8 +112,7 @@ class AppleScraperWithFirebase:
                     "檔案路徑": file_path
                 }
             
-            with open('data/apple_refurbished_summary.json', 'w', encoding='utf-8') as f:
-                json.dump(summary, f, ensure_ascii=False, indent=2)
+            write_json_atomic('data/apple_refurbished_summary.json', summary)
             
             print(f"📊 總結檔案已更新 - 總計 {total_saved} 個產品")
             
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+非同步 HTTP 抓取引擎
+以 aiohttp 共用連線池（keep-alive）同時抓取多個頁面，取代每次請求都重新建立 TCP/TLS 連線的 requests.get，
+並記錄每個請求的延遲統計
+"""
+
+import asyncio
+import logging
+import time
+from functools import partial
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+
+from adaptive_controller import AdaptiveCrawlController, RequestTicket, parse_retry_after
+from crawl_governor import HostRateGovernor
+from page_cache import PageCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_TIMEOUT = 30
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
+    'Accept-Language': 'zh-TW,zh;q=0.9,en-US;q=0.8,en;q=0.7',
+    'Accept-Encoding': 'gzip, deflate',
+    'DNT': '1',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1'
+}
+
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    """取得已排序數列的百分位數"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(percent / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class AsyncFetcher:
+    def __init__(self, headers: Optional[Dict] = None, concurrency: int = DEFAULT_CONCURRENCY,
+                 governor: Optional[HostRateGovernor] = None, timeout: int = DEFAULT_TIMEOUT,
+                 page_cache: Optional[PageCache] = None, offline: bool = False,
+                 controller: Optional[AdaptiveCrawlController] = None):
+        """
+        初始化非同步抓取引擎
+
+        Args:
+            headers: HTTP 請求標頭
+            concurrency: 同時進行的請求數，同時也是連線池大小
+            governor: 主機速率控制器，未提供時只以 concurrency 限制
+            timeout: 單一請求逾時秒數
+            page_cache: 頁面快取，提供時以 ETag / Last-Modified 發出條件式請求
+            offline: 只從頁面快取讀取，不發出任何網路請求
+            controller: 自適應控制器，依回應調整同時請求數並以指數退避重試；
+                        未提供時以 concurrency 為上限建立，遇到限流才會降速
+        """
+        self.headers = dict(headers or DEFAULT_HEADERS)
+        # aiohttp 需要額外安裝 brotli 才能解碼 br
+        self.headers['Accept-Encoding'] = 'gzip, deflate'
+        self.concurrency = max(concurrency, 1)
+        self.controller = controller or AdaptiveCrawlController(
+            governor=governor, initial_limit=self.concurrency, max_limit=self.concurrency
+        )
+        self.governor = self.controller.governor
+        self.timeout = timeout
+        self.page_cache = page_cache
+        self.offline = offline
+        if offline and page_cache is None:
+            raise ValueError("離線模式需要提供頁面快取")
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        """重設延遲統計"""
+        self.latencies: List[float] = []
+        self.stats = {
+            'requests': 0,
+            'errors': 0,
+            'bytes': 0,
+            'not_modified': 0,
+            'offline_hits': 0,
+            'retries': 0,
+            'status_codes': {}
+        }
+
+    async def start(self):
+        """建立共用連線池"""
+        if self.session is not None or self.offline:
+            return
+
+        connector = aiohttp.TCPConnector(
+            limit=self.concurrency,
+            limit_per_host=self.concurrency,
+            ttl_dns_cache=300,
+            keepalive_timeout=60
+        )
+        self.session = aiohttp.ClientSession(
+            headers=self.headers,
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout)
+        )
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+
+    async def close(self):
+        """關閉連線池並寫入快取索引"""
+        if self.page_cache:
+            self.page_cache.save()
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def fetch(self, url: str) -> str:
+        """
+        抓取單一頁面，遇到 429/5xx 或連線錯誤時以指數退避重試
+
+        Returns:
+            頁面 HTML，HTTP 錯誤時拋出 aiohttp.ClientResponseError，離線模式下沒有快取時拋出 LookupError
+        """
+        if self.offline:
+            html = self.page_cache.get_text(url)
+            if html is None:
+                raise LookupError(f"離線模式下沒有快取: {url}")
+            self.stats['offline_hits'] += 1
+            return html
+
+        html = await self._with_retries(url, self._fetch_once)
+        if html is None:
+            # 伺服器回傳 304 但快取內容已不存在（例如其他行程清理了快取），
+            # 先釋放原本的名額，再不帶條件標頭重新排隊請求一次
+            html = await self._with_retries(url, partial(self._fetch_once, revalidate=False))
+        return html
+
+    async def fetch_bytes(self, url: str) -> bytes:
+        """
+        抓取原始內容（例如產品圖片），不經過頁面快取，重試規則與 fetch 相同
+
+        Returns:
+            回應內容，HTTP 錯誤時拋出 aiohttp.ClientResponseError，離線模式下拋出 LookupError
+        """
+        if self.offline:
+            raise LookupError(f"離線模式下無法抓取: {url}")
+        return await self._with_retries(url, self._fetch_bytes_once)
+
+    async def _with_retries(self, url: str, fetch_once):
+        """取得請求名額後呼叫 fetch_once(url, ticket)，遇到 429/5xx 或連線錯誤時以指數退避重試"""
+        await self.start()
+
+        attempt = 0
+        while True:
+            async with self._semaphore:
+                async with self.controller.slot(url) as ticket:
+                    try:
+                        return await fetch_once(url, ticket)
+                    except (aiohttp.ClientError, asyncio.TimeoutError):
+                        if not self.controller.should_retry(ticket.status, attempt, url):
+                            raise
+
+            # 退避等待時不佔用連線名額
+            self.stats['retries'] += 1
+            await asyncio.sleep(self.controller.retry_delay(attempt, ticket.retry_after))
+            attempt += 1
+
+    async def _fetch_once(self, url: str, ticket: RequestTicket, revalidate: bool = True) -> Optional[str]:
+        """
+        發出一次頁面請求，並把回應狀態回報給自適應控制器
+
+        Args:
+            revalidate: 有快取時帶 ETag / Last-Modified 條件標頭
+
+        Returns:
+            頁面 HTML；帶條件標頭的請求收到 304 但快取內容已不存在時回傳 None
+        """
+        headers = self.page_cache.conditional_headers(url) if self.page_cache and revalidate else {}
+        started = time.perf_counter()
+        self.stats['requests'] += 1
+        try:
+            async with self.session.get(url, headers=headers) as response:
+                ticket.status = response.status
+                ticket.retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                status_codes = self.stats['status_codes']
+                status_codes[response.status] = status_codes.get(response.status, 0) + 1
+
+                # 頁面未變更，直接使用快取內容
+                if response.status == 304:
+                    html = self.page_cache.get_text(url) if self.page_cache else None
+                    if html is not None:
+                        self.page_cache.mark_validated(url)
+                        self.stats['not_modified'] += 1
+                        return html
+                    if headers:
+                        return None
+                    # 沒有帶條件標頭卻收到 304，空白內容不能當作頁面
+                    raise aiohttp.ClientResponseError(response.request_info, response.history,
+                                                      status=response.status, message='Not Modified 但沒有快取內容',
+                                                      headers=response.headers)
+
+                response.raise_for_status()
+                body = await response.read()
+                self.stats['bytes'] += len(body)
+                encoding = response.get_encoding()
+                if self.page_cache:
+                    self.page_cache.store(url, body, dict(response.headers), encoding)
+                return body.decode(encoding, errors='replace')
+        except Exception:
+            self.stats['errors'] += 1
+            raise
+        finally:
+            self.latencies.append(time.perf_counter() - started)
+
+    async def _fetch_bytes_once(self, url: str, ticket: RequestTicket) -> bytes:
+        """發出一次不使用快取的請求，並把回應狀態回報給自適應控制器"""
+        started = time.perf_counter()
+        self.stats['requests'] += 1
+        try:
+            async with self.session.get(url) as response:
+                ticket.status = response.status
+                ticket.retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                status_codes = self.stats['status_codes']
+                status_codes[response.status] = status_codes.get(response.status, 0) + 1
+
+                response.raise_for_status()
+                body = await response.read()
+                self.stats['bytes'] += len(body)
+                return body
+        except Exception:
+            self.stats['errors'] += 1
+            raise
+        finally:
+            self.latencies.append(time.perf_counter() - started)
+
+    async def fetch_many(self, urls: List[str]) -> List[Tuple[str, Optional[str]]]:
+        """
+        同時抓取多個頁面
+
+        Returns:
+            依輸入順序排列的 [(url, html)]，失敗的頁面 html 為 None
+        """
+        async def fetch_one(url):
+            try:
+                return url, await self.fetch(url)
+            except Exception as e:
+                logger.warning(f"⚠️ 抓取失敗 {url}: {e}")
+                return url, None
+
+        return await asyncio.gather(*[fetch_one(url) for url in urls])
+
+    def get_stats(self) -> Dict:
+        """取得請求延遲統計（秒）"""
+        latencies = sorted(self.latencies)
+        return {
+            'requests': self.stats['requests'],
+            'errors': self.stats['errors'],
+            'bytes': self.stats['bytes'],
+            'not_modified': self.stats['not_modified'],
+            'offline_hits': self.stats['offline_hits'],
+            'retries': self.stats['retries'],
+            'status_codes': dict(self.stats['status_codes']),
+            'latency_avg': round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+            'latency_p50': round(_percentile(latencies, 50), 3),
+            'latency_p95': round(_percentile(latencies, 95), 3),
+            'latency_max': round(latencies[-1], 3) if latencies else 0.0
+        }
+
+    def log_stats(self, label: str = ''):
+        """輸出延遲統計日誌"""
+        stats = self.get_stats()
+        logger.info(f"📡 HTTP 統計 {label}: {stats['requests']} 個請求，失敗 {stats['errors']}，"
+                    f"重試 {stats['retries']}，未變更 {stats['not_modified']}，離線讀取 {stats['offline_hits']}，"
+                    f"下載 {stats['bytes'] / 1024 / 1024:.1f} MB")
+        logger.info(f"   延遲 平均 {stats['latency_avg']}s / p50 {stats['latency_p50']}s / "
+                    f"p95 {stats['latency_p95']}s / 最大 {stats['latency_max']}s")
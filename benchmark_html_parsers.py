@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTML 解析後端效能比較
+以已儲存的產品頁面比較各解析後端的解析時間、記憶體峰值，並確認概覽輸出與 html.parser 完全相同
+"""
+
+import argparse
+import contextlib
+import glob
+import io
+import json
+import multiprocessing
+import os
+import time
+import tracemalloc
+from typing import Dict, List
+
+from html_parser_backend import available_backends, parse_document
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+DEFAULT_PAGES_DIR = 'data/product_pages'
+
+
+def download_pages(pages_dir: str, count: int, category: str = 'mac'):
+    """從現有產品資料下載產品頁面作為測試樣本"""
+    import requests
+    from production_overview_updater import ProductionOverviewUpdater
+
+    updater = ProductionOverviewUpdater()
+    products = updater.load_products(category)[:count]
+    os.makedirs(pages_dir, exist_ok=True)
+
+    for i, product in enumerate(products, 1):
+        url = product.get('產品URL', '')
+        if not url:
+            continue
+        try:
+            content = updater.fetch_page(url)
+            path = os.path.join(pages_dir, f'{category}_{i:03d}.html')
+            with open(path, 'wb') as f:
+                f.write(content)
+            print(f"💾 已儲存 {path}")
+        except requests.RequestException as e:
+            print(f"❌ 下載失敗 {url}: {e}")
+
+
+def load_pages(pages_dir: str) -> List[bytes]:
+    """載入已儲存的產品頁面"""
+    pages = []
+    for path in sorted(glob.glob(os.path.join(pages_dir, '*.html'))):
+        with open(path, 'rb') as f:
+            pages.append(f.read())
+    return pages
+
+
+def run_backend(backend: str, pages: List[bytes], rounds: int) -> Dict:
+    """在獨立行程中測量單一後端，避免其他後端的記憶體影響峰值"""
+    from production_overview_updater import ProductionOverviewUpdater
+
+    updater = ProductionOverviewUpdater(parser_backend=backend)
+
+    tracemalloc.start()
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for html in pages:
+            parse_document(html, backend)
+    parse_seconds = time.perf_counter() - started
+
+    outputs = []
+    started = time.perf_counter()
+    # 擷取過程會輸出大量日誌，測量時略過
+    with contextlib.redirect_stdout(io.StringIO()):
+        for round_index in range(rounds):
+            for html in pages:
+                overview = updater.parse_overview_html(html)
+                if round_index == 0:
+                    outputs.append(overview)
+    extract_seconds = time.perf_counter() - started
+
+    _, python_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # tracemalloc 只追蹤 Python 配置的記憶體，lxml 與 selectolax 的 C 記憶體以行程 RSS 峰值補充
+    peak_rss_mb = None
+    if resource:
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 單位為 KB，macOS 為 bytes
+        peak_rss_mb = max_rss / 1024 / 1024 if os.uname().sysname == 'Darwin' else max_rss / 1024
+
+    total = len(pages) * rounds
+    return {
+        'backend': backend,
+        'parse_ms_per_page': parse_seconds / total * 1000,
+        'extract_ms_per_page': extract_seconds / total * 1000,
+        'python_peak_mb': python_peak / 1024 / 1024,
+        'peak_rss_mb': peak_rss_mb,
+        'outputs': outputs
+    }
+
+
+def _run_backend_in_queue(queue, backend, pages, rounds):
+    try:
+        queue.put(run_backend(backend, pages, rounds))
+    except Exception as e:
+        queue.put({'backend': backend, 'error': str(e)})
+
+
+def benchmark(pages: List[bytes], backends: List[str], rounds: int) -> List[Dict]:
+    """逐一在新行程中測量各後端"""
+    context = multiprocessing.get_context('spawn')
+    results = []
+
+    for backend in backends:
+        queue = context.Queue()
+        process = context.Process(target=_run_backend_in_queue, args=(queue, backend, pages, rounds))
+        process.start()
+        results.append(queue.get())
+        process.join()
+
+    return results
+
+
+def print_report(results: List[Dict]):
+    """輸出比較結果"""
+    baseline = next((result for result in results if result['backend'] == 'html.parser'), None)
+
+    print("\n" + "=" * 80)
+    print("📊 HTML 解析後端比較")
+    print("=" * 80)
+    print(f"{'後端':<14}{'解析 ms/頁':>12}{'擷取 ms/頁':>12}{'Python 峰值 MB':>16}{'RSS 峰值 MB':>14}  輸出")
+
+    for result in results:
+        if 'error' in result:
+            print(f"{result['backend']:<14}❌ {result['error']}")
+            continue
+
+        if baseline and 'outputs' in baseline:
+            identical = sum(a == b for a, b in zip(result['outputs'], baseline['outputs']))
+            output_status = f"{identical}/{len(baseline['outputs'])} 相同"
+        else:
+            output_status = "無基準"
+
+        peak_rss = f"{result['peak_rss_mb']:.1f}" if result['peak_rss_mb'] is not None else 'N/A'
+        print(f"{result['backend']:<14}{result['parse_ms_per_page']:>12.2f}{result['extract_ms_per_page']:>12.2f}"
+              f"{result['python_peak_mb']:>16.1f}{peak_rss:>14}  {output_status}")
+
+
+def main():
+    """主程式"""
+    parser = argparse.ArgumentParser(description='比較 HTML 解析後端的效能')
+    parser.add_argument('--pages-dir', default=DEFAULT_PAGES_DIR, help='已儲存產品頁面的目錄')
+    parser.add_argument('--download', type=int, default=0, help='先從 Mac 產品資料下載指定數量的頁面')
+    parser.add_argument('--rounds', type=int, default=3, help='每個後端重複解析的次數')
+    parser.add_argument('--backends', nargs='*', default=None, help='要比較的後端，預設為所有已安裝的後端')
+    parser.add_argument('--output', default=None, help='將結果儲存為 JSON')
+    args = parser.parse_args()
+
+    if args.download:
+        download_pages(args.pages_dir, args.download)
+
+    pages = load_pages(args.pages_dir)
+    if not pages:
+        print(f"❌ {args.pages_dir} 沒有 .html 頁面，可使用 --download 10 下載樣本")
+        return
+
+    backends = args.backends or available_backends()
+    # html.parser 是比對輸出的基準，一律納入
+    if 'html.parser' not in backends:
+        backends.append('html.parser')
+
+    print(f"🧪 以 {len(pages)} 個頁面 × {args.rounds} 輪比較: {', '.join(backends)}")
+    results = benchmark(pages, backends, args.rounds)
+    print_report(results)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump([{k: v for k, v in result.items() if k != 'outputs'} for result in results],
+                      f, ensure_ascii=False, indent=2)
+        print(f"\n💾 結果已儲存到 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+爬蟲吞吐量效能測試
+以離線重播伺服器取代 apple.com，分別在獨立行程與暫存工作目錄中執行各爬蟲，
+比較每秒頁面數、傳輸量、解析時間與記憶體峰值，不會連線正式網站也不會改動 data/ 內的資料
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, List
+from urllib.parse import urlsplit
+
+from page_cache import normalize_url
+from replay_server import CATEGORY_URLS, DEFAULT_RECORDINGS_DIR, ReplayServer
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRAPERS = ['production', 'simple', 'enhanced']
+
+
+def prepare_workspace(workspace: str, server: ReplayServer, categories: List[str], limit: int) -> Dict[str, int]:
+    """
+    在暫存目錄建立只包含已錄製產品的類別資料，產品網址改為重播伺服器
+
+    Returns:
+        {類別: 產品數量}
+    """
+    recorded = {normalize_url(url) for url in server.urls()}
+    os.makedirs(os.path.join(workspace, 'data'), exist_ok=True)
+    counts = {}
+
+    for category in categories:
+        source = os.path.join(REPO_DIR, 'data', f'apple_refurbished_{category}.json')
+        if not os.path.exists(source):
+            continue
+        with open(source, 'r', encoding='utf-8') as f:
+            products = [product for product in json.load(f)
+                        if normalize_url(product.get('產品URL', '')) in recorded][:limit]
+
+        for product in products:
+            product['產品URL'] = server.rewrite_url(product['產品URL'])
+        with open(os.path.join(workspace, 'data', f'apple_refurbished_{category}.json'), 'w', encoding='utf-8') as f:
+            json.dump(products, f, ensure_ascii=False, indent=2)
+        counts[category] = len(products)
+
+    return counts
+
+
+def _peak_rss_mb(who) -> float:
+    max_rss = resource.getrusage(who).ru_maxrss
+    # Linux 單位為 KB，macOS 為 bytes
+    return max_rss / 1024 / 1024 if sys.platform == 'darwin' else max_rss / 1024
+
+
+def _load_products(category: str) -> List[Dict]:
+    path = f'data/apple_refurbished_{category}.json'
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def run_scraper(name: str, workspace: str, base_url: str, categories: List[str],
+                limit: int, requests_per_second: float) -> Dict:
+    """在暫存工作目錄中執行單一爬蟲並測量"""
+    sys.path.insert(0, REPO_DIR)
+    os.chdir(workspace)
+    # 爬蟲會輸出大量日誌，測量時略過
+    logging.disable(logging.INFO)
+
+    parse_seconds = 0.0
+    products = 0
+    started = time.perf_counter()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        if name == 'production':
+            from production_overview_updater import ProductionOverviewUpdater
+
+            updater = ProductionOverviewUpdater(requests_per_second=requests_per_second)
+            for category in categories:
+                updater.update_category_overview(category)
+                pipeline_stats = updater.last_run_stats.get('pipeline', {})
+                parse_seconds += pipeline_stats.get('parse_seconds', 0.0)
+                products += pipeline_stats.get('parsed', 0)
+
+        elif name == 'simple':
+            from simple_overview_test import SimpleOverviewExtractor
+
+            extractor = SimpleOverviewExtractor()
+            for category in categories:
+                asyncio.run(extractor.test_products(_load_products(category), requests_per_second))
+                parse_seconds += extractor.last_pipeline_stats.get('parse_seconds', 0.0)
+                products += extractor.last_pipeline_stats.get('parsed', 0)
+
+        elif name == 'enhanced':
+            from crawl_governor import HostRateGovernor
+            from enhanced_apple_scraper import EnhancedAppleScraper
+
+            scraper = EnhancedAppleScraper(governor=HostRateGovernor(rate_per_second=requests_per_second))
+            scraper.categories = {category: base_url + urlsplit(CATEGORY_URLS[category]).path
+                                  for category in categories}
+            results = asyncio.run(scraper.scrape_all_categories_with_details(limit=limit, categories=categories))
+            for category_products in results.values():
+                products += len(category_products)
+                # 瀏覽器內擷取的時間，不含頁面載入
+                for product in category_products:
+                    parse_seconds += sum(seconds for field, seconds in product.get('擷取耗時', {}).items()
+                                         if field != '頁面載入')
+
+        else:
+            raise ValueError(f"未知的爬蟲: {name}")
+
+    return {
+        'scraper': name,
+        'wall_seconds': time.perf_counter() - started,
+        'products': products,
+        'parse_seconds': parse_seconds,
+        'peak_rss_mb': _peak_rss_mb(resource.RUSAGE_SELF) if resource else None,
+        # 解析子行程與 Chromium 的記憶體峰值
+        'children_peak_rss_mb': _peak_rss_mb(resource.RUSAGE_CHILDREN) if resource else None
+    }
+
+
+def _run_scraper_in_queue(queue, *args):
+    try:
+        queue.put(run_scraper(*args))
+    except Exception as e:
+        queue.put({'scraper': args[0], 'error': str(e)})
+
+
+def benchmark(server: ReplayServer, scrapers: List[str], categories: List[str],
+              limit: int, requests_per_second: float) -> List[Dict]:
+    """逐一在新行程與新的暫存工作目錄中執行各爬蟲"""
+    context = multiprocessing.get_context('spawn')
+    results = []
+
+    for name in scrapers:
+        workspace = tempfile.mkdtemp(prefix=f'benchmark_{name}_')
+        try:
+            prepare_workspace(workspace, server, categories, limit)
+            server.reset_stats()
+
+            queue = context.Queue()
+            process = context.Process(target=_run_scraper_in_queue,
+                                      args=(queue, name, workspace, server.base_url, categories,
+                                            limit, requests_per_second))
+            process.start()
+            result = queue.get()
+            process.join()
+        finally:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+        server_stats = server.get_stats()
+        if 'error' not in result:
+            result.update({
+                'pages_per_second': server_stats['ok'] / result['wall_seconds'] if result['wall_seconds'] else 0.0,
+                'bytes_sent': server_stats['bytes_sent'],
+                'server': server_stats
+            })
+        results.append(result)
+
+    return results
+
+
+def print_report(results: List[Dict]):
+    """輸出比較結果"""
+    print("\n" + "=" * 96)
+    print("📊 爬蟲吞吐量比較 (離線重播)")
+    print("=" * 96)
+    print(f"{'爬蟲':<12}{'頁面/秒':>10}{'傳輸 KB':>10}{'產品':>6}{'總耗時 s':>10}{'解析 s':>9}"
+          f"{'RSS 峰值 MB':>13}{'子行程 MB':>11}  伺服器回應")
+
+    for result in results:
+        if 'error' in result:
+            print(f"{result['scraper']:<12}❌ {result['error']}")
+            continue
+
+        server = result['server']
+        peak_rss = f"{result['peak_rss_mb']:.1f}" if result['peak_rss_mb'] is not None else 'N/A'
+        children_rss = f"{result['children_peak_rss_mb']:.1f}" if result['children_peak_rss_mb'] is not None else 'N/A'
+        print(f"{result['scraper']:<12}{result['pages_per_second']:>10.2f}{result['bytes_sent'] / 1024:>10.1f}"
+              f"{result['products']:>6}{result['wall_seconds']:>10.1f}{result['parse_seconds']:>9.2f}"
+              f"{peak_rss:>13}{children_rss:>11}  "
+              f"200×{server['ok']} 304×{server['not_modified']} 429×{server['throttled']} "
+              f"500×{server['errors']} 404×{server['not_found']}")
+
+
+def main():
+    """主程式"""
+    parser = argparse.ArgumentParser(description='以離線重播伺服器比較爬蟲吞吐量')
+    parser.add_argument('--recordings', default=DEFAULT_RECORDINGS_DIR,
+                        help='錄製頁面的目錄，可用 python replay_server.py --record 10 建立')
+    parser.add_argument('--scrapers', nargs='*', default=SCRAPERS, choices=SCRAPERS, help='要測試的爬蟲')
+    parser.add_argument('--categories', nargs='*', default=['mac'], choices=list(CATEGORY_URLS), help='要測試的類別')
+    parser.add_argument('--limit', type=int, default=10, help='每個類別的產品數量')
+    parser.add_argument('--rps', type=float, default=20.0, help='爬蟲的請求速率上限')
+    parser.add_argument('--latency', type=float, nargs=2, default=[0.05, 0.15], metavar=('MIN', 'MAX'),
+                        help='重播伺服器回應延遲秒數範圍')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='回傳 500 的比例')
+    parser.add_argument('--burst-every', type=int, default=0, help='每隔多少個請求開始一次 429 爆發')
+    parser.add_argument('--burst-length', type=int, default=0, help='每次 429 爆發的長度')
+    parser.add_argument('--seed', type=int, default=42, help='重播伺服器的隨機種子')
+    parser.add_argument('--output', default=None, help='將結果儲存為 JSON')
+    args = parser.parse_args()
+
+    server = ReplayServer(args.recordings, latency=tuple(args.latency), error_rate=args.error_rate,
+                          burst_every=args.burst_every, burst_length=args.burst_length, seed=args.seed)
+    if not server.urls():
+        print(f"❌ {args.recordings} 沒有錄製頁面，可使用 python replay_server.py --record 10 錄製")
+        return
+
+    with server:
+        print(f"🧪 以 {len(server.urls())} 個錄製頁面測試: {', '.join(args.scrapers)} "
+              f"(類別 {', '.join(args.categories)}，每類 {args.limit} 個產品)")
+        results = benchmark(server, args.scrapers, args.categories, args.limit, args.rps)
+
+    print_report(results)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 結果已儲存到 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
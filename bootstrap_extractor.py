@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+整修品列表頁內嵌 JSON 擷取
+Apple 整修品列表頁在 <script> 中內嵌 window.REFURB_GRID_BOOTSTRAP，包含完整的產品格資料，
+以 requests + BeautifulSoup 取得並解析即可得到產品列表，不需要啟動無頭瀏覽器
+"""
+
+import asyncio
+import functools
+import json
+import logging
+import re
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urljoin
+
+import requests
+from bs4 import BeautifulSoup, SoupStrainer
+
+from adaptive_controller import AdaptiveCrawlController, parse_retry_after, resolve_controller
+from crawl_governor import HostRateGovernor
+from dom_batch_extractor import extract_part_number
+
+logger = logging.getLogger(__name__)
+
+# 內嵌產品格資料的 JavaScript 變數名稱（依序嘗試）
+BOOTSTRAP_VARIABLES = [
+    'REFURB_GRID_BOOTSTRAP'
+]
+
+BOOTSTRAP_ASSIGNMENT_PATTERN = re.compile(
+    r'(?:window\.)?(' + '|'.join(BOOTSTRAP_VARIABLES) + r')\s*=\s*'
+)
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
+    'Accept-Language': 'zh-TW,zh;q=0.9,en-US;q=0.8,en;q=0.7',
+    'Accept-Encoding': 'gzip, deflate',
+    'DNT': '1',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1'
+}
+
+
+def find_bootstrap_json(html: str) -> Optional[Dict]:
+    """
+    從列表頁 HTML 找出內嵌的產品格 JSON
+
+    Returns:
+        解碼後的 JSON，找不到或無法解碼時回傳 None
+    """
+    # 只解析 <script> 標籤，避免建立整份文件的 DOM
+    soup = BeautifulSoup(html, 'html.parser', parse_only=SoupStrainer('script'))
+    decoder = json.JSONDecoder()
+
+    for script in soup.find_all('script'):
+        text = script.string or script.get_text()
+        if not text:
+            continue
+
+        match = BOOTSTRAP_ASSIGNMENT_PATTERN.search(text)
+        if not match:
+            continue
+
+        try:
+            # 變數賦值後面可能還有其他程式碼，只解碼第一個完整的 JSON 物件
+            data, _ = decoder.raw_decode(text, match.end())
+        except ValueError as e:
+            logger.warning(f"⚠️ {match.group(1)} 解碼失敗: {e}")
+            continue
+
+        if isinstance(data, dict):
+            return data
+
+    return None
+
+
+def _tile_price(tile: Dict) -> str:
+    """取得產品格的顯示價格，例如 NT$21,890"""
+    price = tile.get('price')
+    if isinstance(price, str):
+        return price.strip()
+    if not isinstance(price, dict):
+        return ''
+
+    current_price = price.get('currentPrice') or {}
+    if isinstance(current_price, dict):
+        return (current_price.get('amount') or '').strip()
+    return str(current_price).strip()
+
+
+def _tile_image(tile: Dict) -> str:
+    """取得產品格的圖片網址，格式為 image.srcSet.src 或 image.src"""
+    image = tile.get('image')
+    if isinstance(image, str):
+        return image.strip()
+    if not isinstance(image, dict):
+        return ''
+
+    src_set = image.get('srcSet')
+    if isinstance(src_set, dict) and src_set.get('src'):
+        return src_set['src'].strip()
+    return (image.get('src') or '').strip()
+
+
+def parse_bootstrap_tiles(data: Dict, base_url: str = 'https://www.apple.com',
+                          limit: Optional[int] = None) -> List[Dict]:
+    """
+    將內嵌 JSON 的產品格轉換為與 extract_listing_tiles 相同的格式
+
+    Returns:
+        [{'title', 'price', 'url', 'part_number', 'image'}, ...]
+    """
+    seen = set()
+    results = []
+
+    for tile in data.get('tiles') or []:
+        href = tile.get('productDetailsUrl') or tile.get('url') or ''
+        if '/product/' not in href:
+            continue
+
+        url = urljoin(base_url, href)
+        if url in seen:
+            continue
+        seen.add(url)
+
+        results.append({
+            'title': (tile.get('title') or '').strip(),
+            'price': _tile_price(tile),
+            'url': url,
+            'part_number': tile.get('partNumber') or extract_part_number(url),
+            'image': _tile_image(tile)
+        })
+        if limit and len(results) >= limit:
+            break
+
+    return results
+
+
+class BootstrapListingExtractor:
+    def __init__(self, headers: Optional[Dict] = None, governor: Optional[HostRateGovernor] = None,
+                 timeout: int = 30, controller: Optional[AdaptiveCrawlController] = None):
+        """
+        初始化內嵌 JSON 擷取器
+
+        Args:
+            headers: HTTP 請求標頭
+            governor: 主機速率控制器，未提供時使用所有爬蟲共用的控制器
+            timeout: 請求逾時秒數
+            controller: 自適應控制器，未提供時依 governor 建立或使用共用的控制器
+        """
+        self.controller = resolve_controller(controller, governor)
+        self.governor = self.controller.governor
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update(headers or DEFAULT_HEADERS)
+        # requests 需要額外安裝 brotli 才能解碼 br，統一只接受 gzip / deflate
+        self.session.headers['Accept-Encoding'] = 'gzip, deflate'
+        self.stats = {'bootstrap_hits': 0, 'bootstrap_misses': 0}
+
+    def fetch_html(self, url: str) -> str:
+        """以 HTTP 取得頁面 HTML，遇到限流或連線錯誤時以指數退避重試"""
+        attempt = 0
+        while True:
+            with self.controller.slot_sync(url) as ticket:
+                try:
+                    response = self.session.get(url, timeout=self.timeout)
+                    ticket.status = response.status_code
+                    ticket.retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                except requests.RequestException:
+                    if not self.controller.should_retry(None, attempt, url):
+                        raise
+
+            if not self.controller.should_retry(ticket.status, attempt, url):
+                break
+            time.sleep(self.controller.retry_delay(attempt, ticket.retry_after))
+            attempt += 1
+
+        response.raise_for_status()
+        return response.text
+
+    def fetch_listing(self, category_url: str, limit: Optional[int] = None) -> Optional[List[Dict]]:
+        """
+        取得類別列表頁的產品格
+
+        Returns:
+            產品格列表；頁面沒有內嵌資料時回傳 None，由呼叫端改用瀏覽器擷取
+
+        Raises:
+            requests.RequestException: 列表頁取得失敗（HTTP 錯誤、連線錯誤或逾時），交由呼叫端的重試與斷路器處理
+        """
+        html = self.fetch_html(category_url)
+        data = find_bootstrap_json(html)
+        # 相對網址以列表頁所在的主機解析，離線重播伺服器上的列表頁也會指向重播伺服器
+        tiles = parse_bootstrap_tiles(data, base_url=category_url, limit=limit) if data else []
+
+        if not tiles:
+            logger.info(f"🔄 {category_url} 沒有可用的內嵌產品資料")
+            self.stats['bootstrap_misses'] += 1
+            return None
+
+        logger.info(f"✅ 從內嵌 JSON 取得 {len(tiles)} 個產品")
+        self.stats['bootstrap_hits'] += 1
+        return tiles
+
+    async def fetch_listing_async(self, category_url: str, limit: Optional[int] = None) -> Optional[List[Dict]]:
+        """在背景執行緒取得列表頁，避免阻塞事件迴圈（部署環境為 Python 3.8，沒有 asyncio.to_thread）"""
+        return await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(self.fetch_listing, category_url, limit))
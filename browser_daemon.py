@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+常駐的無頭 Chromium
+在排程執行之間保持瀏覽器開啟，爬蟲透過 CDP 連線而不必每次冷啟動；
+定期檢查健康狀態，執行過久或記憶體過高時在沒有分頁使用中時重啟，避免記憶體洩漏累積
+"""
+
+import argparse
+import json
+import logging
+import os
+import signal
+import subprocess
+import time
+import urllib.request
+from datetime import datetime
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 9222
+DEFAULT_STATE_PATH = 'data/browser_daemon.json'
+DEFAULT_PROFILE_DIR = 'data/browser_daemon_profile'
+DEFAULT_HEALTH_INTERVAL = 30.0
+DEFAULT_MAX_UPTIME_HOURS = 6.0
+DEFAULT_MAX_RSS_MB = 1536.0
+# 有分頁使用中時最多延後重啟多久，超過就強制重啟
+DEFAULT_RESTART_GRACE = 600.0
+STARTUP_TIMEOUT = 15.0
+
+
+def fetch_version(endpoint: str, timeout: float = 2.0) -> Optional[Dict]:
+    """讀取 CDP 的 /json/version，瀏覽器沒有回應時回傳 None"""
+    try:
+        with urllib.request.urlopen(f'{endpoint}/json/version', timeout=timeout) as response:
+            return json.loads(response.read().decode('utf-8'))
+    except Exception:
+        return None
+
+
+def count_open_pages(endpoint: str, timeout: float = 2.0) -> int:
+    """目前開啟中的分頁數量，無法取得時視為 0"""
+    try:
+        with urllib.request.urlopen(f'{endpoint}/json/list', timeout=timeout) as response:
+            targets = json.loads(response.read().decode('utf-8'))
+        return sum(1 for target in targets if target.get('type') == 'page' and target.get('url') != 'about:blank')
+    except Exception:
+        return 0
+
+
+def discover_endpoint(state_path: str = DEFAULT_STATE_PATH, timeout: float = 1.0) -> Optional[str]:
+    """
+    尋找可連線的常駐瀏覽器
+
+    優先使用環境變數 BROWSER_CDP_ENDPOINT，其次讀取常駐程式的狀態檔；瀏覽器沒有回應時回傳 None
+    """
+    endpoint = os.getenv('BROWSER_CDP_ENDPOINT')
+    if not endpoint and os.path.exists(state_path):
+        try:
+            with open(state_path, 'r', encoding='utf-8') as f:
+                endpoint = json.load(f).get('endpoint')
+        except Exception as e:
+            logger.debug(f"讀取常駐瀏覽器狀態失敗: {e}")
+
+    if endpoint and fetch_version(endpoint, timeout):
+        return endpoint
+    return None
+
+
+def _process_group_rss_mb(pgid: int) -> float:
+    """Chromium 會分出多個行程，加總同一行程群組的常駐記憶體（僅支援 Linux）"""
+    page_size = os.sysconf('SC_PAGE_SIZE')
+    total = 0
+    for pid in os.listdir('/proc'):
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f'/proc/{pid}/stat', 'r') as f:
+                # 行程名稱可能含空白，從最後一個括號之後解析
+                fields = f.read().rsplit(')', 1)[1].split()
+            if int(fields[2]) != pgid:
+                continue
+            with open(f'/proc/{pid}/statm', 'r') as f:
+                total += int(f.read().split()[1]) * page_size
+        except (OSError, IndexError, ValueError):
+            continue
+    return total / 1024 / 1024
+
+
+class BrowserDaemon:
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 state_path: str = DEFAULT_STATE_PATH, profile_dir: str = DEFAULT_PROFILE_DIR,
+                 health_interval: float = DEFAULT_HEALTH_INTERVAL,
+                 max_uptime_hours: float = DEFAULT_MAX_UPTIME_HOURS,
+                 max_rss_mb: float = DEFAULT_MAX_RSS_MB,
+                 restart_grace: float = DEFAULT_RESTART_GRACE,
+                 chromium_path: Optional[str] = None, launch_args: Optional[List[str]] = None):
+        """
+        初始化常駐瀏覽器
+
+        Args:
+            host: CDP 監聽位址，預設只接受本機連線
+            port: CDP 連接埠
+            state_path: 狀態檔，爬蟲由此找到連線位址
+            profile_dir: Chromium 使用者資料目錄
+            health_interval: 健康檢查間隔秒數
+            max_uptime_hours: 執行多久後定期重啟
+            max_rss_mb: 記憶體超過多少 MB 後重啟（僅 Linux）
+            restart_grace: 有分頁使用中時最多延後重啟多久
+            chromium_path: Chromium 執行檔，未提供時使用 Playwright 安裝的版本
+            launch_args: 額外的 Chromium 啟動參數，預設與瀏覽器池相同
+        """
+        self.host = host
+        self.port = port
+        self.state_path = state_path
+        self.profile_dir = profile_dir
+        self.health_interval = health_interval
+        self.max_uptime = max_uptime_hours * 3600
+        self.max_rss_mb = max_rss_mb
+        self.restart_grace = restart_grace
+        self.chromium_path = chromium_path or os.getenv('CHROMIUM_PATH')
+        self.launch_args = launch_args
+
+        self.process: Optional[subprocess.Popen] = None
+        self.started_at: Optional[float] = None
+        self._restart_pending_since: Optional[float] = None
+        self._running = False
+
+        self.stats = {
+            'starts': 0,
+            'restarts': {'unhealthy': 0, 'uptime': 0, 'memory': 0},
+            'health_checks': 0
+        }
+
+    @property
+    def endpoint(self) -> str:
+        return f'http://{self.host}:{self.port}'
+
+    def _executable(self) -> str:
+        if self.chromium_path:
+            return self.chromium_path
+        from playwright.sync_api import sync_playwright
+        with sync_playwright() as playwright:
+            self.chromium_path = playwright.chromium.executable_path
+        return self.chromium_path
+
+    def _command(self) -> List[str]:
+        from browser_pool import DEFAULT_LAUNCH_ARGS
+        return [
+            self._executable(),
+            '--headless=new',
+            f'--remote-debugging-address={self.host}',
+            f'--remote-debugging-port={self.port}',
+            f'--user-data-dir={os.path.abspath(self.profile_dir)}',
+            '--no-first-run',
+            '--no-default-browser-check',
+            *(self.launch_args or DEFAULT_LAUNCH_ARGS),
+            'about:blank'
+        ]
+
+    def start(self) -> bool:
+        """啟動 Chromium 並等待 CDP 可以連線"""
+        if fetch_version(self.endpoint):
+            logger.error(f"❌ {self.endpoint} 已有其他瀏覽器在監聽，請先關閉或改用其他連接埠")
+            return False
+
+        os.makedirs(self.profile_dir, exist_ok=True)
+        logger.info(f"🚀 啟動常駐 Chromium ({self.endpoint})...")
+        # 獨立的行程群組，重啟時可以一併結束所有子行程
+        self.process = subprocess.Popen(self._command(), stdout=subprocess.DEVNULL,
+                                        stderr=subprocess.DEVNULL, start_new_session=True)
+
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            version = fetch_version(self.endpoint)
+            if version:
+                self.started_at = time.monotonic()
+                self._restart_pending_since = None
+                self.stats['starts'] += 1
+                self._write_state(version)
+                logger.info(f"✅ 常駐 Chromium 已就緒: {version.get('Browser', '')} (PID {self.process.pid})")
+                return True
+            if self.process.poll() is not None:
+                break
+            time.sleep(0.25)
+
+        logger.error("❌ 常駐 Chromium 啟動失敗")
+        self.stop()
+        return False
+
+    def stop(self):
+        """結束 Chromium 與所有子行程並移除狀態檔"""
+        if self.process and self.process.poll() is None:
+            try:
+                os.killpg(self.process.pid, signal.SIGTERM)
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                os.killpg(self.process.pid, signal.SIGKILL)
+                self.process.wait()
+            except ProcessLookupError:
+                pass
+        self.process = None
+        self.started_at = None
+
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)
+
+    def _write_state(self, version: Dict):
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        temp_path = f'{self.state_path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'endpoint': self.endpoint,
+                'pid': self.process.pid,
+                'browser': version.get('Browser', ''),
+                'started_at': datetime.now().isoformat()
+            }, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.state_path)
+
+    def rss_mb(self) -> float:
+        """Chromium 所有行程的記憶體用量（MB），非 Linux 時回傳 0"""
+        if not self.process or not os.path.isdir('/proc'):
+            return 0.0
+        return _process_group_rss_mb(self.process.pid)
+
+    def restart_reason(self) -> Optional[str]:
+        """需要重啟的原因：unhealthy / uptime / memory，不需要時回傳 None"""
+        self.stats['health_checks'] += 1
+        if not self.process or self.process.poll() is not None or not fetch_version(self.endpoint):
+            return 'unhealthy'
+        if self.started_at is not None and time.monotonic() - self.started_at >= self.max_uptime:
+            return 'uptime'
+        if self.max_rss_mb and self.rss_mb() >= self.max_rss_mb:
+            return 'memory'
+        return None
+
+    def check(self):
+        """執行一次健康檢查，必要時重啟；定期重啟會等到沒有分頁使用中"""
+        reason = self.restart_reason()
+        if not reason:
+            return
+
+        if reason != 'unhealthy':
+            now = time.monotonic()
+            self._restart_pending_since = self._restart_pending_since or now
+            open_pages = count_open_pages(self.endpoint)
+            if open_pages and now - self._restart_pending_since < self.restart_grace:
+                logger.info(f"⏳ 需要重啟 ({reason})，{open_pages} 個分頁使用中，稍後再試")
+                return
+
+        logger.warning(f"🔄 重啟常駐 Chromium (原因: {reason}，記憶體 {self.rss_mb():.0f} MB)")
+        self.stats['restarts'][reason] += 1
+        self.stop()
+        self.start()
+
+    def run_forever(self):
+        """啟動後持續健康檢查，收到 SIGTERM 或 Ctrl+C 時關閉"""
+        def handle_signal(signum, frame):
+            self._running = False
+
+        signal.signal(signal.SIGTERM, handle_signal)
+        if not self.start():
+            return
+
+        self._running = True
+        try:
+            while self._running:
+                time.sleep(self.health_interval)
+                if self._running:
+                    self.check()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+            logger.info(f"🛑 常駐 Chromium 已關閉 - 啟動 {self.stats['starts']} 次，"
+                        f"健康檢查 {self.stats['health_checks']} 次，重啟原因: {self.stats['restarts']}")
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='常駐的無頭 Chromium，供排程爬蟲透過 CDP 連線')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='CDP 連接埠')
+    parser.add_argument('--health-interval', type=float, default=DEFAULT_HEALTH_INTERVAL, help='健康檢查間隔秒數')
+    parser.add_argument('--max-uptime-hours', type=float, default=DEFAULT_MAX_UPTIME_HOURS, help='執行多久後定期重啟')
+    parser.add_argument('--max-rss-mb', type=float, default=DEFAULT_MAX_RSS_MB, help='記憶體超過多少 MB 後重啟')
+    args = parser.parse_args()
+
+    BrowserDaemon(port=args.port, health_interval=args.health_interval,
+                  max_uptime_hours=args.max_uptime_hours, max_rss_mb=args.max_rss_mb).run_forever()
+
+
+if __name__ == "__main__":
+    main()
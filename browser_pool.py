@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+共用瀏覽器池
+只啟動一次 Chromium，提供彼此隔離的瀏覽器上下文與分頁，
+並在每個上下文服務一定數量的分頁後回收重建；有常駐瀏覽器 (browser_daemon.py) 時直接透過 CDP 連線
+"""
+
+import asyncio
+import logging
+import os
+import sys
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from playwright.async_api import async_playwright
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LAUNCH_ARGS = [
+    '--no-sandbox',
+    '--disable-blink-features=AutomationControlled',
+    '--disable-web-security',
+    '--disable-features=VizDisplayCompositor',
+    '--disable-dev-shm-usage'
+]
+
+
+def default_headless() -> bool:
+    """沒有顯示器的 Linux 伺服器上只能以無頭模式啟動"""
+    return sys.platform.startswith('linux') and not os.getenv('DISPLAY')
+
+
+class BrowserPool:
+    def __init__(self, headless: Optional[bool] = None, max_pages_per_context: int = 20,
+                 max_contexts: int = 4, launch_args: Optional[List[str]] = None,
+                 cdp_endpoint: Optional[str] = None, use_daemon: bool = True):
+        """
+        初始化瀏覽器池
+
+        Args:
+            headless: 是否以無頭模式啟動 Chromium，預設在沒有顯示器時使用無頭模式
+            max_pages_per_context: 每個上下文服務多少個分頁後回收
+            max_contexts: 同時存在的上下文上限
+            launch_args: Chromium 啟動參數
+            cdp_endpoint: 連線到指定的瀏覽器 (例如 http://127.0.0.1:9222)，不自行啟動
+            use_daemon: 未指定 cdp_endpoint 時，有常駐瀏覽器就連線使用
+        """
+        self.headless = default_headless() if headless is None else headless
+        self.max_pages_per_context = max_pages_per_context
+        self.max_contexts = max_contexts
+        self.launch_args = launch_args or DEFAULT_LAUNCH_ARGS
+        self.cdp_endpoint = cdp_endpoint
+        self.use_daemon = use_daemon
+
+        self.playwright = None
+        self.browser = None
+        self._idle_contexts: Dict[str, List[Dict]] = {}
+        self._context_slots = None
+        self._start_lock = None
+        # 每次重新連線或啟動瀏覽器就加一，舊瀏覽器的上下文歸還時直接關閉
+        self._generation = 0
+
+        self.stats = {
+            'browser_launches': 0,
+            'cdp_attaches': 0,
+            'contexts_created': 0,
+            'contexts_recycled': 0,
+            'pages_served': 0
+        }
+
+    async def start(self):
+        """連線常駐瀏覽器或啟動 Chromium（已連線時不重複啟動）"""
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+            # 名額在重新連線後沿用：舊瀏覽器借出的分頁歸還前仍佔用名額，上下文總數不會超過上限
+            self._context_slots = asyncio.Semaphore(self.max_contexts)
+
+        async with self._start_lock:
+            if self.browser and self.browser.is_connected():
+                return
+
+            if not self.playwright:
+                self.playwright = await async_playwright().start()
+
+            self.browser = await self._attach()
+            if not self.browser:
+                logger.info(f"🚀 啟動共用 Chromium 瀏覽器{' (無頭模式)' if self.headless else ''}...")
+                self.browser = await self.playwright.chromium.launch(
+                    headless=self.headless,
+                    args=self.launch_args
+                )
+                self.stats['browser_launches'] += 1
+
+            self._idle_contexts = {}
+            self._generation += 1
+
+    async def _attach(self):
+        """連線到常駐瀏覽器，沒有可用的常駐瀏覽器時回傳 None"""
+        endpoint = self.cdp_endpoint
+        if not endpoint and self.use_daemon:
+            from browser_daemon import discover_endpoint
+            endpoint = discover_endpoint()
+        if not endpoint:
+            return None
+
+        try:
+            browser = await self.playwright.chromium.connect_over_cdp(endpoint)
+        except Exception as e:
+            logger.warning(f"⚠️ 無法連線常駐瀏覽器 {endpoint}，改為自行啟動: {e}")
+            return None
+
+        logger.info(f"🔌 已連線常駐瀏覽器 {endpoint}")
+        self.stats['cdp_attaches'] += 1
+        return browser
+
+    async def _checkout_context(self, setup_context: Callable[..., Awaitable], profile: str) -> Dict:
+        """取出一個閒置上下文，沒有時建立新的"""
+        idle = self._idle_contexts.setdefault(profile, [])
+        if idle:
+            return idle.pop()
+
+        context = await setup_context(self.browser)
+        self.stats['contexts_created'] += 1
+        return {'context': context, 'pages_served': 0, 'generation': self._generation}
+
+    async def _checkin_context(self, slot: Dict, profile: str, healthy: bool):
+        """歸還上下文，達到分頁上限或發生錯誤時回收"""
+        slot['pages_served'] += 1
+
+        # 借出後瀏覽器已重新連線，舊瀏覽器的上下文不能再借給新的請求
+        current = slot['generation'] == self._generation
+        if healthy and current and slot['pages_served'] < self.max_pages_per_context:
+            self._idle_contexts.setdefault(profile, []).append(slot)
+            return
+
+        try:
+            await slot['context'].close()
+        except Exception as e:
+            logger.debug(f"關閉上下文失敗: {e}")
+        self.stats['contexts_recycled'] += 1
+
+    @asynccontextmanager
+    async def page(self, setup_context: Callable[..., Awaitable], profile: str = 'default'):
+        """
+        借出一個分頁，離開 with 區塊時自動歸還
+
+        Args:
+            setup_context: 建立上下文的協程函式，接收 browser 參數
+            profile: 上下文設定名稱，不同設定的上下文不會互相借用
+        """
+        await self.start()
+
+        async with self._context_slots:
+            slot = await self._checkout_context(setup_context, profile)
+            page = await slot['context'].new_page()
+            self.stats['pages_served'] += 1
+            healthy = True
+
+            try:
+                yield page
+            except Exception:
+                healthy = False
+                raise
+            finally:
+                try:
+                    await page.close()
+                except Exception as e:
+                    logger.debug(f"關閉分頁失敗: {e}")
+                    healthy = False
+                await self._checkin_context(slot, profile, healthy)
+
+    async def close(self):
+        """關閉所有上下文與瀏覽器"""
+        for slots in self._idle_contexts.values():
+            for slot in slots:
+                try:
+                    await slot['context'].close()
+                except Exception as e:
+                    logger.debug(f"關閉上下文失敗: {e}")
+        self._idle_contexts = {}
+
+        # 連線的常駐瀏覽器只會中斷連線，不會被關閉
+        if self.browser:
+            try:
+                await self.browser.close()
+            except Exception as e:
+                logger.debug(f"關閉瀏覽器失敗: {e}")
+            self.browser = None
+
+        if self.playwright:
+            await self.playwright.stop()
+            self.playwright = None
+
+        logger.info(f"🛑 瀏覽器池已關閉 - 啟動 {self.stats['browser_launches']} 次，"
+                    f"連線常駐瀏覽器 {self.stats['cdp_attaches']} 次，"
+                    f"服務 {self.stats['pages_served']} 個分頁，"
+                    f"回收 {self.stats['contexts_recycled']} 個上下文")
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
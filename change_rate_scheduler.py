@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+依變動率分配爬取頻率的排程
+由價格歷史與每次列表更新的結果學習每個類別的變動率（假設變動為卜瓦松過程），
+在每日列表頁請求總預算內分配各類別的檢查間隔：經常變動的類別最多每小時檢查一次，
+很少變動或沒有產品的類別則久久檢查一次，相同的爬取成本能發現更多價格變化
+"""
+
+import json
+import logging
+import math
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from product_key import history_product_id
+from result_writer import write_json_atomic
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATE_PATH = 'data/change_rates.json'
+DEFAULT_HISTORY_DIR = 'price_history'
+DEFAULT_CATEGORIES = ['mac', 'ipad', 'iphone', 'airpods', 'homepod', 'appletv', 'accessories']
+DEFAULT_REQUESTS_PER_DAY = 48
+DEFAULT_MIN_INTERVAL_HOURS = 1.0
+DEFAULT_MAX_INTERVAL_HOURS = 48.0
+# 沒有觀察資料時假設大約每天變動一次：加入一次有變動、一次沒變動的 24 小時虛擬觀察
+PRIOR_INTERVAL_HOURS = 24.0
+MAX_OBSERVATIONS = 200
+
+
+def estimate_change_rate(observations: List[Tuple[float, bool]],
+                         prior_interval: float = PRIOR_INTERVAL_HOURS) -> float:
+    """
+    由不等間隔的檢查結果估計每小時變動率
+
+    每筆觀察為 (距上次檢查的小時數, 是否有變動)；同一間隔內的多次變動只會被看到一次，
+    因此以卜瓦松過程的最大概似估計求解 Σ有變動 t/(e^{λt}-1) = Σ沒變動 t，
+    並加入兩筆虛擬觀察讓全部有變動或全部沒變動時仍有有限的估計值
+    """
+    samples = [(hours, changed) for hours, changed in observations if hours > 0]
+    samples += [(prior_interval, True), (prior_interval, False)]
+    unchanged_hours = sum(hours for hours, changed in samples if not changed)
+
+    def excess(rate: float) -> float:
+        return sum(hours / math.expm1(rate * hours) for hours, changed in samples if changed) - unchanged_hours
+
+    # excess 隨變動率單調遞減，在對數尺度上二分搜尋
+    low, high = 1e-6, 100.0
+    for _ in range(60):
+        middle = math.sqrt(low * high)
+        if excess(middle) > 0:
+            low = middle
+        else:
+            high = middle
+    return math.sqrt(low * high)
+
+
+def _marginal_freshness(rate: float, frequency: float) -> float:
+    """每小時檢查頻率增加時，平均新鮮度 (f/λ)(1-e^{-λ/f}) 的邊際增加量"""
+    ratio = rate / frequency
+    return (-math.expm1(-ratio)) / rate - math.exp(-ratio) / frequency
+
+
+def allocate_frequencies(rates: Dict[str, float], weights: Dict[str, float], requests_per_day: float,
+                         min_interval_hours: float = DEFAULT_MIN_INTERVAL_HOURS,
+                         max_interval_hours: float = DEFAULT_MAX_INTERVAL_HOURS) -> Dict[str, float]:
+    """
+    在每日請求預算內分配各類別的檢查間隔，最大化以產品數加權的平均新鮮度
+
+    新鮮度對檢查頻率是凹函數，最佳解讓各類別的加權邊際新鮮度相等；
+    以二分搜尋找出這個共同的邊際值，使總請求數剛好等於預算
+
+    Returns:
+        {類別: 檢查間隔小時數}
+    """
+    max_frequency = 1 / min_interval_hours
+    min_frequency = 1 / max_interval_hours
+    budget = requests_per_day / 24
+
+    def frequency_for(category: str, marginal: float) -> float:
+        rate, weight = rates[category], weights.get(category, 1.0)
+        if weight * _marginal_freshness(rate, max_frequency) >= marginal:
+            return max_frequency
+        if weight * _marginal_freshness(rate, min_frequency) <= marginal:
+            return min_frequency
+        low, high = min_frequency, max_frequency
+        for _ in range(60):
+            middle = math.sqrt(low * high)
+            if weight * _marginal_freshness(rate, middle) > marginal:
+                low = middle
+            else:
+                high = middle
+        return math.sqrt(low * high)
+
+    categories = list(rates)
+    if len(categories) * max_frequency <= budget:
+        frequencies = {category: max_frequency for category in categories}
+    elif len(categories) * min_frequency >= budget:
+        logger.warning(f"⚠️ 每日 {requests_per_day} 個請求不足以讓每個類別 {max_interval_hours:g} 小時檢查一次")
+        frequencies = {category: min_frequency for category in categories}
+    else:
+        low, high = 1e-12, 1e6
+        for _ in range(100):
+            middle = math.sqrt(low * high)
+            total = sum(frequency_for(category, middle) for category in categories)
+            if total > budget:
+                low = middle
+            else:
+                high = middle
+        frequencies = {category: frequency_for(category, high) for category in categories}
+
+    return {category: 1 / frequency for category, frequency in frequencies.items()}
+
+
+def history_observations(history_dir: str = DEFAULT_HISTORY_DIR) -> Dict[str, List[Tuple[float, bool]]]:
+    """由價格歷史中相鄰兩次追蹤的產品與價格差異，建立各類別的檢查觀察"""
+    if not os.path.isdir(history_dir):
+        return {}
+
+    snapshots = []
+    for filename in sorted(f for f in os.listdir(history_dir) if f.endswith('.json')):
+        try:
+            with open(os.path.join(history_dir, filename), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            prices = {
+                category: {history_product_id(product): product.get('price')
+                           for product in category_data.get('products', [])}
+                for category, category_data in data.get('categories', {}).items()
+            }
+            snapshots.append((datetime.fromisoformat(data['timestamp']), prices))
+        except Exception as e:
+            logger.warning(f"⚠️ 讀取價格歷史 {filename} 失敗: {e}")
+
+    snapshots.sort(key=lambda snapshot: snapshot[0])
+    observations: Dict[str, List[Tuple[float, bool]]] = {}
+    for (previous_time, previous), (current_time, current) in zip(snapshots, snapshots[1:]):
+        hours = (current_time - previous_time).total_seconds() / 3600
+        if hours <= 0:
+            continue
+        for category in set(previous) | set(current):
+            changed = previous.get(category, {}) != current.get(category, {})
+            observations.setdefault(category, []).append((hours, changed))
+    return observations
+
+
+class ChangeRateScheduler:
+    def __init__(self, categories: Optional[List[str]] = None,
+                 requests_per_day: float = DEFAULT_REQUESTS_PER_DAY,
+                 min_interval_hours: float = DEFAULT_MIN_INTERVAL_HOURS,
+                 max_interval_hours: float = DEFAULT_MAX_INTERVAL_HOURS,
+                 state_path: str = DEFAULT_STATE_PATH, history_dir: str = DEFAULT_HISTORY_DIR):
+        """
+        初始化變動率排程
+
+        Args:
+            categories: 要排程的類別
+            requests_per_day: 所有類別合計每天的列表頁請求預算
+            min_interval_hours: 最短檢查間隔（最常變動的類別）
+            max_interval_hours: 最長檢查間隔（很少變動或沒有產品的類別）
+            state_path: 觀察紀錄檔，跨執行保留
+            history_dir: 價格歷史目錄，類別沒有觀察紀錄時由此學習初始變動率
+        """
+        self.categories = list(categories or DEFAULT_CATEGORIES)
+        self.requests_per_day = requests_per_day
+        self.min_interval_hours = min_interval_hours
+        self.max_interval_hours = max_interval_hours
+        self.state_path = state_path
+        self._lock = threading.Lock()
+        self.weights: Dict[str, float] = {category: 1.0 for category in self.categories}
+        self.intervals: Dict[str, float] = {}
+
+        # {category: {'observations': [[hours, changed]], 'last_checked': iso}}
+        self.state: Dict[str, Dict] = self._load()
+        self._learn_from_history(history_dir)
+        self.replan()
+
+    def _load(self) -> Dict:
+        if not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"⚠️ 載入變動率紀錄失敗: {e}")
+            return {}
+
+    def _learn_from_history(self, history_dir: str):
+        """沒有觀察紀錄的類別以價格歷史作為初始觀察"""
+        missing = [category for category in self.categories
+                   if not self.state.get(category, {}).get('observations')]
+        if not missing:
+            return
+
+        observations = history_observations(history_dir)
+        learned = 0
+        for category in missing:
+            if observations.get(category):
+                entry = self.state.setdefault(category, {})
+                entry['observations'] = [[hours, changed] for hours, changed in observations[category]][-MAX_OBSERVATIONS:]
+                learned += 1
+        if learned:
+            logger.info(f"📚 由價格歷史學習 {learned} 個類別的變動率")
+            self.save()
+
+    def change_rate(self, category: str) -> float:
+        """類別的估計變動率（每小時）"""
+        with self._lock:
+            observations = [(hours, changed) for hours, changed
+                            in self.state.get(category, {}).get('observations', [])]
+        return estimate_change_rate(observations)
+
+    def set_product_counts(self, product_counts: Dict[str, int]):
+        """以產品數作為權重，產品多的類別錯過變動的代價較高；空類別仍保留最低權重以便發現新產品"""
+        self.weights = {category: product_counts.get(category, 0) + 1 for category in self.categories}
+        self.replan()
+
+    def replan(self) -> Dict[str, float]:
+        """依目前的變動率與權重重新分配檢查間隔"""
+        rates = {category: self.change_rate(category) for category in self.categories}
+        self.intervals = allocate_frequencies(rates, self.weights, self.requests_per_day,
+                                              self.min_interval_hours, self.max_interval_hours)
+        return self.intervals
+
+    def due_categories(self, now: Optional[datetime] = None) -> List[str]:
+        """已到檢查時間的類別，最久未檢查的在前"""
+        now = now or datetime.now()
+        due = []
+        with self._lock:
+            for category in self.categories:
+                entry = self.state.get(category, {})
+                # 更新失敗的類別在退避時間內不再排入
+                retry_at = entry.get('retry_at')
+                if retry_at and now < datetime.fromisoformat(retry_at):
+                    continue
+                last_checked = entry.get('last_checked')
+                if last_checked is None:
+                    due.append((float('inf'), category))
+                    continue
+                overdue = (now - datetime.fromisoformat(last_checked)).total_seconds() / 3600 \
+                    - self.intervals[category]
+                if overdue >= 0:
+                    due.append((overdue, category))
+        return [category for _, category in sorted(due, reverse=True)]
+
+    def record_check(self, category: str, changed: bool, checked_at: Optional[datetime] = None):
+        """
+        記錄一次檢查結果並寫入紀錄檔
+
+        Args:
+            category: 類別
+            changed: 列表與上次檢查時相比是否有變動
+            checked_at: 檢查時間，預設為現在
+        """
+        checked_at = checked_at or datetime.now()
+        with self._lock:
+            entry = self.state.setdefault(category, {})
+            last_checked = entry.get('last_checked')
+            if last_checked:
+                hours = (checked_at - datetime.fromisoformat(last_checked)).total_seconds() / 3600
+                if hours > 0:
+                    observations = entry.setdefault('observations', [])
+                    observations.append([round(hours, 3), changed])
+                    del observations[:-MAX_OBSERVATIONS]
+            entry['last_checked'] = checked_at.isoformat()
+            entry.pop('failures', None)
+            entry.pop('retry_at', None)
+        self.save()
+
+    def record_failure(self, category: str, failed_at: Optional[datetime] = None) -> float:
+        """
+        記錄一次更新失敗：不加入觀察，但依連續失敗次數指數退避，
+        避免從未成功檢查的類別一直排在最前面、每次排程都重試
+
+        Returns:
+            退避的小時數
+        """
+        failed_at = failed_at or datetime.now()
+        with self._lock:
+            entry = self.state.setdefault(category, {})
+            failures = entry.get('failures', 0) + 1
+            backoff_hours = min(self.max_interval_hours, self.min_interval_hours * 2 ** (failures - 1))
+            entry['failures'] = failures
+            entry['retry_at'] = (failed_at + timedelta(hours=backoff_hours)).isoformat()
+        self.save()
+        logger.warning(f"⏳ {category} 連續更新失敗 {failures} 次，{backoff_hours:g} 小時後再檢查")
+        return backoff_hours
+
+    def save(self):
+        """以原子替換寫入紀錄檔"""
+        with self._lock:
+            snapshot = {category: dict(entry) for category, entry in self.state.items()}
+
+        try:
+            write_json_atomic(self.state_path, snapshot)
+        except Exception as e:
+            logger.error(f"❌ 儲存變動率紀錄失敗: {e}")
+
+    def get_plan(self) -> Dict[str, Dict]:
+        """各類別的變動率、權重與檢查間隔"""
+        return {
+            category: {
+                'changes_per_day': round(self.change_rate(category) * 24, 2),
+                'weight': self.weights.get(category, 1.0),
+                'interval_hours': round(self.intervals[category], 2),
+                'checks_per_day': round(24 / self.intervals[category], 2)
+            }
+            for category in self.categories
+        }
+
+    def log_plan(self):
+        """輸出目前的排程"""
+        plan = self.get_plan()
+        total = sum(entry['checks_per_day'] for entry in plan.values())
+        logger.info(f"📅 變動率排程（每日 {total:.1f}/{self.requests_per_day:g} 個列表頁請求）:")
+        for category, entry in sorted(plan.items(), key=lambda item: item[1]['interval_hours']):
+            logger.info(f"   {category}: 每天約變動 {entry['changes_per_day']} 次，"
+                        f"每 {entry['interval_hours']} 小時檢查一次 (權重 {entry['weight']:g})")
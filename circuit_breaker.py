@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+爬取的斷路器與重試策略
+每個類別與每個主機各有一個斷路器：連續失敗達到門檻後開啟，之後的請求立即放棄而不再等待逾時；
+經過冷卻時間後進入半開狀態，只放行一個探測請求，成功才恢復，失敗則加倍冷卻時間
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional, Set
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+STATE_LABELS = {
+    STATE_CLOSED: '🟢 正常',
+    STATE_OPEN: '🔴 開啟',
+    STATE_HALF_OPEN: '🟡 半開'
+}
+
+DEFAULT_CATEGORY_THRESHOLD = 3
+DEFAULT_HOST_THRESHOLD = 8
+DEFAULT_RECOVERY_TIMEOUT = 300.0
+DEFAULT_MAX_RECOVERY_TIMEOUT = 3600.0
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 60.0) -> float:
+    """加入完整隨機抖動的指數退避秒數，避免多個請求同時重試"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class CircuitOpenError(Exception):
+    """斷路器開啟，請求被直接拒絕"""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"{name} 斷路器開啟，{retry_in:.0f} 秒後再探測")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = DEFAULT_CATEGORY_THRESHOLD,
+                 recovery_timeout: float = DEFAULT_RECOVERY_TIMEOUT,
+                 max_recovery_timeout: float = DEFAULT_MAX_RECOVERY_TIMEOUT, min_distinct_sources: int = 1):
+        """
+        初始化斷路器
+
+        Args:
+            name: 斷路器名稱，例如 category:mac、host:www.apple.com
+            failure_threshold: 連續失敗幾次後開啟
+            recovery_timeout: 開啟後多久進入半開狀態
+            max_recovery_timeout: 探測連續失敗時冷卻時間的上限
+            min_distinct_sources: 連續失敗至少來自幾個不同來源才開啟，避免單一失效網址拖垮整個主機
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_recovery_timeout = recovery_timeout
+        self.max_recovery_timeout = max_recovery_timeout
+        self.min_distinct_sources = min_distinct_sources
+        self._lock = threading.Lock()
+        self.state = STATE_CLOSED
+        self.recovery_timeout = recovery_timeout
+        self.failures = 0
+        self._failure_sources: Set[str] = set()
+        self.opened_at: Optional[float] = None
+        self._probe_started: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.stats = {'successes': 0, 'failures': 0, 'rejected': 0, 'opened': 0}
+
+    def _retry_in(self, now: float) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.opened_at + self.recovery_timeout - now)
+
+    def allow(self) -> bool:
+        """是否放行請求；半開狀態只放行一個探測請求"""
+        now = time.monotonic()
+        with self._lock:
+            if self.state == STATE_OPEN and self._retry_in(now) <= 0:
+                self.state = STATE_HALF_OPEN
+                self._probe_started = None
+
+            if self.state == STATE_HALF_OPEN:
+                # 探測請求沒有回報結果時，冷卻時間過後允許下一個探測
+                if self._probe_started is None or now - self._probe_started > self.recovery_timeout:
+                    self._probe_started = now
+                    logger.info(f"🟡 {self.name} 斷路器半開，放行探測請求")
+                    return True
+
+            if self.state != STATE_CLOSED:
+                self.stats['rejected'] += 1
+                return False
+            return True
+
+    def check(self):
+        """不放行時拋出 CircuitOpenError"""
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_in())
+
+    def retry_in(self) -> float:
+        """距離下次探測的秒數"""
+        with self._lock:
+            return self._retry_in(time.monotonic())
+
+    def record_success(self):
+        """回報成功，半開狀態下恢復正常"""
+        with self._lock:
+            self.stats['successes'] += 1
+            self.failures = 0
+            self._failure_sources.clear()
+            if self.state != STATE_CLOSED:
+                logger.info(f"🟢 {self.name} 探測成功，斷路器恢復正常")
+            self.state = STATE_CLOSED
+            self.recovery_timeout = self.base_recovery_timeout
+            self.opened_at = None
+            self._probe_started = None
+
+    def record_failure(self, error: Optional[object] = None, source: Optional[str] = None):
+        """回報失敗，達到門檻或探測失敗時開啟"""
+        now = time.monotonic()
+        with self._lock:
+            self.stats['failures'] += 1
+            self.failures += 1
+            self._failure_sources.add(source or '')
+            if error is not None:
+                self.last_error = str(error)[:200]
+
+            if self.state == STATE_HALF_OPEN:
+                # 探測失敗，冷卻時間加倍
+                self.recovery_timeout = min(self.max_recovery_timeout, self.recovery_timeout * 2)
+                self._open(now)
+            elif (self.state == STATE_CLOSED and self.failures >= self.failure_threshold
+                  and len(self._failure_sources) >= self.min_distinct_sources):
+                self._open(now)
+
+    def _open(self, now: float):
+        """開啟斷路器（呼叫前需持有鎖）"""
+        self.state = STATE_OPEN
+        self.opened_at = now
+        self._probe_started = None
+        self.stats['opened'] += 1
+        logger.warning(f"🔴 {self.name} 連續失敗 {self.failures} 次，斷路器開啟，"
+                       f"{self.recovery_timeout:.0f} 秒後再探測 (最後錯誤: {self.last_error})")
+
+    def get_status(self) -> Dict:
+        """取得斷路器狀態"""
+        with self._lock:
+            now = time.monotonic()
+            opened_at = None
+            if self.opened_at is not None:
+                opened_at = datetime.fromtimestamp(time.time() - (now - self.opened_at)).isoformat(timespec='seconds')
+            return {
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'opened_at': opened_at,
+                'retry_in': round(self._retry_in(now), 1) if self.state == STATE_OPEN else 0.0,
+                'last_error': self.last_error,
+                **self.stats
+            }
+
+
+class BreakerRegistry:
+    def __init__(self, category_threshold: int = DEFAULT_CATEGORY_THRESHOLD,
+                 host_threshold: int = DEFAULT_HOST_THRESHOLD,
+                 recovery_timeout: float = DEFAULT_RECOVERY_TIMEOUT):
+        """
+        初始化斷路器集合
+
+        Args:
+            category_threshold: 類別斷路器的連續失敗門檻
+            host_threshold: 主機斷路器的連續失敗門檻（失敗需來自至少兩個不同網址）
+            recovery_timeout: 開啟後多久進行探測
+        """
+        self.category_threshold = category_threshold
+        self.host_threshold = host_threshold
+        self.recovery_timeout = recovery_timeout
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def _get(self, name: str, threshold: int, min_distinct_sources: int = 1) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(name)
+            if breaker is None:
+                breaker = CircuitBreaker(name, threshold, self.recovery_timeout,
+                                         min_distinct_sources=min_distinct_sources)
+                self._breakers[name] = breaker
+            return breaker
+
+    def category(self, category: str) -> CircuitBreaker:
+        """取得類別斷路器"""
+        return self._get(f'category:{category}', self.category_threshold)
+
+    def host(self, url: str) -> CircuitBreaker:
+        """取得網址所屬主機的斷路器"""
+        host = urlparse(url).netloc or url
+        return self._get(f'host:{host}', self.host_threshold, min_distinct_sources=2)
+
+    def get_report(self) -> Dict[str, Dict]:
+        """取得所有斷路器的狀態"""
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {breaker.name: breaker.get_status() for breaker in breakers}
+
+    def log_report(self):
+        """輸出斷路器狀態，全部正常且從未開啟時只輸出一行"""
+        report = self.get_report()
+        tripped = {name: status for name, status in report.items()
+                   if status['state'] != STATE_CLOSED or status['opened']}
+        if not tripped:
+            if report:
+                logger.info(f"🟢 斷路器: {len(report)} 個全部正常")
+            return
+
+        for name, status in tripped.items():
+            retry = f"，{status['retry_in']:.0f} 秒後探測" if status['state'] == STATE_OPEN else ""
+            logger.info(f"{STATE_LABELS[status['state']]} {name}: 開啟 {status['opened']} 次，"
+                        f"拒絕 {status['rejected']} 個請求{retry}，最後錯誤: {status['last_error']}")
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts: int = 2, backoff_base: float = 2.0, backoff_cap: float = 60.0,
+                 breakers: Optional[BreakerRegistry] = None):
+        """
+        初始化重試策略
+
+        Args:
+            max_attempts: 每個操作最多嘗試次數（單一請求的限流重試由自適應控制器處理）
+            backoff_base: 退避的基準秒數
+            backoff_cap: 退避的上限秒數
+            breakers: 斷路器集合，未提供時使用共用的斷路器
+        """
+        self.max_attempts = max(max_attempts, 1)
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.breakers = breakers or get_shared_breakers()
+
+    async def run(self, operation: Callable[[], Awaitable], category: Optional[str] = None, label: str = ''):
+        """
+        執行操作，失敗時以指數退避重試，並回報類別斷路器
+
+        Raises:
+            CircuitOpenError: 類別斷路器開啟，操作沒有執行
+            最後一次嘗試的例外
+        """
+        breaker = self.breakers.category(category) if category else None
+        attempt = 0
+        while True:
+            if breaker:
+                breaker.check()
+            try:
+                result = await operation()
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                if breaker:
+                    breaker.record_failure(e)
+                attempt += 1
+                if attempt >= self.max_attempts or (breaker and breaker.state != STATE_CLOSED):
+                    raise
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_cap)
+                logger.info(f"🔁 {label or category or ''} 失敗: {e}，{delay:.1f} 秒後重試 ({attempt}/{self.max_attempts - 1})")
+                await asyncio.sleep(delay)
+            else:
+                if breaker:
+                    breaker.record_success()
+                return result
+
+
+_shared_breakers = None
+
+
+def get_shared_breakers() -> BreakerRegistry:
+    """取得所有爬蟲共用的斷路器集合"""
+    global _shared_breakers
+    if _shared_breakers is None:
+        _shared_breakers = BreakerRegistry()
+    return _shared_breakers
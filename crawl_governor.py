@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+每個主機共用的請求速率控制器
+以 Token Bucket 控制對同一主機的請求頻率，取代分散在各爬蟲中的固定等待
+"""
+
+import asyncio
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+# 平均每 4.5 秒一個請求，相當於原本 human_like_delay(3, 6) 的節奏
+DEFAULT_RATE_PER_SECOND = 1 / 4.5
+DEFAULT_BURST = 1
+
+
+class HostRateGovernor:
+    def __init__(self, rate_per_second: float = DEFAULT_RATE_PER_SECOND, burst: int = DEFAULT_BURST,
+                 host_rates: Optional[Dict[str, float]] = None):
+        """
+        初始化主機速率控制器
+
+        Args:
+            rate_per_second: 每個主機每秒補充的 token 數
+            burst: token 桶容量，即允許的瞬間請求數
+            host_rates: 個別主機的速率設定 {host: rate_per_second}
+        """
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.host_rates = host_rates or {}
+        self._buckets: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def _get_bucket(self, host: str, now: float) -> Dict:
+        """取得主機的 token 桶，不存在時建立"""
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = {
+                'tokens': float(self.burst),
+                'updated': now,
+                'rate': self.host_rates.get(host, self.rate_per_second),
+                'requests': 0,
+                'waited_seconds': 0.0
+            }
+            self._buckets[host] = bucket
+        return bucket
+
+    def reserve(self, url: str) -> float:
+        """預約一個 token，回傳需要等待的秒數"""
+        host = urlparse(url).netloc or url
+        now = time.monotonic()
+
+        with self._lock:
+            bucket = self._get_bucket(host, now)
+
+            # 依經過時間補充 token，上限為桶容量
+            elapsed = now - bucket['updated']
+            bucket['tokens'] = min(self.burst, bucket['tokens'] + elapsed * bucket['rate'])
+            bucket['updated'] = now
+
+            # token 可以預支為負數，讓後續請求依序排隊
+            bucket['tokens'] -= 1
+            wait = 0.0 if bucket['tokens'] >= 0 else -bucket['tokens'] / bucket['rate']
+
+            bucket['requests'] += 1
+            bucket['waited_seconds'] += wait
+
+        return wait
+
+    async def acquire(self, url: str):
+        """等待直到可以對該主機發出請求（asyncio 版本）"""
+        wait = self.reserve(url)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def acquire_sync(self, url: str):
+        """等待直到可以對該主機發出請求（同步版本）"""
+        wait = self.reserve(url)
+        if wait > 0:
+            time.sleep(wait)
+
+    def set_rate(self, host: str, rate_per_second: float):
+        """調整指定主機的速率"""
+        with self._lock:
+            self.host_rates[host] = rate_per_second
+            bucket = self._buckets.get(host)
+            if bucket:
+                bucket['rate'] = rate_per_second
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """取得各主機的請求統計"""
+        with self._lock:
+            return {
+                host: {
+                    'requests': bucket['requests'],
+                    'rate_per_second': bucket['rate'],
+                    'waited_seconds': round(bucket['waited_seconds'], 2)
+                }
+                for host, bucket in self._buckets.items()
+            }
+
+
+_shared_governor = None
+
+
+def get_shared_governor() -> HostRateGovernor:
+    """取得所有爬蟲共用的速率控制器"""
+    global _shared_governor
+    if _shared_governor is None:
+        _shared_governor = HostRateGovernor()
+    return _shared_governor
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+可恢復的爬取日誌
+每完成一個產品就以 JSON Lines 附加一筆紀錄並寫入磁碟，程式中斷後重新執行時自動略過已完成的產品，
+全部完成並寫回類別 JSON 後刪除日誌
+"""
+
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from page_cache import normalize_url
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOURNAL_DIR = 'data/crawl_journal'
+
+# 超過這個時間的日誌紀錄視為過期，不再用於恢復
+DEFAULT_MAX_AGE_HOURS = 24
+
+
+class CrawlJournal:
+    def __init__(self, category: str, namespace: Optional[str] = None, journal_dir: str = DEFAULT_JOURNAL_DIR,
+                 max_age_hours: float = DEFAULT_MAX_AGE_HOURS, fsync: bool = True):
+        """
+        初始化爬取日誌
+
+        Args:
+            category: 產品類別，每個類別一個日誌檔
+            namespace: 日誌子目錄，寫出不同內容（例如概覽長度上限不同）的更新器各自使用，
+                       不會恢復到另一個更新器的紀錄
+            journal_dir: 日誌目錄
+            max_age_hours: 恢復時只採用多久內的紀錄
+            fsync: 每筆紀錄都強制寫入磁碟，機器被回收時也不會遺失
+        """
+        self.category = category
+        self.path = os.path.join(journal_dir, namespace or '', f'{category}.jsonl')
+        self.max_age = timedelta(hours=max_age_hours)
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._file = None
+
+    def load(self) -> Dict[str, Dict]:
+        """
+        讀取上次中斷前完成的紀錄
+
+        Returns:
+            {正規化網址: 紀錄}，同一網址有多筆時以最後一筆為準
+        """
+        if not os.path.exists(self.path):
+            return {}
+
+        cutoff = datetime.now() - self.max_age
+        completed = {}
+        skipped = 0
+        with open(self.path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # 中斷時寫到一半的最後一行
+                    skipped += 1
+                    continue
+
+                if datetime.fromisoformat(entry['completed_at']) < cutoff:
+                    skipped += 1
+                    continue
+                completed[normalize_url(entry['url'])] = entry
+
+        if completed:
+            logger.info(f"🔁 {self.category.upper()} 爬取日誌: 恢復 {len(completed)} 個已完成的產品"
+                        + (f"，略過 {skipped} 筆無效或過期紀錄" if skipped else ""))
+        return completed
+
+    def _has_partial_line(self) -> bool:
+        """上次中斷時最後一行可能沒寫完，需先補上換行避免與新紀錄黏在同一行"""
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return False
+        with open(self.path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b'\n'
+
+    def record(self, url: str, overview: str):
+        """附加一筆完成紀錄"""
+        entry = json.dumps({
+            'url': url,
+            'overview': overview,
+            'completed_at': datetime.now().isoformat()
+        }, ensure_ascii=False)
+
+        with self._lock:
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                needs_newline = self._has_partial_line()
+                self._file = open(self.path, 'a', encoding='utf-8')
+                if needs_newline:
+                    self._file.write('\n')
+            self._file.write(entry + '\n')
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+    def close(self):
+        """關閉日誌檔"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def clear(self):
+        """類別 JSON 已寫回後刪除日誌"""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多行程分片爬取
+協調者把產品網址放進持久化的 SQLite 佇列，多個工作行程各自持有 HTTP 連線或瀏覽器上下文，
+一次租用一個網址並回報結果；租約逾時的網址重新排入佇列，單一緩慢的頁面不會拖住其他網址
+"""
+
+import asyncio
+import functools
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from crawl_governor import DEFAULT_RATE_PER_SECOND
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_PATH = 'data/crawl_queue.sqlite'
+DEFAULT_LEASE_SECONDS = 120.0
+DEFAULT_MAX_ATTEMPTS = 3
+# 佇列暫時沒有可租用的網址（其他工作行程仍在處理）時的等待間隔
+IDLE_POLL_SECONDS = 0.5
+
+STATUS_PENDING = 'pending'
+STATUS_LEASED = 'leased'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job TEXT NOT NULL,
+    category TEXT,
+    url TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    result TEXT,
+    error TEXT,
+    updated_at REAL NOT NULL,
+    UNIQUE (job, url)
+);
+CREATE INDEX IF NOT EXISTS tasks_job_status ON tasks (job, status);
+"""
+
+
+class CrawlQueue:
+    def __init__(self, path: str = DEFAULT_QUEUE_PATH, lease_seconds: float = DEFAULT_LEASE_SECONDS,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        """
+        初始化爬取佇列
+
+        Args:
+            path: SQLite 檔案路徑，多個行程可同時存取
+            lease_seconds: 租約時間，逾時未回報的網址重新排入佇列
+            max_attempts: 每個網址最多嘗試次數，超過後標記為失敗
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # 瀏覽器工作行程在背景執行緒依序操作佇列，連線不限定建立它的執行緒
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _transaction(self):
+        """立即取得寫入鎖，避免多個工作行程租到同一個網址"""
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield self._conn
+        except Exception:
+            self._conn.execute('ROLLBACK')
+            raise
+        else:
+            self._conn.execute('COMMIT')
+
+    def enqueue(self, job: str, items: Iterable[Tuple[Optional[str], str]]) -> int:
+        """
+        加入網址，同一工作中已存在的網址保持原狀（已完成的不會重新抓取）
+
+        Args:
+            job: 工作名稱，例如 overview:mac
+            items: [(類別, 網址)]
+
+        Returns:
+            新加入的網址數量
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                'INSERT OR IGNORE INTO tasks (job, category, url, updated_at) VALUES (?, ?, ?, ?)',
+                [(job, category, url, now) for category, url in items]
+            )
+            return conn.total_changes - before
+
+    def _expire_leases(self, conn, job: str, now: float):
+        """租約逾時的網址重新排入佇列，超過嘗試次數的標記為失敗"""
+        conn.execute(
+            "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "lease_owner = NULL, error = COALESCE(error, '租約逾時'), updated_at = ? "
+            "WHERE job = ? AND status = 'leased' AND lease_expires < ?",
+            (self.max_attempts, now, job, now)
+        )
+
+    def lease(self, job: str, worker_id: str) -> Optional[Dict]:
+        """
+        租用一個待處理的網址
+
+        Returns:
+            {'id', 'category', 'url', 'attempts'}，沒有待處理網址時回傳 None
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            self._expire_leases(conn, job, now)
+            row = conn.execute(
+                "SELECT id, category, url, attempts FROM tasks WHERE job = ? AND status = 'pending' "
+                "ORDER BY attempts, id LIMIT 1",
+                (job,)
+            ).fetchone()
+            if not row:
+                return None
+            conn.execute(
+                "UPDATE tasks SET status = 'leased', lease_owner = ?, lease_expires = ?, "
+                "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (worker_id, now + self.lease_seconds, now, row[0])
+            )
+        return {'id': row[0], 'category': row[1], 'url': row[2], 'attempts': row[3] + 1}
+
+    def complete(self, task_id: int, worker_id: str, result) -> bool:
+        """回報成功；租約已被收回時回傳 False，結果以重新租用者為準"""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET status = 'done', result = ?, error = NULL, lease_owner = NULL, updated_at = ? "
+                "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (json.dumps(result, ensure_ascii=False), time.time(), task_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, task_id: int, worker_id: str, error: object):
+        """回報失敗，未超過嘗試次數時重新排入佇列"""
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "error = ?, lease_owner = NULL, updated_at = ? "
+                "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (self.max_attempts, str(error)[:500], time.time(), task_id, worker_id)
+            )
+
+    def counts(self, job: str) -> Dict[str, int]:
+        """各狀態的網址數量"""
+        counts = {STATUS_PENDING: 0, STATUS_LEASED: 0, STATUS_DONE: 0, STATUS_FAILED: 0}
+        for status, count in self._conn.execute(
+                'SELECT status, COUNT(*) FROM tasks WHERE job = ? GROUP BY status', (job,)):
+            counts[status] = count
+        return counts
+
+    def is_finished(self, job: str) -> bool:
+        """所有網址都已完成或失敗"""
+        with self._transaction() as conn:
+            self._expire_leases(conn, job, time.time())
+        counts = self.counts(job)
+        return counts[STATUS_PENDING] == 0 and counts[STATUS_LEASED] == 0
+
+    def results(self, job: str) -> Dict[str, object]:
+        """
+        取得工作結果
+
+        Returns:
+            {url: 結果}，失敗的網址結果為 None
+        """
+        return {
+            url: json.loads(result) if status == STATUS_DONE else None
+            for url, status, result in self._conn.execute(
+                "SELECT url, status, result FROM tasks WHERE job = ? AND status IN ('done', 'failed')", (job,))
+        }
+
+    def clear(self, job: str):
+        """刪除工作的所有紀錄"""
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM tasks WHERE job = ?', (job,))
+
+    def close(self):
+        self._conn.close()
+
+
+def _http_worker(queue: CrawlQueue, job: str, worker_id: str, requests_per_second: float,
+                 parser_backend: Optional[str]) -> int:
+    """以自己的 HTTP 連線抓取並解析產品頁面"""
+    from production_overview_updater import ProductionOverviewUpdater
+
+    # 明確指定速率時更新器的速率控制器不允許瞬間突發，一次只發出一個請求
+    updater = ProductionOverviewUpdater(concurrency=1, requests_per_second=requests_per_second,
+                                        parser_backend=parser_backend)
+    processed = 0
+    while True:
+        task = queue.lease(job, worker_id)
+        if task is None:
+            if queue.is_finished(job):
+                break
+            time.sleep(IDLE_POLL_SECONDS)
+            continue
+
+        try:
+            overview = updater.parse_overview_html(updater.fetch_page(task['url']), task['category'])
+            queue.complete(task['id'], worker_id, overview)
+            processed += 1
+        except Exception as e:
+            queue.fail(task['id'], worker_id, e)
+
+    updater.page_cache.save()
+    return processed
+
+
+async def _in_thread(func, *args):
+    """在背景執行緒執行 SQLite 操作（部署環境為 Python 3.8，沒有 asyncio.to_thread）"""
+    return await asyncio.get_running_loop().run_in_executor(None, functools.partial(func, *args))
+
+
+async def _browser_worker(queue: CrawlQueue, job: str, worker_id: str, requests_per_second: float) -> int:
+    """以自己的瀏覽器上下文載入並擷取產品頁面"""
+    from adaptive_controller import AdaptiveCrawlController
+    from browser_pool import BrowserPool
+    from crawl_governor import HostRateGovernor
+    from enhanced_apple_scraper import EnhancedAppleScraper
+
+    # 每個工作行程一次只發出一個請求，所有行程合計不超過協調者的速率上限
+    controller = AdaptiveCrawlController(governor=HostRateGovernor(rate_per_second=requests_per_second, burst=1),
+                                         max_limit=1)
+    processed = 0
+    async with BrowserPool(max_contexts=1) as pool:
+        scraper = EnhancedAppleScraper(browser_pool=pool, controller=controller)
+        while True:
+            task = await _in_thread(queue.lease, job, worker_id)
+            if task is None:
+                if await _in_thread(queue.is_finished, job):
+                    break
+                await asyncio.sleep(IDLE_POLL_SECONDS)
+                continue
+
+            try:
+                async with pool.page(scraper.setup_browser_context, profile='enhanced') as page:
+                    details = await scraper.extract_product_details(page, task['url'], task['category'])
+                if not details:
+                    raise RuntimeError("無法擷取產品頁面")
+                await _in_thread(queue.complete, task['id'], worker_id, details['產品概覽'])
+                processed += 1
+            except Exception as e:
+                await _in_thread(queue.fail, task['id'], worker_id, e)
+
+    return processed
+
+
+def run_worker(queue_path: str, job: str, mode: str, requests_per_second: float,
+               lease_seconds: float, max_attempts: int, parser_backend: Optional[str] = None) -> int:
+    """工作行程進入點，處理到佇列中沒有待處理網址為止"""
+    worker_id = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+    queue = CrawlQueue(queue_path, lease_seconds, max_attempts)
+    try:
+        if mode == 'browser':
+            processed = asyncio.run(_browser_worker(queue, job, worker_id, requests_per_second))
+        else:
+            processed = _http_worker(queue, job, worker_id, requests_per_second, parser_backend)
+        logger.info(f"👷 工作行程 {worker_id} 完成 {processed} 個網址")
+        return processed
+    finally:
+        queue.close()
+
+
+class ShardedCrawlCoordinator:
+    def __init__(self, workers: Optional[int] = None, mode: str = 'http',
+                 requests_per_second: float = DEFAULT_RATE_PER_SECOND,
+                 queue_path: str = DEFAULT_QUEUE_PATH, lease_seconds: float = DEFAULT_LEASE_SECONDS,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS, parser_backend: Optional[str] = None):
+        """
+        初始化分片爬取協調者
+
+        Args:
+            workers: 工作行程數，預設為 CPU 核心數
+            mode: http（requests 連線 + HTML 解析）或 browser（Playwright 瀏覽器上下文）
+            requests_per_second: 所有工作行程合計的請求速率上限，平均分配給各行程；
+                                 預設與共用速率控制器相同（約每 4.5 秒一個請求）
+            queue_path: SQLite 佇列路徑
+            lease_seconds: 租約時間
+            max_attempts: 每個網址最多嘗試次數
+            parser_backend: HTTP 模式使用的 HTML 解析後端
+        """
+        self.workers = max(workers or os.cpu_count() or 1, 1)
+        self.mode = mode
+        self.requests_per_second = requests_per_second
+        self.queue_path = queue_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.parser_backend = parser_backend
+        self.stats: Dict[str, int] = {}
+
+    def run(self, job: str, items: List[Tuple[Optional[str], str]]) -> Dict[str, object]:
+        """
+        將網址排入佇列並啟動工作行程，全部完成後回傳結果
+
+        已在佇列中完成的網址（上次中斷前）不會重新抓取
+
+        Returns:
+            {url: 結果}，失敗的網址結果為 None
+        """
+        queue = CrawlQueue(self.queue_path, self.lease_seconds, self.max_attempts)
+        try:
+            added = queue.enqueue(job, items)
+            counts = queue.counts(job)
+            pending = counts[STATUS_PENDING] + counts[STATUS_LEASED]
+            if counts[STATUS_DONE]:
+                logger.info(f"🔁 {job}: 佇列中已有 {counts[STATUS_DONE]} 個完成的網址")
+
+            workers = min(self.workers, pending)
+            if workers:
+                logger.info(f"👷 {job}: 新增 {added} 個網址，啟動 {workers} 個工作行程 ({self.mode})")
+                self._run_workers(job, workers)
+
+            self.stats = queue.counts(job)
+            return queue.results(job)
+        finally:
+            queue.close()
+
+    def _run_workers(self, job: str, workers: int):
+        """啟動工作行程並等待全部結束"""
+        context = multiprocessing.get_context('spawn')
+        rate = self.requests_per_second / workers
+        processes = [
+            context.Process(target=run_worker, args=(self.queue_path, job, self.mode, rate,
+                                                     self.lease_seconds, self.max_attempts,
+                                                     self.parser_backend))
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        crashed = sum(1 for process in processes if process.exitcode != 0)
+        if crashed:
+            # 所有工作行程都已結束，剩下的租約不會再有人處理，由協調者在租約逾時後接手
+            logger.warning(f"⚠️ {crashed} 個工作行程異常結束，由協調者接手未完成的網址")
+            run_worker(self.queue_path, job, self.mode, rate, self.lease_seconds, self.max_attempts,
+                       self.parser_backend)
+
+    def clear(self, job: str):
+        """結果已寫回後刪除工作紀錄"""
+        queue = CrawlQueue(self.queue_path, self.lease_seconds, self.max_attempts)
+        try:
+            queue.clear(job)
+        finally:
+            queue.close()
@@ -10,6 +10,7 @@ import os
 from datetime import datetime, date, timedelta
 import random
 from chatgpt_query import AppleRefurbishedQuery
+from product_key import product_id
 
 def create_sample_price_history():
     """建立範例價格歷史資料"""
@@ -27,7 +28,7 @@ def create_sample_price_history():
         products = query_system.search_by_category(category)
         for product in products:
             all_products.append({
-                'product_id': f"{category}_{hash(product.get('產品標題', ''))%10000:04d}",
+                'product_id': product_id(product, category),
                 'title': product.get('產品標題', ''),
                 'category': category,
                 'base_price': int(product.get('產品售價', 'NT$0').replace('NT$', '').replace(',', '') or 0),
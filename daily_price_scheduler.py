@@ -5,10 +5,14 @@
 自動執行價格追蹤並發送降價通知
 """
 
+import asyncio
 import schedule
 import time
 import threading
 from datetime import datetime, date
+from typing import Dict, List, Optional
+from change_rate_scheduler import ChangeRateScheduler
+from product_image_cache import ProductImageCache
 from price_tracker import PriceTracker
 from linebot_service import bot_service, line_bot_api
 from linebot.models import TextSendMessage, FlexSendMessage
@@ -17,9 +21,20 @@ import firebase_admin
 from firebase_admin import credentials, firestore
 
 class DailyPriceScheduler:
-    def __init__(self):
-        """初始化每日價格排程器"""
+    def __init__(self, listing_refresh_hours: int = 3, adaptive: bool = True,
+                 change_rates: Optional[ChangeRateScheduler] = None):
+        """
+        初始化每日價格排程器
+        
+        Args:
+            listing_refresh_hours: 以列表頁快速更新價格的間隔（小時），只在停用 adaptive 時使用
+            adaptive: 依各類別的變動率決定列表頁更新頻率，取代固定間隔與 21:00 的價格追蹤
+            change_rates: 變動率排程，預設使用 data/change_rates.json 並由價格歷史學習
+        """
         self.price_tracker = PriceTracker()
+        self.listing_refresh_hours = listing_refresh_hours
+        self.adaptive = adaptive
+        self.change_rates = change_rates or (ChangeRateScheduler() if adaptive else None)
         self.firebase_requests = EnhancedFirebaseRequests()
         
         # 初始化 Firebase
@@ -68,6 +83,91 @@ class DailyPriceScheduler:
             print(f"❌ 每日價格追蹤失敗: {e}")
             self.log_error("daily_price_tracking", str(e))
     
+    def listing_price_refresh(self, categories: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """
+        只讀取類別列表頁更新價格，接著執行價格追蹤
+        
+        Args:
+            categories: 要更新的類別，預設為全部類別
+        
+        Returns:
+            {類別: 更新結果}，更新失敗的類別不會出現
+        """
+        try:
+            # Render 環境未安裝 Playwright，只在需要時載入爬蟲
+            from enhanced_apple_scraper import EnhancedAppleScraper
+        except ImportError as e:
+            print(f"⚠️ 無法載入爬蟲，略過列表頁價格更新: {e}")
+            return {}
+        
+        results = {}
+        try:
+            print(f"⚡ 開始以列表頁更新價格... {datetime.now()}")
+            results = asyncio.run(EnhancedAppleScraper().refresh_all_listings(categories=categories))
+            
+            for category, result in results.items():
+                if result['unchanged']:
+                    print(f"   - {category}: 列表與上次相同，略過")
+                    continue
+                print(f"   - {category}: {len(result['products'])} 個產品，"
+                      f"新產品 {result['new']}，價格變動 {result['changed']}")
+            
+            # 有變動的類別可能有新產品，先下載圖片，Line Bot 回應時不必處理圖片
+            changed_products = [product for result in results.values() if not result['unchanged']
+                                for product in result['products']]
+            if changed_products:
+                self.prefetch_product_images(changed_products)
+            
+            # 所有類別都沒有變動時，價格追蹤也不會有任何結果
+            if results and all(result['unchanged'] for result in results.values()):
+                print("⏭️ 所有類別列表都沒有變動，略過價格追蹤")
+                return results
+            
+            # 重新載入更新後的產品資料再追蹤價格
+            self.price_tracker.query_system.load_all_data()
+            self.daily_price_tracking()
+            
+        except Exception as e:
+            print(f"❌ 列表頁價格更新失敗: {e}")
+            self.log_error("listing_price_refresh", str(e))
+        
+        return results
+    
+    def prefetch_product_images(self, products):
+        """下載尚未快取的產品圖片並產生縮圖"""
+        try:
+            stats = asyncio.run(ProductImageCache().prefetch(products))
+            print(f"🖼️ 產品圖片: 下載 {stats['downloaded']} 個，已快取 {stats['cached']} 個")
+        except Exception as e:
+            print(f"⚠️ 產品圖片下載失敗: {e}")
+    
+    def adaptive_listing_refresh(self):
+        """只更新已到檢查時間的類別，並以結果更新各類別的變動率與檢查間隔"""
+        due = self.change_rates.due_categories()
+        if not due:
+            return
+        
+        print(f"📅 依變動率排程檢查: {', '.join(due)}")
+        results = self.listing_price_refresh(due)
+        
+        # 更新失敗的類別不加入觀察，改以指數退避延後下次檢查
+        for category in due:
+            if category in results:
+                self.change_rates.record_check(category, changed=not results[category]['unchanged'])
+            else:
+                self.change_rates.record_failure(category)
+        
+        self.update_change_rate_weights()
+        self.change_rates.log_plan()
+    
+    def update_change_rate_weights(self):
+        """以目前各類別的產品數作為變動率排程的權重"""
+        query_system = self.price_tracker.query_system
+        self.change_rates.set_product_counts({
+            category: len(query_system.search_by_category(category))
+            for category in self.change_rates.categories
+        })
+    
     def send_price_drop_notifications(self, price_changes):
         """發送降價通知給相關用戶"""
         if not self.db:
@@ -478,16 +578,30 @@ class DailyPriceScheduler:
         # 每天早上 9:00 執行價格追蹤
         schedule.every().day.at("09:00").do(self.daily_price_tracking)
         
-        # 每天晚上 21:00 執行價格追蹤
-        schedule.every().day.at("21:00").do(self.daily_price_tracking)
+        # 依變動率排程時，列表有變動就會追蹤價格，不需要固定的晚間追蹤
+        if not self.adaptive:
+            schedule.every().day.at("21:00").do(self.daily_price_tracking)
         
         # 每天晚上 22:00 生成每日報告
         schedule.every().day.at("22:00").do(self.generate_daily_report)
         
+        # 以列表頁快速更新價格，不訪問產品詳細頁面
+        if self.adaptive:
+            schedule.every(10).minutes.do(self.adaptive_listing_refresh)
+        else:
+            schedule.every(self.listing_refresh_hours).hours.do(self.listing_price_refresh)
+        
         print("⏰ 排程設定完成：")
         print("   - 每天 09:00 執行價格追蹤")
-        print("   - 每天 21:00 執行價格追蹤")
+        if not self.adaptive:
+            print("   - 每天 21:00 執行價格追蹤")
         print("   - 每天 22:00 生成每日報告")
+        if self.adaptive:
+            print(f"   - 依各類別變動率以列表頁更新價格（每日 {self.change_rates.requests_per_day:g} 個列表頁請求）")
+            self.update_change_rate_weights()
+            self.change_rates.log_plan()
+        else:
+            print(f"   - 每 {self.listing_refresh_hours} 小時以列表頁更新價格")
         
         # 立即執行一次（測試用）
         print("🔄 立即執行一次價格追蹤...")
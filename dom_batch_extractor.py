@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+瀏覽器端批次 DOM 擷取
+每次擷取只送出一個 page.evaluate，在瀏覽器內依序嘗試選擇器並一次回傳 JSON，
+取代逐一 query_selector_all / inner_text / get_attribute 的大量 CDP 往返
+"""
+
+import logging
+import re
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 與 LISTING_TILES_JS 內相同的零件編號格式，例如 FMFJ3TA/A
+PART_NUMBER_PATTERN = re.compile(r'/product/([A-Z0-9]{4,}/[A-Z])')
+
+# 類別列表頁的產品卡片選擇器（依序嘗試）
+LISTING_TILE_SELECTORS = [
+    'div[data-testid="product-tile"]',
+    '.rf-serp-productcard',
+    '.rf-refurb-producttile',
+    'a[href*="/product/"]'
+]
+
+# 產品卡片內的連結選擇器
+LISTING_LINK_SELECTORS = [
+    'a[href*="/product/"]',
+    '.rf-serp-productcard-link',
+    'a'
+]
+
+# 產品卡片內的標題選擇器
+LISTING_TITLE_SELECTORS = [
+    '.rf-serp-productcard-title',
+    '[data-autom="product-title"]',
+    'h3',
+    'h2',
+    'a[href*="/product/"]'
+]
+
+# 產品卡片內的價格選擇器
+LISTING_PRICE_SELECTORS = [
+    '.rf-serp-productcard-price',
+    '[data-autom="price"]',
+    '.rf-refurb-producttile-currentprice',
+    '.price'
+]
+
+LISTING_TILES_JS = """
+(args) => {
+    const partNumberPattern = /\\/product\\/([A-Z0-9]{4,}\\/[A-Z])/;
+    const firstMatch = (root, selectors) => {
+        for (const selector of selectors) {
+            const element = root.matches && root.matches(selector) ? root : root.querySelector(selector);
+            if (element) return element;
+        }
+        return null;
+    };
+    const textOf = (element) => element ? (element.innerText || element.textContent || '').trim() : '';
+
+    let tiles = [];
+    let usedSelector = null;
+    for (const selector of args.tileSelectors) {
+        const found = document.querySelectorAll(selector);
+        if (found.length) {
+            tiles = Array.from(found);
+            usedSelector = selector;
+            break;
+        }
+    }
+
+    const seen = new Set();
+    const results = [];
+    for (const tile of tiles) {
+        const link = firstMatch(tile, args.linkSelectors);
+        if (!link) continue;
+        const href = link.getAttribute('href') || '';
+        if (!href.includes('/product/')) continue;
+
+        const url = new URL(href, args.baseUrl).href;
+        if (seen.has(url)) continue;
+        seen.add(url);
+
+        let price = '';
+        const priceElement = firstMatch(tile, args.priceSelectors);
+        if (priceElement) {
+            price = textOf(priceElement);
+        } else {
+            const match = textOf(tile).match(/NT\\$[\\d,]+/);
+            price = match ? match[0] : '';
+        }
+
+        const partMatch = url.match(partNumberPattern);
+        results.push({
+            title: textOf(firstMatch(tile, args.titleSelectors)),
+            price: price,
+            url: url,
+            part_number: partMatch ? partMatch[1] : null
+        });
+        if (args.limit && results.length >= args.limit) break;
+    }
+
+    return {selector: usedSelector, tiles: results};
+}
+"""
+
+FIRST_TEXT_JS = """
+(args) => {
+    for (const selector of args.selectors) {
+        const element = document.querySelector(selector);
+        if (!element) continue;
+        const text = (element.innerText || '').trim();
+        if (!text) continue;
+        if (args.mustContain && !text.includes(args.mustContain)) continue;
+        return {selector: selector, text: text};
+    }
+    return {selector: null, text: ''};
+}
+"""
+
+SECTION_TEXT_JS = """
+(args) => {
+    for (const selector of args.selectors) {
+        const elements = document.querySelectorAll(selector);
+        if (!elements.length) continue;
+        let text = '';
+        for (const element of elements) {
+            const value = (element.innerText || '').trim();
+            if (value && value.length > args.minLength) {
+                text += value + '\\n\\n';
+            }
+        }
+        if (text) return {selector: selector, text: text};
+    }
+    return {selector: null, text: ''};
+}
+"""
+
+
+def extract_part_number(url: str) -> Optional[str]:
+    """從產品網址取出 Apple 零件編號"""
+    match = PART_NUMBER_PATTERN.search(url or '')
+    return match.group(1) if match else None
+
+
+async def extract_listing_tiles(page, limit: Optional[int] = None,
+                                base_url: str = 'https://www.apple.com') -> Dict:
+    """
+    一次取得列表頁所有產品卡片的標題、價格、網址與零件編號
+
+    Returns:
+        {'selector': 命中的卡片選擇器, 'tiles': [{'title', 'price', 'url', 'part_number'}, ...]}
+    """
+    result = await page.evaluate(LISTING_TILES_JS, {
+        'tileSelectors': LISTING_TILE_SELECTORS,
+        'linkSelectors': LISTING_LINK_SELECTORS,
+        'titleSelectors': LISTING_TITLE_SELECTORS,
+        'priceSelectors': LISTING_PRICE_SELECTORS,
+        'baseUrl': base_url,
+        'limit': limit or 0
+    })
+
+    if result['selector']:
+        logger.info(f"✅ 找到 {len(result['tiles'])} 個產品卡片 (選擇器: {result['selector']})")
+    return result
+
+
+async def extract_first_text(page, selectors: List[str], must_contain: Optional[str] = None) -> str:
+    """依序嘗試選擇器，回傳第一個有內容的元素文字"""
+    result = await page.evaluate(FIRST_TEXT_JS, {
+        'selectors': selectors,
+        'mustContain': must_contain
+    })
+    return result['text']
+
+
+async def extract_section_text(page, selectors: List[str], min_length: int) -> Tuple[Optional[str], str]:
+    """
+    依序嘗試選擇器，合併第一個命中選擇器下所有足夠長的元素文字
+
+    Returns:
+        (命中的選擇器, 以空行分隔的文字)
+    """
+    result = await page.evaluate(SECTION_TEXT_JS, {
+        'selectors': selectors,
+        'minLength': min_length
+    })
+    return result['selector'], result['text']
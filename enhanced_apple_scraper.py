@@ -7,21 +7,57 @@
 
 import asyncio
 import json
-import re
 import os
 from datetime import datetime
-from playwright.async_api import async_playwright
 import logging
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
 from typing import Dict, List, Optional
 import time
+from browser_pool import BrowserPool
+from adaptive_controller import AdaptiveCrawlController, goto_with_backoff, resolve_controller
+from circuit_breaker import CircuitOpenError, RetryPolicy
+from crawl_governor import HostRateGovernor
+from request_blocking import ResourceBlocker
+from bootstrap_extractor import BootstrapListingExtractor
+from dom_batch_extractor import extract_first_text, extract_listing_tiles
+from listing_fingerprint import ListingFingerprintStore, listing_fingerprint
+from product_key import index_by_key, product_key
+from overview_extractor import BASIC_UNWANTED_PATTERNS, OverviewExtractor
+from result_writer import StreamingResultWriter, write_json_atomic
 
 # 設定日誌
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 class EnhancedAppleScraper:
-    def __init__(self):
-        """初始化增強版爬蟲"""
+    def __init__(self, browser_pool: Optional[BrowserPool] = None,
+                 governor: Optional[HostRateGovernor] = None,
+                 resource_blocker: Optional[ResourceBlocker] = None,
+                 bootstrap_extractor: Optional[BootstrapListingExtractor] = None,
+                 controller: Optional[AdaptiveCrawlController] = None):
+        """
+        初始化增強版爬蟲
+        
+        Args:
+            browser_pool: 共用瀏覽器池，未提供時每次爬取自行建立
+            governor: 主機速率控制器，未提供時使用所有爬蟲共用的控制器
+            resource_blocker: 請求攔截器，預設中止圖片、字型、影片與追蹤請求
+            bootstrap_extractor: 列表頁內嵌 JSON 擷取器，優先以 HTTP 取得列表頁
+            controller: 自適應控制器，依伺服器回應調整速度；未提供時依 governor 建立或使用共用的控制器
+        """
+        self.browser_pool = browser_pool
+        # run_pool 建立的池，asyncio.gather 建立的子工作會繼承，巢狀的 run_pool 直接沿用
+        self._run_pool: ContextVar[Optional[BrowserPool]] = ContextVar(f'run_pool_{id(self)}', default=None)
+        self.controller = resolve_controller(controller, governor)
+        self.governor = self.controller.governor
+        self.breakers = self.controller.breakers
+        self.retry_policy = RetryPolicy(breakers=self.breakers)
+        self.resource_blocker = resource_blocker or ResourceBlocker()
+        # 列表爬蟲原本只移除購買按鈕與法律聲明，不過濾短行
+        self.overview_extractor = OverviewExtractor(unwanted_patterns=BASIC_UNWANTED_PATTERNS, filter_short_lines=False)
+        self.fingerprints = ListingFingerprintStore()
+        
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
@@ -37,6 +73,10 @@ class EnhancedAppleScraper:
             'Cache-Control': 'max-age=0'
         }
         
+        self.bootstrap_extractor = bootstrap_extractor or BootstrapListingExtractor(
+            headers=self.headers, controller=self.controller
+        )
+        
         self.categories = {
             'mac': 'https://www.apple.com/tw/shop/refurbished/mac',
             'ipad': 'https://www.apple.com/tw/shop/refurbished/ipad',
@@ -47,6 +87,27 @@ class EnhancedAppleScraper:
             'accessories': 'https://www.apple.com/tw/shop/refurbished/accessories'
         }
 
+    @asynccontextmanager
+    async def run_pool(self, max_contexts: int = 4):
+        """
+        一次爬取期間共用瀏覽器池：已有共用池或外層爬取的池時直接使用，否則建立並於結束時關閉
+        
+        建立的池只記錄在目前的 asyncio context，不寫回 self.browser_pool；
+        同一個爬蟲同時進行的兩次爬取各自使用自己的池，一方結束關閉池時不會影響另一方
+        """
+        pool = self.browser_pool or self._run_pool.get()
+        if pool:
+            yield pool
+            return
+        
+        pool = BrowserPool(max_contexts=max_contexts)
+        token = self._run_pool.set(pool)
+        try:
+            yield pool
+        finally:
+            self._run_pool.reset(token)
+            await pool.close()
+
     async def setup_browser_context(self, browser):
         """設定瀏覽器上下文"""
         context = await browser.new_context(
@@ -58,278 +119,452 @@ class EnhancedAppleScraper:
         )
         
         await context.set_geolocation({'latitude': 25.0330, 'longitude': 121.5654})
+        await self.resource_blocker.attach(context)
         return context
 
-    async def extract_product_overview(self, page, product_url: str) -> str:
+    async def navigate_to_product(self, page, product_url: str):
+        """訪問產品詳細頁面（由自適應控制器決定何時可以發出請求）"""
+        await goto_with_backoff(self.controller, page, product_url,
+                                wait_until=self.resource_blocker.wait_until, timeout=30000)
+        # 等待頁面腳本完成渲染
+        await asyncio.sleep(1)
+
+    async def extract_product_overview(self, page, product_url: str, category: Optional[str] = None) -> str:
         """從產品詳細頁面提取完整的產品概覽"""
         try:
             logger.info(f"🔍 提取產品概覽: {product_url}")
             
             # 訪問產品詳細頁面
-            await page.goto(product_url, wait_until='networkidle', timeout=30000)
-            await asyncio.sleep(2)
-            
-            # 嘗試多種選擇器來找到產品概覽區域
-            overview_selectors = [
-                '.rc-pdsection-mainpanel.column.large-9.small-12',
-                '.rc-pdsection-mainpanel',
-                '.pd-overview',
-                '.pd-highlights',
-                '[data-module-template="pd/overview"]',
-                '.pd-overview-content',
-                '.rf-pdp-overview'
-            ]
+            await self.navigate_to_product(page, product_url)
             
-            overview_text = ""
-            
-            for selector in overview_selectors:
-                try:
-                    elements = await page.query_selector_all(selector)
-                    if elements:
-                        logger.info(f"✅ 找到概覽區域: {selector}")
-                        
-                        for element in elements:
-                            # 提取文字內容
-                            text = await element.inner_text()
-                            if text and len(text.strip()) > 50:  # 確保有足夠的內容
-                                overview_text += text.strip() + "\n\n"
-                        
-                        if overview_text:
-                            break
-                            
-                except Exception as e:
-                    logger.debug(f"選擇器 {selector} 失敗: {e}")
-                    continue
-            
-            # 如果沒有找到概覽區域，嘗試提取產品規格
-            if not overview_text:
-                logger.info("🔄 嘗試提取產品規格...")
-                overview_text = await self.extract_product_specs(page)
-            
-            # 清理和格式化文字
-            if overview_text:
-                overview_text = self.clean_overview_text(overview_text)
-                logger.info(f"✅ 成功提取概覽 ({len(overview_text)} 字元)")
-                return overview_text
-            else:
-                logger.warning("⚠️ 未能提取到產品概覽")
-                return ""
+            return await self.extract_overview_from_page(page, category=category)
                 
         except Exception as e:
             logger.error(f"❌ 提取產品概覽失敗: {e}")
             return ""
 
-    async def extract_product_specs(self, page) -> str:
-        """提取產品規格資訊"""
-        specs_text = ""
-        
-        # 嘗試多種規格選擇器
-        spec_selectors = [
-            '.rf-pdp-techspecs',
-            '.pd-techspecs',
-            '.rf-pdp-highlights',
-            '.pd-highlights',
-            '.rf-pdp-overview-content',
-            '.pd-overview-content',
-            '[data-module-template="pd/techspecs"]',
-            '.rf-pdp-content'
-        ]
+    async def extract_overview_from_page(self, page, specs_text: Optional[str] = None,
+                                         category: Optional[str] = None) -> str:
+        """
+        從已載入的產品頁面提取概覽
         
-        for selector in spec_selectors:
-            try:
-                elements = await page.query_selector_all(selector)
-                if elements:
-                    logger.info(f"✅ 找到規格區域: {selector}")
-                    
-                    for element in elements:
-                        text = await element.inner_text()
-                        if text and len(text.strip()) > 30:
-                            specs_text += text.strip() + "\n\n"
-                    
-                    if specs_text:
-                        break
-                        
-            except Exception as e:
-                logger.debug(f"規格選擇器 {selector} 失敗: {e}")
-                continue
+        Args:
+            page: 已載入產品詳細頁面的分頁
+            specs_text: 已提取的規格文字，找不到概覽時直接使用，避免重複查詢
+            category: 產品類別，用於優先嘗試該類別常命中的選擇器
+        """
+        return await self.overview_extractor.extract_from_page(page, category, specs_text)
+
+    async def extract_product_specs(self, page, category: Optional[str] = None) -> str:
+        """提取產品規格資訊"""
+        selector, specs_text = await self.overview_extractor.find_section_in_page(page, 'specs', category)
+        if selector:
+            logger.info(f"✅ 找到規格區域: {selector}")
         
         return specs_text
 
-    def clean_overview_text(self, text: str) -> str:
-        """清理和格式化概覽文字"""
-        if not text:
-            return ""
+    async def scrape_category_with_details(self, category: str, limit: int = 5, save: bool = False) -> List[Dict]:
+        """
+        爬取指定類別的產品並提取詳細概覽
         
-        # 移除多餘的空白和換行
-        text = re.sub(r'\n\s*\n', '\n', text)
-        text = re.sub(r'\s+', ' ', text)
-        
-        # 移除不需要的內容
-        unwanted_patterns = [
-            r'加入購物車.*',
-            r'立即購買.*',
-            r'選擇.*',
-            r'Cookie.*',
-            r'隱私權.*',
-            r'使用條款.*',
-            r'©.*Apple.*',
-            r'台灣.*'
-        ]
-        
-        for pattern in unwanted_patterns:
-            text = re.sub(pattern, '', text, flags=re.IGNORECASE)
+        Args:
+            save: 爬取過程中逐一寫入產品，結束時原子替換 apple_refurbished_<category>_enhanced.json
+        """
+        self.resource_blocker.reset()
+        products = await self._scrape_category(category, limit, save)
+        self.resource_blocker.log_report(f"{category.upper()} ")
+        self.overview_extractor.selector_stats.save()
+        return products
+
+    async def _scrape_category(self, category: str, limit: int, save: bool = False) -> List[Dict]:
+        """選擇瀏覽器池並爬取單一類別"""
+        logger.info(f"🚀 開始爬取 {category.upper()} 類別的詳細資訊...")
         
-        # 限制長度
-        if len(text) > 1000:
-            text = text[:1000] + "..."
+        writer = StreamingResultWriter(self.enhanced_products_path(category)).open() if save else None
+        products = []
+        try:
+            async with self.run_pool() as pool:
+                products = await self._scrape_category_in_pool(pool, category, limit, writer)
+        finally:
+            # 沒有爬到任何產品或中途中斷時保留原本的檔案
+            if writer:
+                if products:
+                    writer.commit()
+                else:
+                    writer.abort()
         
-        return text.strip()
+        logger.info(f"🎉 {category.upper()} 類別爬取完成，共 {len(products)} 個產品")
+        return products
 
-    async def scrape_category_with_details(self, category: str, limit: int = 5) -> List[Dict]:
-        """爬取指定類別的產品並提取詳細概覽"""
-        logger.info(f"🚀 開始爬取 {category.upper()} 類別的詳細資訊...")
+    async def scrape_all_categories_with_details(self, limit: int = 5, concurrency: int = 3,
+                                                 categories: Optional[List[str]] = None,
+                                                 save: bool = False) -> Dict[str, List[Dict]]:
+        """
+        同時爬取多個類別
+        
+        Args:
+            limit: 每個類別爬取的產品數量
+            concurrency: 同時進行的類別數量，實際請求頻率由主機速率控制器限制
+            categories: 要爬取的類別，預設為全部類別
+            save: 爬取過程中逐一寫入各類別的增強版檔案
+        """
+        categories = categories or list(self.categories.keys())
+        logger.info(f"🚀 開始爬取 {len(categories)} 個類別 (同時 {concurrency} 個)...")
+        self.resource_blocker.reset()
+        
+        semaphore = asyncio.Semaphore(max(concurrency, 1))
+        
+        async def run_category(category):
+            async with semaphore:
+                return category, await self._scrape_category(category, limit, save)
+        
+        async with self.run_pool(max_contexts=max(concurrency, 1)):
+            outcomes = await asyncio.gather(*[run_category(category) for category in categories])
+        
+        for host, stats in self.governor.get_stats().items():
+            logger.info(f"⏱️ {host}: {stats['requests']} 個請求，速率控制等待 {stats['waited_seconds']} 秒")
+        self.controller.log_stats()
+        self.breakers.log_report()
+        self.resource_blocker.log_report()
+        self.overview_extractor.selector_stats.save()
         
+        return dict(outcomes)
+
+    async def _scrape_category_in_pool(self, pool: BrowserPool, category: str, limit: int,
+                                       writer: Optional[StreamingResultWriter] = None) -> List[Dict]:
+        """使用瀏覽器池爬取類別頁面與產品詳細頁面，提供 writer 時每完成一個產品就寫入"""
         products = []
         
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(
-                headless=False,
-                args=[
-                    '--no-sandbox',
-                    '--disable-blink-features=AutomationControlled',
-                    '--disable-web-security'
-                ]
-            )
+        try:
+            # 訪問類別頁面
+            category_url = self.categories.get(category)
+            if not category_url:
+                logger.error(f"❌ 未知類別: {category}")
+                return products
             
-            context = await self.setup_browser_context(browser)
-            page = await context.new_page()
+            tiles = await self.scrape_category_listing(category, limit)
+            product_links = [tile['url'] for tile in tiles]
             
-            try:
-                # 訪問類別頁面
-                category_url = self.categories.get(category)
-                if not category_url:
-                    logger.error(f"❌ 未知類別: {category}")
-                    return products
-                
-                logger.info(f"📱 訪問類別頁面: {category_url}")
-                await page.goto(category_url, wait_until='networkidle', timeout=60000)
-                await asyncio.sleep(3)
-                
-                # 尋找產品連結
-                product_selectors = [
-                    'a[href*="/product/"]',
-                    '.rf-serp-productcard a',
-                    '.rf-serp-productcard-link',
-                    '[data-testid="product-tile"] a'
-                ]
-                
-                product_links = []
-                
-                for selector in product_selectors:
-                    try:
-                        elements = await page.query_selector_all(selector)
-                        if elements:
-                            logger.info(f"✅ 找到 {len(elements)} 個產品連結 (選擇器: {selector})")
-                            
-                            for element in elements[:limit]:  # 限制數量
-                                href = await element.get_attribute('href')
-                                if href and '/product/' in href:
-                                    if not href.startswith('http'):
-                                        href = 'https://www.apple.com' + href
-                                    product_links.append(href)
-                            
-                            break
-                            
-                    except Exception as e:
-                        logger.debug(f"產品連結選擇器 {selector} 失敗: {e}")
-                        continue
-                
-                if not product_links:
-                    logger.warning(f"⚠️ 未找到 {category} 類別的產品連結")
-                    return products
-                
-                logger.info(f"🔗 找到 {len(product_links)} 個產品連結")
+            if not product_links:
+                logger.warning(f"⚠️ 未找到 {category} 類別的產品連結")
+                return products
+            
+            logger.info(f"🔗 找到 {len(product_links)} 個產品連結")
+            
+            # 提取每個產品的詳細資訊，每個產品借用獨立分頁以便瀏覽器池回收上下文
+            breaker = self.breakers.category(category)
+            for i, product_url in enumerate(product_links, 1):
+                if not breaker.allow():
+                    logger.warning(f"⛔ {category.upper()} 斷路器開啟，略過剩餘 {len(product_links) - i + 1} 個產品")
+                    break
                 
-                # 提取每個產品的詳細資訊
-                for i, product_url in enumerate(product_links, 1):
-                    try:
-                        logger.info(f"📦 處理產品 {i}/{len(product_links)}")
-                        
-                        # 提取基本產品資訊
-                        product_info = await self.extract_basic_product_info(page, product_url)
-                        
-                        # 提取詳細概覽
-                        detailed_overview = await self.extract_product_overview(page, product_url)
-                        
-                        if product_info:
-                            product_info['產品概覽'] = detailed_overview or product_info.get('產品標題', '')
-                            product_info['category'] = category
-                            product_info['序號'] = i
-                            products.append(product_info)
-                            
-                            logger.info(f"✅ 成功處理產品: {product_info.get('產品標題', '')[:50]}...")
-                        
-                        # 避免被封鎖
-                        await asyncio.sleep(2)
+                try:
+                    logger.info(f"📦 處理產品 {i}/{len(product_links)}")
+                    
+                    # 只載入一次產品頁面，同時提取基本資訊與詳細概覽
+                    async with pool.page(self.setup_browser_context, profile='enhanced') as page:
+                        product_info = await self.extract_product_details(page, product_url, category)
+                    
+                    if not product_info:
+                        breaker.record_failure(f"無法擷取 {product_url}")
+                    else:
+                        breaker.record_success()
+                        product_info['產品概覽'] = product_info['產品概覽'] or product_info.get('產品標題', '')
+                        product_info['category'] = category
+                        product_info['序號'] = i
+                        products.append(product_info)
+                        if writer:
+                            writer.write(product_info)
                         
-                    except Exception as e:
-                        logger.error(f"❌ 處理產品失敗 {product_url}: {e}")
-                        continue
-                
-            except Exception as e:
-                logger.error(f"❌ 爬取類別 {category} 失敗: {e}")
-            finally:
-                await page.close()
-                await context.close()
-                await browser.close()
+                        logger.info(f"✅ 成功處理產品: {product_info.get('產品標題', '')[:50]}...")
+                    
+                except Exception as e:
+                    logger.error(f"❌ 處理產品失敗 {product_url}: {e}")
+                    breaker.record_failure(e)
+                    continue
+            
+        except Exception as e:
+            logger.error(f"❌ 爬取類別 {category} 失敗: {e}")
         
-        logger.info(f"🎉 {category.upper()} 類別爬取完成，共 {len(products)} 個產品")
         return products
 
-    async def extract_basic_product_info(self, page, product_url: str) -> Optional[Dict]:
-        """提取基本產品資訊"""
+    async def scrape_category_listing(self, category: str, limit: Optional[int] = None) -> List[Dict]:
+        """
+        只讀取類別列表頁的產品卡片，不訪問任何產品詳細頁面
+        
+        優先以 HTTP 解析列表頁內嵌的 JSON，沒有內嵌資料時才啟動瀏覽器擷取 DOM
+        """
+        category_url = self.categories.get(category)
+        if not category_url:
+            logger.error(f"❌ 未知類別: {category}")
+            return []
+        
+        async def fetch_tiles():
+            tiles = await self.bootstrap_extractor.fetch_listing_async(category_url, limit)
+            if tiles is not None:
+                return tiles
+            
+            logger.info(f"🌐 改用瀏覽器擷取 {category.upper()} 列表頁")
+            async with self.run_pool() as pool:
+                async with pool.page(self.setup_browser_context, profile='enhanced') as page:
+                    return await self.collect_listing_tiles(page, category_url, limit)
+        
+        # 列表頁失敗時重試，持續失敗的類別由斷路器直接略過，不再等待逾時
         try:
-            await page.goto(product_url, wait_until='networkidle', timeout=30000)
-            await asyncio.sleep(1)
+            return await self.retry_policy.run(fetch_tiles, category=category)
+        except CircuitOpenError as e:
+            logger.warning(f"⛔ 略過 {category.upper()} 列表頁: {e}")
+            return []
+
+    def build_listing_products(self, category: str, tiles: List[Dict],
+                               existing_products: Optional[List[Dict]] = None) -> List[Dict]:
+        """
+        由列表頁產品卡片建立與 data/apple_refurbished_<category>.json 相同格式的產品資料
+        
+        已存在的產品保留原有概覽，新產品暫時以標題作為概覽
+        """
+        existing_by_key = index_by_key(existing_products or [])
+        
+        products = []
+        for i, tile in enumerate(tiles, 1):
+            existing = existing_by_key.get(product_key(tile['url']), {})
+            title = tile['title'] or existing.get('產品標題', '')
             
-            # 提取產品標題
-            title_selectors = [
-                'h1.rf-pdp-title',
-                'h1[data-autom="pdp-product-name"]',
-                '.rf-pdp-title',
-                'h1.pd-title',
-                'h1'
-            ]
+            product = {
+                '序號': i,
+                '產品標題': title,
+                '產品售價': tile['price'] or existing.get('產品售價', 'N/A'),
+                '產品URL': tile['url'],
+                '產品概覽': existing.get('產品概覽') or title
+            }
+            # 內嵌 JSON 才有產品圖片，DOM 擷取的產品保留原有的圖片網址
+            image = tile.get('image') or existing.get('產品圖片')
+            if image:
+                product['產品圖片'] = image
+            products.append(product)
+        
+        return products
+
+    async def refresh_category_from_listing(self, category: str, fetch_details: bool = True) -> Dict:
+        """
+        以列表頁快速更新類別資料，只對新產品或價格變動的產品訪問詳細頁面
+        
+        Args:
+            category: 產品類別
+            fetch_details: 是否為新產品與價格變動的產品補抓詳細概覽
+        
+        Returns:
+            {'products': 產品列表, 'new': 新產品數, 'changed': 價格變動數, 'removed': 下架數,
+             'unchanged': 列表指紋與上次相同，沒有做任何處理}
+        """
+        logger.info(f"⚡ 以列表頁快速更新 {category.upper()} 類別...")
+        async with self.run_pool():
+            return await self._refresh_category_from_listing(category, fetch_details)
+
+    async def _refresh_category_from_listing(self, category: str, fetch_details: bool) -> Dict:
+        """比對列表頁與現有資料，補抓需要的詳細頁面並儲存"""
+        existing_products = self.load_category_products(category)
+        
+        tiles = await self.scrape_category_listing(category)
+        if not tiles and existing_products:
+            # 列表頁沒有任何產品卡片時，多半是選擇器失效，保留現有資料避免誤刪
+            logger.warning(f"⚠️ {category.upper()} 列表頁未找到產品，保留現有資料")
+            return {'products': existing_products, 'new': 0, 'changed': 0, 'removed': 0, 'unchanged': False}
+        
+        products = self.build_listing_products(category, tiles, existing_products)
+        
+        # 產品與價格都和上次寫入時相同，只補抓上次失敗的詳細頁面
+        fingerprint = listing_fingerprint(products)
+        previous_pending = set(self.fingerprints.pending(category))
+        if existing_products and self.fingerprints.unchanged(category, fingerprint):
+            logger.info(f"⏭️ {category.upper()} 列表與上次相同 ({len(products)} 個產品)，略過")
+            if fetch_details and previous_pending:
+                await self._retry_pending_details(category, existing_products, fingerprint, previous_pending)
+            return {'products': existing_products, 'new': 0, 'changed': 0, 'removed': 0, 'unchanged': True}
+        
+        existing_prices = {
+            product_key(product): product.get('產品售價')
+            for product in existing_products
+        }
+        current_keys = set()
+        needs_details = []
+        new_count = 0
+        changed_count = 0
+        
+        for product in products:
+            key = product_key(product)
+            current_keys.add(key)
             
-            title = ""
-            for selector in title_selectors:
+            if key not in existing_prices:
+                new_count += 1
+                needs_details.append(product)
+            elif existing_prices[key] != product['產品售價']:
+                changed_count += 1
+                needs_details.append(product)
+            elif key in previous_pending:
+                needs_details.append(product)
+        
+        removed_count = len(set(existing_prices) - current_keys)
+        logger.info(f"📊 {category.upper()}: {len(products)} 個產品，新產品 {new_count}，"
+                    f"價格變動 {changed_count}，下架 {removed_count}")
+        
+        failed = list(needs_details)
+        if fetch_details and needs_details:
+            failed = []
+            await self.fetch_details_for(needs_details, category, failed=failed)
+        
+        # 不論詳細頁面是否全部補抓成功都記錄指紋，同一次列表變動不會在下次檢查時重複計算；
+        # 沒補抓到的產品記為待處理，下次執行時補抓
+        if self.save_category_products(products, category):
+            self.fingerprints.record(category, fingerprint, len(products),
+                                     pending=[product_key(product) for product in failed])
+        
+        return {
+            'products': products,
+            'new': new_count,
+            'changed': changed_count,
+            'removed': removed_count,
+            'unchanged': False
+        }
+
+    async def _retry_pending_details(self, category: str, products: List[Dict], fingerprint: str,
+                                     pending: set):
+        """列表沒有變動時補抓上次失敗的詳細頁面，成功的產品寫回類別檔案"""
+        targets = [product for product in products if product_key(product) in pending]
+        if not targets:
+            self.fingerprints.record(category, fingerprint, len(products))
+            return
+        
+        logger.info(f"🔁 {category.upper()} 補抓上次失敗的 {len(targets)} 個詳細頁面")
+        failed = []
+        fetched = await self.fetch_details_for(targets, category, failed=failed)
+        if fetched and not self.save_category_products(products, category):
+            return
+        self.fingerprints.record(category, fingerprint, len(products),
+                                 pending=[product_key(product) for product in failed])
+
+    async def refresh_all_listings(self, fetch_details: bool = True, concurrency: int = 3,
+                                   categories: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """以列表頁快速更新所有類別，或只更新指定的類別"""
+        self.resource_blocker.reset()
+        semaphore = asyncio.Semaphore(max(concurrency, 1))
+        
+        async def run_category(category):
+            async with semaphore:
                 try:
-                    element = await page.query_selector(selector)
-                    if element:
-                        title = await element.inner_text()
-                        if title:
-                            break
-                except:
-                    continue
+                    return category, await self.refresh_category_from_listing(category, fetch_details)
+                except Exception as e:
+                    logger.error(f"❌ 快速更新 {category} 失敗: {e}")
+                    return category, None
+        
+        async with self.run_pool(max_contexts=max(concurrency, 1)):
+            outcomes = await asyncio.gather(*[run_category(category) for category in categories or self.categories])
+        
+        self.breakers.log_report()
+        self.resource_blocker.log_report()
+        self.overview_extractor.selector_stats.save()
+        return {category: result for category, result in outcomes if result is not None}
+
+    async def fetch_details_for(self, products: List[Dict], category: Optional[str] = None,
+                                failed: Optional[List[Dict]] = None) -> int:
+        """
+        為指定產品補抓詳細頁面，直接更新傳入的產品資料
+        
+        Args:
+            failed: 提供時加入沒有補抓到的產品（包含斷路器開啟而略過的產品）
+        
+        Returns:
+            成功補抓的產品數量
+        """
+        logger.info(f"🔍 補抓 {len(products)} 個產品的詳細概覽")
+        
+        fetched = 0
+        succeeded = set()
+        breaker = self.breakers.category(category) if category else None
+        async with self.run_pool() as pool:
+            for position, product in enumerate(products):
+                if breaker and not breaker.allow():
+                    logger.warning(f"⛔ {category.upper()} 斷路器開啟，略過剩餘 {len(products) - position} 個產品")
+                    break
+                
+                try:
+                    async with pool.page(self.setup_browser_context, profile='enhanced') as page:
+                        details = await self.extract_product_details(page, product['產品URL'], category)
+                    
+                    if breaker:
+                        if details:
+                            breaker.record_success()
+                        else:
+                            breaker.record_failure(f"無法擷取 {product['產品URL']}")
+                    
+                    if details:
+                        fetched += 1
+                        succeeded.add(id(product))
+                        if details['產品概覽']:
+                            product['產品概覽'] = details['產品概覽']
+                        if product['產品售價'] == 'N/A':
+                            product['產品售價'] = details['產品售價']
+                        
+                except Exception as e:
+                    logger.error(f"❌ 補抓產品失敗 {product['產品URL']}: {e}")
+                    if breaker:
+                        breaker.record_failure(e)
+        
+        if failed is not None:
+            failed.extend(product for product in products if id(product) not in succeeded)
+        return fetched
+
+    def load_category_products(self, category: str) -> List[Dict]:
+        """載入現有的類別產品資料"""
+        filename = f'data/apple_refurbished_{category}.json'
+        
+        if not os.path.exists(filename):
+            return []
+        
+        try:
+            with open(filename, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"❌ 載入 {filename} 失敗: {e}")
+            return []
+
+    def save_category_products(self, products: List[Dict], category: str) -> bool:
+        """儲存類別產品資料到 data/apple_refurbished_<category>.json，成功時回傳 True"""
+        try:
+            os.makedirs('data', exist_ok=True)
+            filename = f'data/apple_refurbished_{category}.json'
+            write_json_atomic(filename, products)
             
-            # 提取價格
-            price_selectors = [
-                '.rf-pdp-price',
-                '.pd-price',
-                '[data-autom="price"]',
-                '.price'
-            ]
+            logger.info(f"💾 {category.upper()} 資料已儲存到 {filename} ({len(products)} 個產品)")
+            return True
             
-            price = ""
-            for selector in price_selectors:
-                try:
-                    element = await page.query_selector(selector)
-                    if element:
-                        price = await element.inner_text()
-                        if 'NT$' in price:
-                            break
-                except:
-                    continue
+        except Exception as e:
+            logger.error(f"❌ 儲存 {category} 產品資料失敗: {e}")
+            return False
+
+    async def collect_listing_tiles(self, page, category_url: str, limit: Optional[int] = None) -> List[Dict]:
+        """從類別頁面一次取得所有產品卡片的標題、價格、網址與零件編號"""
+        logger.info(f"📱 訪問類別頁面: {category_url}")
+        await goto_with_backoff(self.controller, page, category_url,
+                                wait_until=self.resource_blocker.wait_until, timeout=60000)
+        # 等待產品格渲染完成
+        await asyncio.sleep(3)
+        
+        listing = await extract_listing_tiles(page, limit=limit)
+        return listing['tiles']
+
+    async def collect_product_links(self, page, category_url: str, limit: int) -> List[str]:
+        """從類別頁面收集產品連結"""
+        tiles = await self.collect_listing_tiles(page, category_url, limit)
+        return [tile['url'] for tile in tiles]
+
+    async def extract_basic_product_info(self, page, product_url: str) -> Optional[Dict]:
+        """提取基本產品資訊"""
+        try:
+            await self.navigate_to_product(page, product_url)
+            
+            title = await self.extract_title(page)
+            price = await self.extract_price(page)
             
             if title:
                 return {
@@ -344,6 +579,83 @@ class EnhancedAppleScraper:
             logger.error(f"❌ 提取基本產品資訊失敗: {e}")
             return None
 
+    async def extract_title(self, page) -> str:
+        """從已載入的產品頁面提取產品標題"""
+        title_selectors = [
+            'h1.rf-pdp-title',
+            'h1[data-autom="pdp-product-name"]',
+            '.rf-pdp-title',
+            'h1.pd-title',
+            'h1'
+        ]
+        
+        return await extract_first_text(page, title_selectors)
+
+    async def extract_price(self, page) -> str:
+        """從已載入的產品頁面提取價格"""
+        price_selectors = [
+            '.rf-pdp-price',
+            '.pd-price',
+            '[data-autom="price"]',
+            '.price'
+        ]
+        
+        return (await extract_first_text(page, price_selectors, must_contain='NT$')
+                or await extract_first_text(page, price_selectors))
+
+    async def extract_product_details(self, page, product_url: str,
+                                      category: Optional[str] = None) -> Optional[Dict]:
+        """
+        只載入一次產品頁面，同時提取標題、價格、概覽與規格
+        
+        每個欄位的擷取時間記錄在「擷取耗時」欄位（秒）
+        """
+        timings = {}
+        
+        try:
+            logger.info(f"🔍 提取產品詳細資訊: {product_url}")
+            
+            started = time.perf_counter()
+            await self.navigate_to_product(page, product_url)
+            timings['頁面載入'] = round(time.perf_counter() - started, 3)
+            
+            started = time.perf_counter()
+            title = await self.extract_title(page)
+            timings['產品標題'] = round(time.perf_counter() - started, 3)
+            
+            if not title:
+                logger.warning(f"⚠️ 找不到產品標題: {product_url}")
+                return None
+            
+            started = time.perf_counter()
+            price = await self.extract_price(page)
+            timings['產品售價'] = round(time.perf_counter() - started, 3)
+            
+            started = time.perf_counter()
+            specs_text = await self.extract_product_specs(page, category)
+            timings['產品規格'] = round(time.perf_counter() - started, 3)
+            
+            started = time.perf_counter()
+            overview = await self.extract_overview_from_page(page, specs_text=specs_text, category=category)
+            timings['產品概覽'] = round(time.perf_counter() - started, 3)
+            
+            return {
+                '產品標題': title.strip(),
+                '產品售價': price.strip() if price else 'N/A',
+                '產品URL': product_url,
+                '產品概覽': overview,
+                '產品規格': self.overview_extractor.clean(specs_text),
+                '擷取耗時': timings
+            }
+            
+        except Exception as e:
+            logger.error(f"❌ 提取產品詳細資訊失敗: {e}")
+            return None
+
+    def enhanced_products_path(self, category: str) -> str:
+        """增強版產品資料的檔案路徑"""
+        return f'data/apple_refurbished_{category}_enhanced.json'
+
     def save_enhanced_products(self, products: List[Dict], category: str):
         """儲存增強版產品資料"""
         if not products:
@@ -355,10 +667,8 @@ class EnhancedAppleScraper:
             os.makedirs('data', exist_ok=True)
             
             # 儲存到對應的檔案
-            filename = f'data/apple_refurbished_{category}_enhanced.json'
-            
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(products, f, ensure_ascii=False, indent=2)
+            filename = self.enhanced_products_path(category)
+            write_json_atomic(filename, products)
             
             logger.info(f"💾 {category.upper()} 增強版資料已儲存到 {filename}")
             logger.info(f"📊 共儲存 {len(products)} 個產品")
@@ -383,30 +693,36 @@ async def main():
     
     # 選擇要爬取的類別
     print("\n可用類別:")
+    print("0. 全部類別 (同時爬取)")
     for i, category in enumerate(scraper.categories.keys(), 1):
         print(f"{i}. {category.upper()}")
     
     try:
         choice = input("\n請選擇類別 (輸入數字，或按 Enter 爬取 Mac): ").strip()
         
+        limit = input(f"\n請輸入要爬取的產品數量 (預設 5): ").strip()
+        limit = int(limit) if limit.isdigit() else 5
+        
+        if choice == '0':
+            print(f"\n🚀 開始同時爬取所有類別，每個類別限制 {limit} 個產品...")
+            results = await scraper.scrape_all_categories_with_details(limit, save=True)
+            
+            print(f"\n🎉 爬取完成！")
+            print(f"📊 成功爬取 {sum(len(products) for products in results.values())} 個產品")
+            return
+        
         if not choice:
             category = 'mac'
         else:
             categories = list(scraper.categories.keys())
             category = categories[int(choice) - 1]
         
-        limit = input(f"\n請輸入要爬取的產品數量 (預設 5): ").strip()
-        limit = int(limit) if limit.isdigit() else 5
-        
         print(f"\n🚀 開始爬取 {category.upper()} 類別，限制 {limit} 個產品...")
         
         # 執行爬取
-        products = await scraper.scrape_category_with_details(category, limit)
+        products = await scraper.scrape_category_with_details(category, limit, save=True)
         
         if products:
-            # 儲存結果
-            scraper.save_enhanced_products(products, category)
-            
             print(f"\n🎉 爬取完成！")
             print(f"📊 成功爬取 {len(products)} 個產品")
             print(f"💾 資料已儲存到 data/apple_refurbished_{category}_enhanced.json")
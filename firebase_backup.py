@@ -6,10 +6,17 @@ Firebase 備份系統 - 儲存 Apple 整修品資料並追蹤價格變更
 
 import json
 import os
+import re
 from datetime import datetime
 import firebase_admin
 from firebase_admin import credentials, firestore
 from typing import Dict, List, Any
+from listing_fingerprint import STAGE_FIRESTORE, ListingFingerprintStore, listing_fingerprint
+from product_key import product_id as build_product_id
+
+# 舊版以列表序號作為文件 ID，例如 mac_12（由 migrate_product_document_ids.py 手動遷移）
+LEGACY_DOCUMENT_ID = r'^{category}_(\d{{1,5}}|unknown)$'
+BATCH_SIZE = 100
 
 class FirebaseBackup:
     def __init__(self, service_account_path: str = None):
@@ -20,6 +27,7 @@ class FirebaseBackup:
             service_account_path: Firebase 服務帳戶 JSON 檔案路徑
         """
         self.db = None
+        self.fingerprints = ListingFingerprintStore()
         self.initialize_firebase(service_account_path)
     
     def initialize_firebase(self, service_account_path: str = None):
@@ -61,7 +69,8 @@ class FirebaseBackup:
             print(f"❌ Firebase 初始化錯誤: {e}")
             self.db = None
     
-    def backup_category_data(self, category: str, data: List[Dict], check_price_changes: bool = True):
+    def backup_category_data(self, category: str, data: List[Dict], check_price_changes: bool = True,
+                             skip_unchanged: bool = True):
         """
         備份單一類別資料到 Firebase
         
@@ -69,11 +78,17 @@ class FirebaseBackup:
             category: 產品類別 (mac, ipad, airpods, etc.)
             data: 產品資料列表
             check_price_changes: 是否檢查價格變更
+            skip_unchanged: 產品與價格和上次備份時相同就不寫入 Firestore
         """
         if not self.db:
             print("❌ Firebase 未連接")
             return False
         
+        fingerprint = listing_fingerprint(data)
+        if skip_unchanged and self.fingerprints.unchanged(category, fingerprint, STAGE_FIRESTORE):
+            print(f"⏭️ {category} 類別與上次備份相同，略過")
+            return True
+        
         try:
             timestamp = datetime.now().isoformat()
             
@@ -81,7 +96,8 @@ class FirebaseBackup:
             collection_name = f"apple_refurbished_{category}"
             
             for product in data:
-                product_id = f"{category}_{product.get('序號', 'unknown')}"
+                # 以零件編號作為文件 ID，列表順序改變時不會寫到其他產品的文件
+                product_id = build_product_id(product, category)
                 
                 # 準備要儲存的資料
                 backup_data = {
@@ -105,6 +121,7 @@ class FirebaseBackup:
             
             # 記錄備份歷史
             self.log_backup_history(category, len(data), timestamp)
+            self.fingerprints.record(category, fingerprint, len(data), STAGE_FIRESTORE)
             
             return True
             
@@ -112,6 +129,72 @@ class FirebaseBackup:
             print(f"❌ 備份 {category} 時發生錯誤: {e}")
             return False
     
+    def migrate_legacy_documents(self, category: str, data: List[Dict], apply: bool = False) -> Dict[str, Any]:
+        """
+        將舊版以序號為 ID 的文件（例如 mac_12）改為以零件編號為 ID
+        
+        目前列表中的產品複製到新的文件 ID（新文件已存在時保留新文件），之後的備份才能比對到舊價格；
+        所有序號文件都會被刪除，對應不到目前產品的是過期的重複資料。刪除無法復原，
+        預設只列出會執行的動作，apply=True 時才實際修改 Firestore
+        
+        Args:
+            category: 產品類別
+            data: 目前的類別產品列表
+            apply: 實際複製與刪除文件
+        
+        Returns:
+            {'copy': {舊文件 ID: 新文件 ID}, 'delete': [舊文件 ID]}
+        """
+        plan = {'copy': {}, 'delete': []}
+        if not self.db:
+            print("❌ Firebase 未連接")
+            return plan
+        
+        collection = self.db.collection(f"apple_refurbished_{category}")
+        legacy_pattern = re.compile(LEGACY_DOCUMENT_ID.format(category=re.escape(category)))
+        current_ids = {build_product_id(product, category) for product in data}
+        
+        # 同一產品可能因列表順序改變而出現在多個舊文件，保留最後更新的一份
+        latest: Dict[str, Dict] = {}
+        for doc in collection.stream():
+            if not legacy_pattern.match(doc.id):
+                continue
+            plan['delete'].append(doc.id)
+            doc_data = doc.to_dict() or {}
+            new_id = build_product_id(doc_data, category)
+            if new_id not in current_ids:
+                continue
+            if new_id not in latest or doc_data.get('last_updated', '') > latest[new_id]['data'].get('last_updated', ''):
+                latest[new_id] = {'id': doc.id, 'data': doc_data}
+        
+        for new_id, legacy in latest.items():
+            if not collection.document(new_id).get().exists:
+                plan['copy'][legacy['id']] = new_id
+        
+        prefix = '' if apply else '[試執行] '
+        print(f"🔀 {prefix}{category} 類別: {len(plan['copy'])} 個舊版文件改以零件編號為 ID，"
+              f"刪除 {len(plan['delete'])} 個序號文件")
+        for legacy_id, new_id in plan['copy'].items():
+            print(f"   複製 {legacy_id} → {new_id}")
+        for legacy_id in plan['delete']:
+            print(f"   刪除 {legacy_id}")
+        if not apply:
+            return plan
+        
+        for legacy_id, new_id in plan['copy'].items():
+            collection.document(new_id).set(latest[new_id]['data'])
+        
+        batch = self.db.batch()
+        for deleted, legacy_id in enumerate(plan['delete'], 1):
+            batch.delete(collection.document(legacy_id))
+            if deleted % BATCH_SIZE == 0:
+                batch.commit()
+                batch = self.db.batch()
+        if len(plan['delete']) % BATCH_SIZE != 0:
+            batch.commit()
+        
+        return plan
+    
     def check_price_change(self, product_id: str, current_price: str) -> bool:
         """檢查產品價格是否有變更"""
         try:
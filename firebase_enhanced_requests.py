@@ -104,6 +104,30 @@ class EnhancedFirebaseRequests:
             print(f"❌ 取得最近類別用戶失敗: {e}")
             return []
     
+    def get_category_request_counts(self, days: int = 30) -> Dict[str, int]:
+        """取得最近N天內各類別的有效用戶請求數"""
+        if not self.db:
+            return {}
+        
+        try:
+            cutoff_date = (datetime.now() - timedelta(days=days)).date().isoformat()
+            query = self.db.collection('requests')\
+                          .where('last_query_date', '>=', cutoff_date)\
+                          .where('active', '==', True)
+            
+            counts = {}
+            for doc in query.stream():
+                category = doc.to_dict().get('category')
+                if category:
+                    counts[category] = counts.get(category, 0) + 1
+            
+            print(f"📊 最近 {days} 天各類別請求數: {counts}")
+            return counts
+            
+        except Exception as e:
+            print(f"❌ 取得類別請求數失敗: {e}")
+            return {}
+    
     def update_user_notification_count(self, doc_id: str) -> bool:
         """更新用戶通知次數"""
         if not self.db:
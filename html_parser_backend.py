@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+可替換的 HTML 解析後端
+概覽與規格擷取只需要 CSS 選擇器與元素文字，統一包裝成 select / get_text 介面，
+可在 BeautifulSoup (html.parser / lxml) 與 selectolax 之間切換而不需修改選擇器列表
+"""
+
+import os
+from typing import List, Optional
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml  # noqa: F401
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+try:
+    from selectolax.parser import HTMLParser
+    SELECTOLAX_AVAILABLE = True
+except ImportError:
+    SELECTOLAX_AVAILABLE = False
+
+# 依速度排序，自動選擇時使用第一個已安裝的後端
+BACKEND_PREFERENCE = ['selectolax', 'lxml', 'html.parser']
+
+
+def available_backends() -> List[str]:
+    """列出目前環境可用的解析後端"""
+    backends = []
+    if SELECTOLAX_AVAILABLE:
+        backends.append('selectolax')
+    if LXML_AVAILABLE:
+        backends.append('lxml')
+    backends.append('html.parser')
+    return backends
+
+
+def default_backend() -> str:
+    """取得預設解析後端，可用環境變數 HTML_PARSER_BACKEND 指定"""
+    backend = os.getenv('HTML_PARSER_BACKEND')
+    if backend:
+        return backend
+
+    available = available_backends()
+    return next(name for name in BACKEND_PREFERENCE if name in available)
+
+
+class ParsedElement:
+    """統一的元素介面"""
+
+    def __init__(self, node, backend: str):
+        self._node = node
+        self._backend = backend
+
+    def get_text(self, separator: str = '', strip: bool = False) -> str:
+        """取得元素文字，行為與 BeautifulSoup 的 get_text 相同"""
+        if self._backend != 'selectolax':
+            return self._node.get_text(separator=separator, strip=strip)
+
+        if not strip:
+            return self._node.text(deep=True, separator=separator)
+
+        # selectolax 會保留去除空白後為空的文字節點，過濾掉以符合 BeautifulSoup 的輸出
+        pieces = self._node.text(deep=True, separator='\0', strip=True).split('\0')
+        return separator.join(piece for piece in pieces if piece)
+
+
+class ParsedDocument:
+    """統一的文件介面"""
+
+    def __init__(self, html, backend: Optional[str] = None):
+        self.backend = backend or default_backend()
+
+        if self.backend == 'selectolax':
+            if not SELECTOLAX_AVAILABLE:
+                raise ImportError("selectolax 未安裝，請執行 pip install selectolax")
+            if isinstance(html, bytes):
+                html = html.decode('utf-8', errors='replace')
+            self._tree = HTMLParser(html)
+        elif self.backend in ('lxml', 'html.parser'):
+            if self.backend == 'lxml' and not LXML_AVAILABLE:
+                raise ImportError("lxml 未安裝，請執行 pip install lxml")
+            self._tree = BeautifulSoup(html, self.backend)
+        else:
+            raise ValueError(f"未知的解析後端: {self.backend}")
+
+    def select(self, selector: str) -> List[ParsedElement]:
+        """以 CSS 選擇器取得所有符合的元素"""
+        if self.backend == 'selectolax':
+            nodes = self._tree.css(selector)
+        else:
+            nodes = self._tree.select(selector)
+        return [ParsedElement(node, self.backend) for node in nodes]
+
+
+def parse_document(html, backend: Optional[str] = None) -> ParsedDocument:
+    """以指定後端解析 HTML"""
+    return ParsedDocument(html, backend)
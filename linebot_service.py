@@ -7,7 +7,7 @@ Apple 整修品 Line Bot 服務
 
 import os
 import json
-from flask import Flask, request, abort
+from flask import Flask, request, abort, has_request_context, send_from_directory
 from dotenv import load_dotenv
 
 # 載入 .env 檔案
@@ -19,9 +19,10 @@ from linebot.models import (
     QuickReply, QuickReplyButton, MessageAction,
     FlexSendMessage, BubbleContainer, BoxComponent,
     TextComponent, ButtonComponent, URIAction,
-    CarouselContainer, PostbackEvent, PostbackAction
+    CarouselContainer, PostbackEvent, PostbackAction, ImageComponent
 )
 from chatgpt_query import AppleRefurbishedQuery
+from product_image_cache import CACHE_MAX_AGE, ProductImageCache
 from firebase_enhanced_requests import EnhancedFirebaseRequests
 import firebase_admin
 from firebase_admin import credentials, firestore
@@ -64,6 +65,9 @@ except Exception as e:
 # 初始化查詢系統
 query_system = AppleRefurbishedQuery()
 
+# 產品縮圖由排程預先下載，這裡只查詢索引
+product_images = ProductImageCache()
+
 # 初始化增強版 Firebase Requests
 firebase_requests = EnhancedFirebaseRequests()
 
@@ -496,6 +500,20 @@ class LineBotService:
             contents=carousel
         )
     
+    def product_image_url(self, product, size='hero'):
+        """產品縮圖的公開網址，尚未下載或無法得知對外網址時回傳 None"""
+        name = product_images.thumbnail_name(product, size)
+        if not name:
+            return None
+        
+        # LINE 只接受 HTTPS 圖片；推播訊息沒有請求內容，需要設定對外網址
+        base_url = os.getenv('PUBLIC_BASE_URL') or os.getenv('RENDER_EXTERNAL_URL')
+        if not base_url and has_request_context():
+            base_url = request.url_root
+        if not base_url or not base_url.startswith('https://'):
+            return None
+        return f"{base_url.rstrip('/')}/images/{name}"
+    
     def create_product_bubble(self, product):
         """建立單一產品 Bubble"""
         title = product.get('產品標題', 'Apple 產品')
@@ -526,8 +544,17 @@ class LineBotService:
             button_text = "查看產品詳情"
             button_action = URIAction(label=button_text, uri=url)
         
+        image_url = self.product_image_url(product)
+        hero = ImageComponent(
+            url=image_url,
+            size="full",
+            aspect_ratio="20:13",
+            aspect_mode="fit",
+            background_color="#FFFFFF"
+        ) if image_url else None
+        
         bubble = BubbleContainer(
-            hero=None,  # 可以加入產品圖片
+            hero=hero,
             body=BoxComponent(
                 layout="vertical",
                 contents=[
@@ -921,6 +948,13 @@ def home():
     <code>{}/webhook</code>
     """.format(request.url_root.rstrip('/'))
 
+@app.route("/images/<name>")
+def product_image(name):
+    """產品縮圖，檔名即內容雜湊，可以永久快取"""
+    response = send_from_directory(os.path.abspath(product_images.thumbnails_dir), name, max_age=CACHE_MAX_AGE)
+    response.headers['Cache-Control'] = f'public, max-age={CACHE_MAX_AGE}, immutable'
+    return response
+
 @app.route("/health")
 def health_check():
     """健康檢查"""
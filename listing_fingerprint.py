@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+類別列表指紋
+以排序後的產品鍵值與價格計算每個類別列表的雜湊，與上次處理時相同就略過詳細頁面、檔案寫入與 Firestore 備份
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from product_key import product_key
+from result_writer import write_json_atomic
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FINGERPRINT_PATH = 'data/listing_fingerprints.json'
+
+# 各處理階段分開記錄，寫入檔案後 Firestore 仍可在下次備份時補上
+STAGE_FILES = 'files'
+STAGE_FIRESTORE = 'firestore'
+
+# 爬蟲與 Firebase 備份各自建立紀錄物件但寫入同一個指紋檔，讀取、合併、寫入需要依序進行
+_file_lock = threading.Lock()
+
+
+def listing_fingerprint(products: List[Dict]) -> str:
+    """類別列表的指紋：產品鍵值與價格排序後的雜湊，與產品順序無關"""
+    lines = sorted(
+        f"{product_key(product)}\t{product.get('產品售價', '')}"
+        for product in products
+        if product.get('產品URL')
+    )
+    return hashlib.sha1('\n'.join(lines).encode('utf-8')).hexdigest()
+
+
+class ListingFingerprintStore:
+    def __init__(self, path: str = DEFAULT_FINGERPRINT_PATH):
+        """
+        初始化列表指紋紀錄
+
+        Args:
+            path: 指紋檔路徑，跨執行保留
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        # {stage: {category: {'fingerprint', 'products', 'pending', 'updated_at'}}}
+        self.state: Dict[str, Dict[str, Dict]] = self._load()
+        # 尚未寫入的 (階段, 類別)
+        self._dirty: Set[Tuple[str, str]] = set()
+
+    def _load(self) -> Dict:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"⚠️ 載入列表指紋失敗: {e}")
+            return {}
+
+    def get(self, category: str, stage: str = STAGE_FILES) -> Optional[str]:
+        """取得上次處理時的指紋"""
+        with self._lock:
+            entry = self.state.get(stage, {}).get(category)
+        return entry['fingerprint'] if entry else None
+
+    def unchanged(self, category: str, fingerprint: str, stage: str = STAGE_FILES) -> bool:
+        """列表與上次處理時相同"""
+        return self.get(category, stage) == fingerprint
+
+    def pending(self, category: str, stage: str = STAGE_FILES) -> List[str]:
+        """上次處理時尚未完成的產品鍵值（例如詳細頁面補抓失敗）"""
+        with self._lock:
+            entry = self.state.get(stage, {}).get(category)
+        return list(entry.get('pending', [])) if entry else []
+
+    def record(self, category: str, fingerprint: str, product_count: int, stage: str = STAGE_FILES,
+               pending: Optional[List[str]] = None):
+        """
+        記錄已處理的列表指紋並寫入指紋檔
+
+        Args:
+            pending: 尚未完成的產品鍵值，列表沒有變動時下次執行只需補做這些產品
+        """
+        with self._lock:
+            self.state.setdefault(stage, {})[category] = {
+                'fingerprint': fingerprint,
+                'products': product_count,
+                'pending': sorted(pending or []),
+                'updated_at': datetime.now().isoformat()
+            }
+            self._dirty.add((stage, category))
+        self.save()
+
+    def invalidate(self, category: str, stage: Optional[str] = None):
+        """清除類別的指紋，下次一定重新處理；未指定階段時清除所有階段"""
+        with self._lock:
+            stages = [stage] if stage else list(self.state)
+            for name in stages:
+                self.state.get(name, {}).pop(category, None)
+                self._dirty.add((name, category))
+        self.save()
+
+    def save(self):
+        """以磁碟上的指紋檔為基礎合併自己更新的類別後原子替換，不會覆蓋其他紀錄物件寫入的階段"""
+        with _file_lock, self._lock:
+            merged = self._load()
+            for stage, category in self._dirty:
+                entry = self.state.get(stage, {}).get(category)
+                if entry is None:
+                    merged.get(stage, {}).pop(category, None)
+                else:
+                    merged.setdefault(stage, {})[category] = entry
+            self._dirty.clear()
+            self.state = merged
+            snapshot = {stage: dict(entries) for stage, entries in merged.items()}
+
+            try:
+                write_json_atomic(self.path, snapshot)
+            except Exception as e:
+                logger.error(f"❌ 儲存列表指紋失敗: {e}")
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Firestore 產品文件 ID 遷移
+舊版以列表序號作為文件 ID（例如 mac_12），改以零件編號為 ID 後需要手動遷移一次舊文件；
+預設只列出會複製與刪除的文件，確認無誤後加上 --apply 才實際修改 Firestore
+"""
+
+import argparse
+import json
+import os
+
+from firebase_backup import FirebaseBackup
+
+CATEGORIES = ['mac', 'ipad', 'iphone', 'airpods', 'homepod', 'appletv', 'accessories']
+
+
+def main():
+    """主程式"""
+    parser = argparse.ArgumentParser(description='將 Firestore 中以序號為 ID 的產品文件改為以零件編號為 ID')
+    parser.add_argument('--categories', nargs='*', default=CATEGORIES, choices=CATEGORIES, help='要遷移的類別')
+    parser.add_argument('--service-account', default='firebase-service-account.json',
+                        help='Firebase 服務帳戶金鑰路徑')
+    parser.add_argument('--apply', action='store_true', help='實際複製與刪除文件，預設只列出會執行的動作')
+    args = parser.parse_args()
+
+    firebase_backup = FirebaseBackup(args.service_account)
+    if not firebase_backup.db:
+        print("❌ Firebase 連接失敗，請檢查設定")
+        return
+
+    copied = deleted = 0
+    for category in args.categories:
+        # 只有目前列表中的產品會複製到新 ID，沒有列表資料時不遷移，避免刪除還對應得到的舊文件
+        file_path = f'data/apple_refurbished_{category}.json'
+        if not os.path.exists(file_path):
+            print(f"⚠️ {category}: 找不到 {file_path}，略過")
+            continue
+
+        with open(file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if not data:
+            print(f"⚠️ {category}: 無資料，略過")
+            continue
+
+        try:
+            plan = firebase_backup.migrate_legacy_documents(category, data, apply=args.apply)
+        except Exception as e:
+            print(f"❌ 遷移 {category} 時發生錯誤: {e}")
+            continue
+        copied += len(plan['copy'])
+        deleted += len(plan['delete'])
+
+    if args.apply:
+        print(f"\n🎉 遷移完成：複製 {copied} 個文件，刪除 {deleted} 個序號文件")
+    else:
+        print(f"\nℹ️ 試執行：會複製 {copied} 個文件、刪除 {deleted} 個序號文件，Firestore 沒有任何修改；"
+              f"確認後加上 --apply 執行")
+
+
+if __name__ == "__main__":
+    main()
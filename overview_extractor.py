@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+統一的產品概覽擷取引擎
+集中管理概覽與規格的選擇器列表與文字清理規則，供 Playwright 與 HTTP 兩種擷取方式共用。
+每個類別記錄哪個選擇器命中，下次優先嘗試，統計儲存在 data/selector_stats.json
+"""
+
+import json
+import logging
+import multiprocessing.util
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Pattern, Tuple
+
+from dom_batch_extractor import extract_section_text
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATS_PATH = 'data/selector_stats.json'
+
+# 產品概覽區域的選擇器（預設順序）
+OVERVIEW_SELECTORS = [
+    '.rc-pdsection-mainpanel.column.large-9.small-12',
+    '.rc-pdsection-mainpanel',
+    '.pd-overview',
+    '.pd-highlights',
+    '[data-module-template="pd/overview"]',
+    '.pd-overview-content',
+    '.rf-pdp-overview',
+    '.rf-pdp-highlights',
+    '.rf-pdp-techspecs'
+]
+
+# 找不到概覽時改用的規格與特色區域選擇器（預設順序）
+SPEC_SELECTORS = [
+    '.rf-pdp-techspecs',
+    '.pd-techspecs',
+    '.rf-pdp-highlights',
+    '.pd-highlights',
+    '.rf-pdp-overview-content',
+    '.pd-overview-content',
+    '[data-module-template="pd/techspecs"]',
+    '.rf-pdp-content',
+    '.pd-features',
+    '.product-features',
+    '.tech-specs',
+    '.product-highlights'
+]
+
+SECTIONS = {
+    'overview': {'selectors': OVERVIEW_SELECTORS, 'min_length': 50},
+    'specs': {'selectors': SPEC_SELECTORS, 'min_length': 30}
+}
+
+BLANK_LINES_PATTERN = re.compile(r'\n\s*\n')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+# 購買按鈕、法律聲明等不需要的內容，依序套用；空白已先合併成一行，命中後整段後面的文字都會被移除，
+# 因此各更新器保留各自原本的規則，不共用同一份清單
+BASIC_UNWANTED_PATTERNS = [
+    r'加入購物車.*',
+    r'立即購買.*',
+    r'選擇.*',
+    r'Cookie.*',
+    r'隱私權.*',
+    r'使用條款.*',
+    r'©.*Apple.*',
+    r'台灣.*'
+]
+
+# 概覽更新器另外移除商店導覽連結
+OVERVIEW_UNWANTED_PATTERNS = BASIC_UNWANTED_PATTERNS + [
+    r'Apple Store.*',
+    r'購買.*',
+    r'比較.*',
+    r'瞭解更多.*'
+]
+
+# HTTP 版概覽更新器另外移除保固與退貨說明後的連結文字
+PRODUCTION_UNWANTED_PATTERNS = OVERVIEW_UNWANTED_PATTERNS + [
+    r'這會在新視窗開啟.*',
+    r'可另外.*'
+]
+
+
+def compile_patterns(patterns: List[str]) -> List[Pattern]:
+    """編譯不分大小寫的清理規則"""
+    return [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+
+
+_DEFAULT_PATTERNS = compile_patterns(OVERVIEW_UNWANTED_PATTERNS)
+
+
+def clean_overview_text(text: str, max_length: int = 1000,
+                        unwanted_patterns: Optional[List[Pattern]] = None,
+                        filter_short_lines: bool = True) -> str:
+    """
+    清理和格式化概覽文字
+
+    Args:
+        max_length: 長度上限，超過時截斷並加上 "..."
+        unwanted_patterns: 已編譯的清理規則，預設為 OVERVIEW_UNWANTED_PATTERNS
+        filter_short_lines: 過濾 5 個字元以下的行
+    """
+    if not text:
+        return ""
+
+    # 移除多餘的空白和換行
+    text = BLANK_LINES_PATTERN.sub('\n', text)
+    text = WHITESPACE_PATTERN.sub(' ', text)
+
+    # 移除不需要的內容
+    for pattern in unwanted_patterns if unwanted_patterns is not None else _DEFAULT_PATTERNS:
+        text = pattern.sub('', text)
+
+    if filter_short_lines:
+        # 格式化文字，過濾太短的行
+        text = '\n'.join(line.strip() for line in text.split('\n') if len(line.strip()) > 5)
+
+    # 重新組合，限制長度
+    if len(text) > max_length:
+        text = text[:max_length] + "..."
+
+    return text.strip()
+
+
+class SelectorStats:
+    def __init__(self, path: str = DEFAULT_STATS_PATH, save_every: int = 10):
+        """
+        初始化選擇器命中統計
+
+        Args:
+            path: 統計檔案路徑
+            save_every: 累積多少筆新紀錄後自動寫入檔案
+        """
+        self.path = path
+        self.save_every = save_every
+        self._lock = threading.Lock()
+        # {section: {category: {selector: hits}}}
+        self._hits: Dict[str, Dict[str, Dict[str, int]]] = self._load()
+        self._pending: Dict[Tuple[str, str, str], int] = {}
+        self._flush_on_exit()
+        multiprocessing.util.register_after_fork(self, SelectorStats._after_fork)
+
+    def _flush_on_exit(self):
+        """行程結束時寫入未達 save_every 的紀錄；ProcessPoolExecutor 的解析行程不執行 atexit，但會執行 Finalize"""
+        multiprocessing.util.Finalize(self, self.save, exitpriority=10)
+
+    def _after_fork(self):
+        """fork 出的解析行程繼承了父行程尚未寫入的紀錄，清除以免重複累加，並重新登記結束時寫入"""
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._flush_on_exit()
+
+    def _load(self) -> Dict:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"⚠️ 載入選擇器統計失敗: {e}")
+            return {}
+
+    def ordered(self, section: str, category: Optional[str], selectors: List[str]) -> List[str]:
+        """依該類別的命中次數排序選擇器，次數相同時維持預設順序"""
+        with self._lock:
+            hits = self._hits.get(section, {}).get(category or 'default', {})
+            if not hits:
+                return list(selectors)
+            return sorted(selectors, key=lambda selector: -hits.get(selector, 0))
+
+    def record(self, section: str, category: Optional[str], selector: str):
+        """記錄一次命中"""
+        category = category or 'default'
+        with self._lock:
+            category_hits = self._hits.setdefault(section, {}).setdefault(category, {})
+            category_hits[selector] = category_hits.get(selector, 0) + 1
+
+            key = (section, category, selector)
+            self._pending[key] = self._pending.get(key, 0) + 1
+            should_save = sum(self._pending.values()) >= self.save_every
+
+        if should_save:
+            self.save()
+
+    def save(self):
+        """將新紀錄合併寫入檔案（多個解析行程可能同時寫入，以累加方式合併）"""
+        with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'a+', encoding='utf-8') as f:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                f.seek(0)
+                content = f.read()
+                stored = json.loads(content) if content.strip() else {}
+
+                for (section, category, selector), count in pending.items():
+                    category_hits = stored.setdefault(section, {}).setdefault(category, {})
+                    category_hits[selector] = category_hits.get(selector, 0) + count
+
+                f.seek(0)
+                f.truncate()
+                json.dump(stored, f, ensure_ascii=False, indent=2)
+
+            with self._lock:
+                self._hits = stored
+        except Exception as e:
+            logger.warning(f"⚠️ 儲存選擇器統計失敗: {e}")
+
+    def get_stats(self) -> Dict:
+        """取得目前的命中統計"""
+        with self._lock:
+            return json.loads(json.dumps(self._hits))
+
+
+_shared_stats = None
+
+
+def get_shared_selector_stats() -> SelectorStats:
+    """取得行程內共用的選擇器統計"""
+    global _shared_stats
+    if _shared_stats is None:
+        _shared_stats = SelectorStats()
+    return _shared_stats
+
+
+class OverviewExtractor:
+    def __init__(self, selector_stats: Optional[SelectorStats] = None, max_length: int = 1000,
+                 unwanted_patterns: Optional[List[str]] = None, filter_short_lines: bool = True):
+        """
+        初始化概覽擷取引擎
+
+        Args:
+            selector_stats: 選擇器命中統計，未提供時使用行程內共用的統計
+            max_length: 清理後概覽的長度上限
+            unwanted_patterns: 清理規則，預設為 OVERVIEW_UNWANTED_PATTERNS
+            filter_short_lines: 清理時過濾 5 個字元以下的行
+        """
+        self.selector_stats = selector_stats or get_shared_selector_stats()
+        self.max_length = max_length
+        self.unwanted_patterns = compile_patterns(unwanted_patterns or OVERVIEW_UNWANTED_PATTERNS)
+        self.filter_short_lines = filter_short_lines
+
+    def clean(self, text: str) -> str:
+        """清理和格式化概覽文字"""
+        return clean_overview_text(text, self.max_length, self.unwanted_patterns, self.filter_short_lines)
+
+    def find_section(self, document, section: str, category: Optional[str] = None) -> Tuple[Optional[str], str]:
+        """
+        在已解析的文件中依學習到的順序嘗試選擇器
+
+        Returns:
+            (命中的選擇器, 以空行分隔的原始文字)
+        """
+        settings = SECTIONS[section]
+        for selector in self.selector_stats.ordered(section, category, settings['selectors']):
+            try:
+                elements = document.select(selector)
+            except Exception as e:
+                logger.debug(f"選擇器 {selector} 失敗: {e}")
+                continue
+
+            text = ""
+            for element in elements:
+                value = element.get_text(strip=True, separator='\n')
+                if value and len(value.strip()) > settings['min_length']:
+                    text += value.strip() + "\n\n"
+
+            if text:
+                self.selector_stats.record(section, category, selector)
+                return selector, text
+
+        return None, ""
+
+    async def find_section_in_page(self, page, section: str,
+                                   category: Optional[str] = None) -> Tuple[Optional[str], str]:
+        """在已載入的 Playwright 分頁中依學習到的順序嘗試選擇器"""
+        settings = SECTIONS[section]
+        selectors = self.selector_stats.ordered(section, category, settings['selectors'])
+        selector, text = await extract_section_text(page, selectors, min_length=settings['min_length'])
+
+        if selector:
+            self.selector_stats.record(section, category, selector)
+        return selector, text
+
+    def _finish(self, overview_selector: Optional[str], overview_text: str) -> str:
+        if overview_selector:
+            logger.info(f"✅ 找到概覽區域: {overview_selector}")
+
+        if overview_text:
+            overview_text = self.clean(overview_text)
+            logger.info(f"✅ 成功提取概覽 ({len(overview_text)} 字元)")
+            return overview_text
+
+        logger.warning("⚠️ 未能提取到產品概覽")
+        return ""
+
+    def extract_from_document(self, document, category: Optional[str] = None) -> str:
+        """從已解析的產品頁面提取概覽，找不到概覽時改用規格"""
+        selector, text = self.find_section(document, 'overview', category)
+        if not text:
+            logger.info("🔄 嘗試提取產品規格...")
+            _, text = self.find_section(document, 'specs', category)
+        return self._finish(selector, text)
+
+    async def extract_from_page(self, page, category: Optional[str] = None,
+                                specs_text: Optional[str] = None) -> str:
+        """
+        從已載入的 Playwright 分頁提取概覽，找不到概覽時改用規格
+
+        Args:
+            specs_text: 已提取的規格文字，找不到概覽時直接使用，避免重複查詢
+        """
+        selector, text = await self.find_section_in_page(page, 'overview', category)
+        if not text:
+            logger.info("🔄 嘗試提取產品規格...")
+            if specs_text is None:
+                _, specs_text = await self.find_section_in_page(page, 'specs', category)
+            text = specs_text
+        return self._finish(selector, text)
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+以內容定址的產品頁面快取
+頁面以 gzip 壓縮後依 SHA-256 儲存，內容相同的頁面只存一份；索引記錄每個正規化網址對應的內容、
+ETag 與 Last-Modified，用於條件式請求與完全離線的重新解析
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = 'data/page_cache'
+
+
+def normalize_url(url: str) -> str:
+    """正規化產品網址：主機名稱轉小寫，移除查詢字串、片段與結尾斜線"""
+    parts = urlsplit(url.strip())
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((parts.scheme.lower() or 'https', parts.netloc.lower(), path, '', ''))
+
+
+class PageCache:
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, save_every: int = 20):
+        """
+        初始化頁面快取
+
+        Args:
+            cache_dir: 快取目錄，內含 index.json 與 blobs/
+            save_every: 累積多少筆更新後自動寫入索引
+        """
+        self.cache_dir = cache_dir
+        self.blob_dir = os.path.join(cache_dir, 'blobs')
+        self.index_path = os.path.join(cache_dir, 'index.json')
+        self.save_every = save_every
+        self._lock = threading.Lock()
+        self._dirty = 0
+        self._dirty_keys = set()
+        self.index: Dict[str, Dict] = self._load_index()
+
+    def _load_index(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"⚠️ 載入頁面快取索引失敗: {e}")
+            return {}
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.blob_dir, digest[:2], f'{digest}.html.gz')
+
+    def get_entry(self, url: str) -> Optional[Dict]:
+        """取得網址的快取紀錄"""
+        with self._lock:
+            entry = self.index.get(normalize_url(url))
+            return dict(entry) if entry else None
+
+    def get(self, url: str) -> Optional[bytes]:
+        """取得快取的頁面內容，不存在時回傳 None"""
+        entry = self.get_entry(url)
+        if not entry:
+            return None
+
+        path = self._blob_path(entry['sha256'])
+        if not os.path.exists(path):
+            return None
+
+        with gzip.open(path, 'rb') as f:
+            return f.read()
+
+    def get_text(self, url: str) -> Optional[str]:
+        """取得快取的頁面 HTML 文字"""
+        body = self.get(url)
+        if body is None:
+            return None
+        entry = self.get_entry(url) or {}
+        return body.decode(entry.get('encoding') or 'utf-8', errors='replace')
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """取得條件式請求標頭 (If-None-Match / If-Modified-Since)"""
+        entry = self.get_entry(url)
+        if not entry or not os.path.exists(self._blob_path(entry['sha256'])):
+            return {}
+
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def store(self, url: str, body: bytes, headers: Optional[Dict] = None, encoding: Optional[str] = None) -> str:
+        """
+        儲存頁面內容
+
+        Returns:
+            內容的 SHA-256
+        """
+        headers = headers or {}
+        digest = hashlib.sha256(body).hexdigest()
+        path = self._blob_path(digest)
+
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f'{path}.{os.getpid()}.tmp'
+            with gzip.open(temp_path, 'wb') as f:
+                f.write(body)
+            os.replace(temp_path, path)
+
+        now = datetime.now().isoformat()
+        key = normalize_url(url)
+        with self._lock:
+            self.index[key] = {
+                'sha256': digest,
+                'etag': headers.get('ETag') or headers.get('etag'),
+                'last_modified': headers.get('Last-Modified') or headers.get('last-modified'),
+                'encoding': encoding,
+                'size': len(body),
+                'fetched_at': now,
+                'validated_at': now
+            }
+            self._dirty += 1
+            self._dirty_keys.add(key)
+            should_save = self._dirty >= self.save_every
+
+        if should_save:
+            self.save()
+        return digest
+
+    def mark_validated(self, url: str):
+        """伺服器回傳 304 時更新驗證時間"""
+        key = normalize_url(url)
+        with self._lock:
+            entry = self.index.get(key)
+            if entry:
+                entry['validated_at'] = datetime.now().isoformat()
+                self._dirty += 1
+                self._dirty_keys.add(key)
+
+    def urls(self) -> List[str]:
+        """列出所有已快取的正規化網址"""
+        with self._lock:
+            return list(self.index.keys())
+
+    def save(self):
+        """以原子替換寫入索引"""
+        with self._lock:
+            if not self._dirty:
+                return
+            # 分片爬取時多個工作行程共用同一份索引，以磁碟上的索引為基礎合併自己更新的紀錄
+            own = {key: self.index[key] for key in self._dirty_keys if key in self.index}
+            self.index.update(self._load_index())
+            self.index.update(own)
+            snapshot = json.dumps(self.index, ensure_ascii=False, indent=2)
+            self._dirty = 0
+            self._dirty_keys.clear()
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temp_path = f'{self.index_path}.{os.getpid()}.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(snapshot)
+            os.replace(temp_path, self.index_path)
+        except Exception as e:
+            logger.error(f"❌ 儲存頁面快取索引失敗: {e}")
+
+    def get_stats(self) -> Dict:
+        """取得快取大小統計"""
+        with self._lock:
+            entries = list(self.index.values())
+
+        digests = {entry['sha256'] for entry in entries}
+        stored_bytes = sum(
+            os.path.getsize(self._blob_path(digest))
+            for digest in digests if os.path.exists(self._blob_path(digest))
+        )
+        return {
+            'urls': len(entries),
+            'unique_pages': len(digests),
+            'raw_bytes': sum(entry.get('size', 0) for entry in entries),
+            'stored_bytes': stored_bytes
+        }
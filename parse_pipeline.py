@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+抓取與解析分離的處理管線
+抓取階段把原始 HTML 放進有上限的佇列，解析階段在 ProcessPoolExecutor 中執行 BeautifulSoup，
+佇列滿時抓取階段會暫停，避免解析跟不上時 HTML 在記憶體中堆積
+"""
+
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from async_fetcher import AsyncFetcher
+
+logger = logging.getLogger(__name__)
+
+
+class FetchParsePipeline:
+    def __init__(self, fetcher: AsyncFetcher, parse_func: Callable[[str], object],
+                 max_workers: Optional[int] = None, queue_size: Optional[int] = None):
+        """
+        初始化處理管線
+
+        Args:
+            fetcher: 非同步抓取引擎
+            parse_func: 解析函式，必須是模組層級函式才能傳給子行程
+            max_workers: 解析行程數，預設為 CPU 核心數
+            queue_size: 等待解析的 HTML 數量上限，預設為解析行程數的兩倍
+        """
+        self.fetcher = fetcher
+        self.parse_func = parse_func
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.queue_size = queue_size or self.max_workers * 2
+        self.reset_stats()
+
+    def reset_stats(self):
+        """重設統計資料"""
+        self.stats = {
+            'fetched': 0,
+            'fetch_failed': 0,
+            'deadline_skipped': 0,
+            'parsed': 0,
+            'parse_failed': 0,
+            'parse_seconds': 0.0,
+            'producer_wait_seconds': 0.0,
+            'max_queue_depth': 0
+        }
+
+    async def run(self, urls: List[str],
+                  on_result: Optional[Callable[[str, object], None]] = None,
+                  deadline: Optional[float] = None) -> Dict[str, object]:
+        """
+        抓取並解析所有網址
+
+        Args:
+            on_result: 每個網址解析成功後立即呼叫，例如寫入爬取日誌
+            deadline: 停止抓取的時間點 (time.monotonic)，之後不再發出新請求，進行中的請求也會被取消；
+                      網址依傳入順序取得抓取名額，重要的網址應排在前面
+
+        Returns:
+            {url: 解析結果}，抓取或解析失敗的網址結果為 None，因時間到而未抓取的網址不會出現
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        # 抓取完成到放入佇列之間也佔用名額，確保記憶體中的 HTML 數量有上限
+        fetch_slots = asyncio.Semaphore(self.fetcher.concurrency)
+        results: Dict[str, object] = {}
+
+        async def produce(url):
+            async with fetch_slots:
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    self.stats['deadline_skipped'] += 1
+                    return
+                try:
+                    html = await asyncio.wait_for(self.fetcher.fetch(url), remaining)
+                except Exception as e:
+                    if deadline is not None and time.monotonic() >= deadline:
+                        # 時間到時取消進行中的請求，留給下次執行
+                        self.stats['deadline_skipped'] += 1
+                        return
+                    logger.warning(f"⚠️ 抓取失敗 {url}: {e}")
+                    self.stats['fetch_failed'] += 1
+                    results[url] = None
+                    return
+
+                self.stats['fetched'] += 1
+                started = time.perf_counter()
+                await queue.put((url, html))
+                self.stats['producer_wait_seconds'] += time.perf_counter() - started
+                self.stats['max_queue_depth'] = max(self.stats['max_queue_depth'], queue.qsize())
+
+        async def consume(executor):
+            while True:
+                item = await queue.get()
+                try:
+                    if item is None:
+                        return
+
+                    url, html = item
+                    started = time.perf_counter()
+                    try:
+                        results[url] = await loop.run_in_executor(executor, self.parse_func, html)
+                        self.stats['parsed'] += 1
+                    except Exception as e:
+                        logger.warning(f"⚠️ 解析失敗 {url}: {e}")
+                        self.stats['parse_failed'] += 1
+                        results[url] = None
+                    self.stats['parse_seconds'] += time.perf_counter() - started
+
+                    if on_result and results[url] is not None:
+                        try:
+                            on_result(url, results[url])
+                        except Exception as e:
+                            logger.warning(f"⚠️ 處理解析結果失敗 {url}: {e}")
+                finally:
+                    queue.task_done()
+
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            consumers = [asyncio.create_task(consume(executor)) for _ in range(self.max_workers)]
+            try:
+                await asyncio.gather(*[produce(url) for url in urls])
+            finally:
+                for _ in consumers:
+                    await queue.put(None)
+                await asyncio.gather(*consumers)
+
+        return results
+
+    def get_stats(self) -> Dict:
+        """取得管線統計"""
+        return {
+            **self.stats,
+            'parse_seconds': round(self.stats['parse_seconds'], 2),
+            'producer_wait_seconds': round(self.stats['producer_wait_seconds'], 2),
+            'workers': self.max_workers,
+            'queue_size': self.queue_size
+        }
@@ -11,6 +11,8 @@ from datetime import datetime, date, timedelta
 from typing import Dict, List, Optional, Tuple
 import statistics
 from collections import defaultdict
+from price_snapshots import daily_snapshot_files
+from product_key import history_product_id
 
 class PriceAnalyzer:
     def __init__(self):
@@ -24,8 +26,8 @@ class PriceAnalyzer:
                 print(f"❌ 價格歷史目錄不存在: {self.price_history_dir}")
                 return []
             
-            files = [f for f in os.listdir(self.price_history_dir) if f.endswith('.json')]
-            files = sorted(files)[-days:]  # 取最近N天
+            # 一天可能有多份快照，每天只取最後一份，趨勢和統計仍以天為單位
+            files = daily_snapshot_files(self.price_history_dir, days)
             
             history_data = []
             for filename in files:
@@ -53,7 +55,7 @@ class PriceAnalyzer:
         for day_data in history_data:
             for category_data in day_data.get('categories', {}).values():
                 for product in category_data.get('products', []):
-                    product_id = product['product_id']
+                    product_id = history_product_id(product)
                     product_trends[product_id].append({
                         'date': day_data['date'],
                         'price': product['price'],
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+價格追蹤快照檔案
+列表有變動時一天會追蹤價格好幾次，每次追蹤以時間戳記另存一份快照，同一天較早的觀察不會被覆寫；
+讀取「最近 N 天」時依檔名中的日期篩選，而不是取最後 N 個檔案；
+以天為單位的統計改用 daily_snapshot_files，每天只取最後一份快照
+"""
+
+import os
+import re
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+
+SNAPSHOT_PREFIX = 'price_tracking_'
+# price_tracking_2025-06-14.json（舊版每日一份）或 price_tracking_2025-06-14T093000.json
+SNAPSHOT_PATTERN = re.compile(r'^price_tracking_(\d{4}-\d{2}-\d{2})(?:T\d{6})?\.json$')
+
+
+def snapshot_id(moment: Optional[datetime] = None) -> str:
+    """快照 ID，例如 2025-06-14T093000；依字母排序即為時間順序"""
+    return (moment or datetime.now()).strftime('%Y-%m-%dT%H%M%S')
+
+
+def snapshot_filename(snapshot: str) -> str:
+    """快照的檔名"""
+    return f'{SNAPSHOT_PREFIX}{snapshot}.json'
+
+
+def recent_snapshot_files(history_dir: str, days: Optional[int] = None) -> List[str]:
+    """
+    依時間排序的快照檔名
+
+    Args:
+        history_dir: 價格歷史目錄
+        days: 只取最近 N 天（包含今天）的快照，未指定時回傳全部
+    """
+    if not os.path.isdir(history_dir):
+        return []
+
+    cutoff = (date.today() - timedelta(days=days - 1)).isoformat() if days else ''
+    files = []
+    for filename in os.listdir(history_dir):
+        match = SNAPSHOT_PATTERN.match(filename)
+        if match and match.group(1) >= cutoff:
+            files.append(filename)
+    # 舊版每日檔名的 '.' 排在 'T' 之前，同一天的舊檔仍排在新快照前面
+    return sorted(files)
+
+
+def daily_snapshot_files(history_dir: str, days: Optional[int] = None) -> List[str]:
+    """
+    每天最後一份快照的檔名，依日期排序
+
+    價格趨勢與類別統計把每個檔案當成一天的資料點，一天追蹤幾次都只能算一次，
+    否則列表變動頻繁的日子會被多算好幾倍
+
+    Args:
+        history_dir: 價格歷史目錄
+        days: 只取最近 N 天（包含今天），未指定時回傳全部
+    """
+    latest = {}
+    for filename in recent_snapshot_files(history_dir, days):
+        # recent_snapshot_files 已依時間排序，後面的檔案覆蓋同一天較早的快照
+        latest[SNAPSHOT_PATTERN.match(filename).group(1)] = filename
+    return [latest[day] for day in sorted(latest)]
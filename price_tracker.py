@@ -8,12 +8,13 @@ Apple 整修品價格追蹤系統
 import json
 import os
 from datetime import datetime, date
-import hashlib
 import re
 from typing import Dict, List, Optional, Tuple
 import firebase_admin
 from firebase_admin import credentials, firestore
 from chatgpt_query import AppleRefurbishedQuery
+from price_snapshots import recent_snapshot_files, snapshot_filename, snapshot_id
+from product_key import history_product_id, product_id
 
 class PriceTracker:
     def __init__(self):
@@ -36,17 +37,9 @@ class PriceTracker:
         if not os.path.exists(self.price_history_dir):
             os.makedirs(self.price_history_dir)
     
-    def generate_product_id(self, product: Dict) -> str:
-        """為產品生成唯一ID"""
-        title = product.get('產品標題', '')
-        # 移除價格和日期相關資訊，只保留核心產品資訊
-        clean_title = re.sub(r'\(整修品\)', '', title)
-        clean_title = re.sub(r'NT\$[\d,]+', '', clean_title)
-        clean_title = clean_title.strip()
-        
-        # 使用 MD5 生成短 ID
-        product_hash = hashlib.md5(clean_title.encode('utf-8')).hexdigest()[:12]
-        return f"{product.get('category', 'unknown')}_{product_hash}"
+    def generate_product_id(self, product: Dict, category: Optional[str] = None) -> str:
+        """為產品生成唯一ID：以網址中的零件編號識別，標題相同的不同規格不會衝突"""
+        return product_id(product, category)
     
     def extract_price_number(self, price_str: str) -> Optional[int]:
         """從價格字串中提取數字"""
@@ -63,9 +56,12 @@ class PriceTracker:
         today = date.today().isoformat()
         print(f"🔍 開始追蹤 {today} 的產品價格...")
         
+        now = datetime.now()
         tracking_result = {
             'date': today,
-            'timestamp': datetime.now().isoformat(),
+            # 列表有變動時一天會追蹤好幾次，每次另存一份快照
+            'snapshot_id': snapshot_id(now),
+            'timestamp': now.isoformat(),
             'categories': {},
             'total_products': 0,
             'price_changes': [],
@@ -73,7 +69,7 @@ class PriceTracker:
             'discontinued_products': []
         }
         
-        # 載入昨日價格資料（如果存在）
+        # 載入上一次追蹤的價格資料（如果存在），同一天較早的追蹤也算；每次變化只回報一次
         yesterday_prices = self.load_yesterday_prices()
         
         # 追蹤每個類別的產品
@@ -87,7 +83,7 @@ class PriceTracker:
             }
             
             for product in products:
-                product_id = self.generate_product_id(product)
+                product_id = self.generate_product_id(product, category)
                 current_price = self.extract_price_number(product.get('產品售價', ''))
                 
                 product_data = {
@@ -125,10 +121,11 @@ class PriceTracker:
             tracking_result['total_products'] += len(products)
         
         # 檢查停產產品
+        current_ids = {p['product_id']
+                       for cat_data in tracking_result['categories'].values()
+                       for p in cat_data['products']}
         for product_id, yesterday_product in yesterday_prices.items():
-            if not any(product_id == p['product_id'] 
-                      for cat_data in tracking_result['categories'].values() 
-                      for p in cat_data['products']):
+            if product_id not in current_ids:
                 tracking_result['discontinued_products'].append(yesterday_product)
                 print(f"❌ 停產產品: {yesterday_product.get('title', '')[:30]}...")
         
@@ -148,37 +145,37 @@ class PriceTracker:
         return tracking_result
     
     def load_yesterday_prices(self) -> Dict:
-        """載入昨日價格資料"""
+        """載入上一次追蹤的價格資料"""
         try:
             # 嘗試載入最近的價格資料
-            files = [f for f in os.listdir(self.price_history_dir) if f.endswith('.json')]
+            files = recent_snapshot_files(self.price_history_dir)
             if not files:
                 return {}
             
-            # 取得最新的檔案
-            latest_file = sorted(files)[-1]
+            # 取得最新的快照（可能是同一天較早的追蹤）
+            latest_file = files[-1]
             filepath = os.path.join(self.price_history_dir, latest_file)
             
             with open(filepath, 'r', encoding='utf-8') as f:
                 data = json.load(f)
             
-            # 轉換為 product_id -> product_data 的格式
+            # 轉換為 product_id -> product_data 的格式（舊紀錄依網址換算成目前的產品 ID）
             yesterday_prices = {}
             for category_data in data.get('categories', {}).values():
                 for product in category_data.get('products', []):
-                    yesterday_prices[product['product_id']] = product
+                    yesterday_prices[history_product_id(product)] = product
             
-            print(f"📊 載入昨日價格資料: {len(yesterday_prices)} 個產品")
+            print(f"📊 載入上一次追蹤的價格資料: {len(yesterday_prices)} 個產品")
             return yesterday_prices
             
         except Exception as e:
-            print(f"⚠️ 載入昨日價格資料失敗: {e}")
+            print(f"⚠️ 載入上一次追蹤的價格資料失敗: {e}")
             return {}
     
     def save_daily_tracking(self, tracking_data: Dict):
-        """儲存每日追蹤資料到本地檔案"""
+        """儲存追蹤資料到本地檔案，每次追蹤一份快照"""
         try:
-            filename = f"price_tracking_{tracking_data['date']}.json"
+            filename = snapshot_filename(tracking_data['snapshot_id'])
             filepath = os.path.join(self.price_history_dir, filename)
             
             with open(filepath, 'w', encoding='utf-8') as f:
@@ -193,7 +190,7 @@ class PriceTracker:
         """儲存追蹤資料到 Firebase"""
         try:
             # 儲存到 price_tracking collection
-            doc_ref = self.db.collection('price_tracking').document(tracking_data['date'])
+            doc_ref = self.db.collection('price_tracking').document(tracking_data['snapshot_id'])
             doc_ref.set(tracking_data)
             
             # 如果有價格變化，也儲存到 price_changes collection
@@ -216,9 +213,8 @@ class PriceTracker:
         price_history = []
         
         try:
-            # 從本地檔案讀取
-            files = [f for f in os.listdir(self.price_history_dir) if f.endswith('.json')]
-            files = sorted(files)[-days:]  # 取最近N天
+            # 從本地檔案讀取最近N天的快照
+            files = recent_snapshot_files(self.price_history_dir, days)
             
             for filename in files:
                 filepath = os.path.join(self.price_history_dir, filename)
@@ -228,9 +224,10 @@ class PriceTracker:
                 # 尋找指定產品
                 for category_data in data.get('categories', {}).values():
                     for product in category_data.get('products', []):
-                        if product['product_id'] == product_id:
+                        if history_product_id(product) == product_id:
                             price_history.append({
                                 'date': data['date'],
+                                'timestamp': data.get('timestamp'),
                                 'price': product['price'],
                                 'price_str': product['price_str']
                             })
@@ -245,8 +242,7 @@ class PriceTracker:
     def get_price_changes_summary(self, days: int = 7) -> Dict:
         """取得最近N天的價格變化摘要"""
         try:
-            files = [f for f in os.listdir(self.price_history_dir) if f.endswith('.json')]
-            files = sorted(files)[-days:]
+            files = recent_snapshot_files(self.price_history_dir, days)
             
             all_changes = []
             total_products = 0
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+產品圖片與縮圖快取
+每個產品依零件編號只下載一次圖片，原圖與縮圖都以內容的 SHA-256 命名儲存在 data/product_images/，
+事先產生 LINE Flex Message 使用的縮圖；檔名即內容雜湊，不會改變，Line Bot 可以長期快取的靜態路徑提供，
+建立產品 Bubble 時只需查詢索引，不必在回應訊息時處理任何圖片
+"""
+
+import argparse
+import asyncio
+import functools
+import hashlib
+import html
+import io
+import json
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+from page_cache import PageCache
+from product_key import product_key
+from result_writer import write_json_atomic
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_IMAGE_DIR = 'data/product_images'
+DEFAULT_CONCURRENCY = 6
+# 縮圖寬高上限；LINE 圖片元件建議不超過 1024 像素
+THUMBNAIL_SIZES = {
+    'hero': 1024,
+    'small': 240
+}
+THUMBNAIL_QUALITY = 85
+# 沒有 Pillow 時直接使用原圖，超過這個大小就不使用
+MAX_ORIGINAL_BYTES = 1024 * 1024
+# 其他行程更新索引後，多久重新讀取一次
+INDEX_RELOAD_SECONDS = 60
+# 檔名就是內容雜湊，可以永久快取
+CACHE_MAX_AGE = 365 * 24 * 3600
+
+IMAGE_EXTENSIONS = {
+    b'\xff\xd8\xff': '.jpg',
+    b'\x89PNG': '.png'
+}
+
+META_IMAGE_PATTERN = re.compile(
+    r'<meta\s+[^>]*?(?:property|name)=["\'](?:og:image|twitter:image)["\'][^>]*?content=["\']([^"\']+)["\']'
+    r'|<meta\s+[^>]*?content=["\']([^"\']+)["\'][^>]*?(?:property|name)=["\'](?:og:image|twitter:image)["\']',
+    re.IGNORECASE
+)
+
+
+def find_meta_image(page_html: str, base_url: str = '') -> Optional[str]:
+    """從產品頁面的 og:image / twitter:image 取得圖片網址"""
+    match = META_IMAGE_PATTERN.search(page_html or '')
+    if not match:
+        return None
+    return urljoin(base_url, html.unescape(match.group(1) or match.group(2)))
+
+
+def sized_image_url(url: str, size: int = THUMBNAIL_SIZES['hero']) -> str:
+    """Apple 圖片伺服器可依 wid / hei / fmt 參數輸出指定大小的 JPEG，直接下載需要的大小"""
+    parts = urlsplit(url)
+    if 'storeimages.cdn-apple.com' not in parts.netloc:
+        return url
+    query = dict(parse_qsl(parts.query, keep_blank_values=True))
+    query.update({'wid': str(size), 'hei': str(size), 'fmt': 'jpeg'})
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def _extension(data: bytes) -> str:
+    for signature, extension in IMAGE_EXTENSIONS.items():
+        if data.startswith(signature):
+            return extension
+    return '.bin'
+
+
+def make_thumbnails(data: bytes) -> Dict[str, bytes]:
+    """
+    產生各尺寸的 JPEG 縮圖
+
+    沒有安裝 Pillow 時，小於 1 MB 的 JPEG / PNG 原圖直接作為所有尺寸，否則回傳空字典
+    """
+    if not PIL_AVAILABLE:
+        if _extension(data) != '.bin' and len(data) <= MAX_ORIGINAL_BYTES:
+            return {name: data for name in THUMBNAIL_SIZES}
+        return {}
+
+    with Image.open(io.BytesIO(data)) as image:
+        # 透明背景的 PNG 轉成白底，與 Apple 商品圖一致
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        else:
+            image = image.convert('RGB')
+
+        thumbnails = {}
+        for name, size in THUMBNAIL_SIZES.items():
+            thumbnail = image.copy()
+            thumbnail.thumbnail((size, size))
+            output = io.BytesIO()
+            thumbnail.save(output, format='JPEG', quality=THUMBNAIL_QUALITY, optimize=True, progressive=True)
+            thumbnails[name] = output.getvalue()
+        return thumbnails
+
+
+class ProductImageCache:
+    def __init__(self, cache_dir: str = DEFAULT_IMAGE_DIR, page_cache: Optional[PageCache] = None,
+                 concurrency: int = DEFAULT_CONCURRENCY):
+        """
+        初始化產品圖片快取
+
+        Args:
+            cache_dir: 快取目錄，原圖在 originals/，縮圖在 thumbnails/
+            page_cache: 產品頁面快取，產品資料沒有圖片網址時從快取的頁面找 og:image
+            concurrency: 連線池大小，實際請求數由共用的自適應控制器依主機限制
+        """
+        self.cache_dir = cache_dir
+        self.originals_dir = os.path.join(cache_dir, 'originals')
+        self.thumbnails_dir = os.path.join(cache_dir, 'thumbnails')
+        self.index_path = os.path.join(cache_dir, 'index.json')
+        self.page_cache = page_cache or PageCache()
+        self.concurrency = concurrency
+        self._lock = threading.Lock()
+        self._index_mtime: Optional[float] = None
+        self._index_checked = 0.0
+        # {product_key: {'source', 'original', 'thumbnails': {size: filename}, 'fetched_at'}}
+        self.index: Dict[str, Dict] = self._load()
+
+    def _load(self) -> Dict:
+        if not os.path.exists(self.index_path):
+            return {}
+        try:
+            self._index_mtime = os.path.getmtime(self.index_path)
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"⚠️ 載入圖片索引失敗: {e}")
+            return {}
+
+    def _reload_if_changed(self):
+        """預先下載通常在排程行程中執行，Line Bot 定期檢查索引是否有更新"""
+        now = time.monotonic()
+        if now - self._index_checked < INDEX_RELOAD_SECONDS:
+            return
+        self._index_checked = now
+        try:
+            mtime = os.path.getmtime(self.index_path)
+        except OSError:
+            return
+        if mtime != self._index_mtime:
+            index = self._load()
+            with self._lock:
+                self.index = index
+
+    def thumbnail_name(self, product: Dict, size: str = 'hero') -> Optional[str]:
+        """產品縮圖的檔名，尚未下載時回傳 None（只查詢索引，不做任何網路或圖片處理）"""
+        self._reload_if_changed()
+        with self._lock:
+            entry = self.index.get(product_key(product))
+        if not entry:
+            return None
+        return entry.get('thumbnails', {}).get(size)
+
+    def thumbnail_path(self, name: str) -> str:
+        """縮圖在磁碟上的路徑"""
+        return os.path.join(self.thumbnails_dir, os.path.basename(name))
+
+    def _write_blob(self, directory: str, data: bytes, extension: str) -> str:
+        """以內容雜湊命名寫入檔案，相同內容只保存一份"""
+        name = hashlib.sha256(data).hexdigest() + extension
+        path = os.path.join(directory, name)
+        if not os.path.exists(path):
+            os.makedirs(directory, exist_ok=True)
+            temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        return name
+
+    def store(self, product: Dict, source: str, data: bytes) -> Dict:
+        """儲存原圖與縮圖並更新索引（縮圖在呼叫端的執行緒產生）"""
+        thumbnails = make_thumbnails(data)
+        extension = _extension(data)
+        entry = {
+            'source': source,
+            'original': self._write_blob(self.originals_dir, data, extension),
+            'thumbnails': {
+                name: self._write_blob(self.thumbnails_dir, thumbnail, '.jpg' if PIL_AVAILABLE else extension)
+                for name, thumbnail in thumbnails.items()
+            },
+            'fetched_at': datetime.now().isoformat()
+        }
+        with self._lock:
+            self.index[product_key(product)] = entry
+        return entry
+
+    def save(self):
+        """以原子替換寫入索引"""
+        with self._lock:
+            snapshot = dict(self.index)
+
+        try:
+            write_json_atomic(self.index_path, snapshot)
+            self._index_mtime = os.path.getmtime(self.index_path)
+        except Exception as e:
+            logger.error(f"❌ 儲存圖片索引失敗: {e}")
+
+    async def _image_url(self, fetcher, product: Dict) -> Optional[str]:
+        """產品的圖片網址：列表頁內嵌 JSON 的圖片，其次是產品頁面的 og:image"""
+        if product.get('產品圖片'):
+            return product['產品圖片']
+
+        url = product.get('產品URL', '')
+        if not url:
+            return None
+        page_html = self.page_cache.get_text(url)
+        if page_html is None:
+            # 快取沒有產品頁面時抓取一次，之後概覽更新也能使用
+            page_html = await fetcher.fetch(url)
+        return find_meta_image(page_html, url)
+
+    async def prefetch(self, products: List[Dict], refresh: bool = False) -> Dict[str, int]:
+        """
+        同時下載尚未快取的產品圖片並產生縮圖
+
+        Args:
+            products: 產品資料
+            refresh: 重新下載已快取的產品
+
+        Returns:
+            {'downloaded', 'cached', 'missing', 'failed'}
+        """
+        from adaptive_controller import get_shared_controller
+        from async_fetcher import AsyncFetcher
+
+        stats = {'downloaded': 0, 'cached': 0, 'missing': 0, 'failed': 0}
+        pending = {}
+        for product in products:
+            key = product_key(product)
+            if not key:
+                continue
+            if not refresh and key in self.index:
+                stats['cached'] += 1
+                continue
+            # 同一零件編號只下載一次
+            pending.setdefault(key, product)
+
+        if not pending:
+            return stats
+
+        logger.info(f"🖼️ 下載 {len(pending)} 個產品圖片（已快取 {stats['cached']} 個）...")
+        # 產品頁面與其他爬蟲共用 apple.com 的速率與斷路器，不另外增加負載
+        async with AsyncFetcher(concurrency=self.concurrency, page_cache=self.page_cache,
+                                controller=get_shared_controller()) as fetcher:
+            async def fetch_one(product):
+                try:
+                    source = await self._image_url(fetcher, product)
+                    if not source:
+                        stats['missing'] += 1
+                        return
+                    data = await fetcher.fetch_bytes(sized_image_url(source))
+                    # 縮圖在執行緒中產生，不卡住其他下載
+                    await asyncio.get_running_loop().run_in_executor(
+                        None, functools.partial(self.store, product, source, data))
+                    stats['downloaded'] += 1
+                except Exception as e:
+                    logger.warning(f"⚠️ 下載產品圖片失敗 {product.get('產品URL', '')[:80]}: {e}")
+                    stats['failed'] += 1
+
+            await asyncio.gather(*[fetch_one(product) for product in pending.values()])
+
+        self.save()
+        logger.info(f"✅ 產品圖片: 下載 {stats['downloaded']}，已快取 {stats['cached']}，"
+                    f"找不到圖片 {stats['missing']}，失敗 {stats['failed']}")
+        return stats
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='預先下載產品圖片並產生 LINE 縮圖')
+    parser.add_argument('--categories', nargs='*',
+                        default=['mac', 'ipad', 'iphone', 'airpods', 'homepod', 'appletv', 'accessories'],
+                        help='要下載的類別')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help='同時下載的圖片數')
+    parser.add_argument('--refresh', action='store_true', help='重新下載已快取的圖片')
+    args = parser.parse_args()
+
+    if not PIL_AVAILABLE:
+        print("⚠️ 未安裝 Pillow，只會使用 1 MB 以下的原圖，不產生縮圖 (pip install Pillow)")
+
+    products = []
+    for category in args.categories:
+        path = f'data/apple_refurbished_{category}.json'
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                products.extend(json.load(f))
+
+    cache = ProductImageCache(concurrency=args.concurrency)
+    print(f"📊 {asyncio.run(cache.prefetch(products, refresh=args.refresh))}")
+
+
+if __name__ == "__main__":
+    main()
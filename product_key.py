@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+產品的標準識別鍵值
+產品網址內含固定的 Apple 零件編號（例如 FMFJ3TA/A），後面接著很長的 fnode 追蹤參數；
+所有子系統都以零件編號作為產品鍵值，沒有零件編號時才退回去除查詢字串的網址，
+標題相同但規格或價格不同的產品不會再互相衝突
+"""
+
+import hashlib
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Union
+
+from dom_batch_extractor import extract_part_number
+from page_cache import normalize_url
+
+
+@lru_cache(maxsize=4096)
+def part_number(url: str) -> Optional[str]:
+    """從產品網址取出零件編號，同一網址只解析一次"""
+    return extract_part_number(url)
+
+
+@lru_cache(maxsize=4096)
+def canonical_url(url: str) -> str:
+    """去除 fnode 等查詢參數與片段的標準網址"""
+    return normalize_url(url) if url else ''
+
+
+def _product_url(product: Union[Dict, str]) -> str:
+    if isinstance(product, str):
+        return product
+    return product.get('產品URL') or product.get('url') or ''
+
+
+def product_key(product: Union[Dict, str]) -> str:
+    """
+    產品鍵值：優先使用零件編號，否則使用標準網址
+
+    Args:
+        product: 產品資料（產品URL 或 url 欄位）或產品網址
+    """
+    url = _product_url(product)
+    return part_number(url) or canonical_url(url)
+
+
+def _legacy_title_hash(title: str) -> str:
+    """舊版以標題計算的雜湊，只用於沒有網址的產品"""
+    clean_title = re.sub(r'\(整修品\)', '', title)
+    clean_title = re.sub(r'NT\$[\d,]+', '', clean_title)
+    return hashlib.md5(clean_title.strip().encode('utf-8')).hexdigest()[:12]
+
+
+def product_id(product: Dict, category: Optional[str] = None) -> str:
+    """
+    可作為 Firestore 文件 ID 與價格歷史鍵值的產品 ID，例如 mac_FMFJ3TA-A
+
+    Args:
+        product: 產品資料
+        category: 產品類別，未提供時使用產品資料中的 category
+    """
+    category = category or product.get('category', 'unknown')
+    url = _product_url(product)
+    number = part_number(url)
+    if number:
+        # Firestore 文件 ID 不能包含斜線
+        return f"{category}_{number.replace('/', '-')}"
+    if url:
+        return f"{category}_{hashlib.sha1(canonical_url(url).encode('utf-8')).hexdigest()[:12]}"
+    return f"{category}_{_legacy_title_hash(product.get('產品標題') or product.get('title', ''))}"
+
+
+def history_product_id(entry: Dict) -> str:
+    """價格歷史紀錄的產品 ID；舊紀錄以標題雜湊為 ID，有網址時改用目前的產品 ID 以便與新紀錄對應"""
+    if entry.get('url'):
+        return product_id(entry, entry.get('category'))
+    return entry['product_id']
+
+
+def index_by_key(products: Iterable[Dict]) -> Dict[str, Dict]:
+    """以產品鍵值建立索引，同一鍵值有多筆時以最後一筆為準"""
+    return {product_key(product): product for product in products}
@@ -6,19 +6,50 @@
 從 rc-pdsection-mainpanel 區域提取詳細產品規格
 """
 
+import asyncio
 import json
 import requests
-from bs4 import BeautifulSoup
-import re
 import time
 import os
 from datetime import datetime
+from functools import partial
 from typing import Dict, List, Optional
 import shutil
+from adaptive_controller import AdaptiveCrawlController, get_shared_controller, parse_retry_after
+from async_fetcher import AsyncFetcher, DEFAULT_CONCURRENCY
+from crawl_governor import HostRateGovernor
+from crawl_journal import CrawlJournal
+from crawl_queue import STATUS_DONE, STATUS_FAILED, ShardedCrawlCoordinator
+from html_parser_backend import parse_document
+from overview_extractor import PRODUCTION_UNWANTED_PATTERNS, OverviewExtractor
+from page_cache import PageCache, normalize_url
+from parse_pipeline import FetchParsePipeline
+from refresh_planner import RefreshPlanner, load_category_demand
+from refresh_state import OverviewRefreshState
+from result_writer import write_json_records
+
+OVERVIEW_MAX_LENGTH = 800
+# 與瀏覽器版概覽更新器（長度上限不同）分開記錄爬取日誌
+JOURNAL_NAMESPACE = 'http_overview'
 
 class ProductionOverviewUpdater:
-    def __init__(self):
-        """初始化生產版概覽更新器"""
+    def __init__(self, concurrency: int = DEFAULT_CONCURRENCY, requests_per_second: Optional[float] = None,
+                 parse_workers: Optional[int] = None, parser_backend: Optional[str] = None,
+                 page_cache: Optional[PageCache] = None, offline: bool = False, workers: int = 1):
+        """
+        初始化生產版概覽更新器
+        
+        Args:
+            concurrency: 連線池大小，實際同時請求數由自適應控制器依伺服器回應調整
+            requests_per_second: 對 apple.com 的請求速率上限，從一半開始依伺服器回應調整；
+                                 預設使用所有爬蟲共用的控制器（約每 4.5 秒一個請求），需要更快時才明確指定
+            parse_workers: 解析 HTML 的行程數，預設為 CPU 核心數
+            parser_backend: HTML 解析後端 (selectolax / lxml / html.parser)，預設使用最快的已安裝後端
+            page_cache: 產品頁面快取，預設為 data/page_cache
+            offline: 只從頁面快取重新解析，不發出任何網路請求
+            workers: 大於 1 時以多個工作行程分片抓取，透過 data/crawl_queue.sqlite 分配網址，
+                     速率上限由所有工作行程共同分攤
+        """
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
@@ -35,156 +66,90 @@ class ProductionOverviewUpdater:
         }
         
         self.categories = ['mac', 'ipad', 'iphone', 'airpods', 'homepod', 'appletv', 'accessories']
+        
+        self.concurrency = concurrency
+        self.parse_workers = parse_workers
+        self.parser_backend = parser_backend
+        self.overview_extractor = OverviewExtractor(max_length=OVERVIEW_MAX_LENGTH,
+                                                 unwanted_patterns=PRODUCTION_UNWANTED_PATTERNS)
+        if requests_per_second is None:
+            # 與其他爬蟲共用同一個主機速率，不另外增加對 apple.com 的負載
+            self.controller = get_shared_controller()
+        else:
+            self.controller = AdaptiveCrawlController(
+                governor=HostRateGovernor(rate_per_second=requests_per_second),
+                initial_limit=max(1, concurrency // 2),
+                max_limit=concurrency,
+                rate_per_slot=requests_per_second / concurrency
+            )
+        self.governor = self.controller.governor
+        self.page_cache = page_cache or PageCache()
+        self.offline = offline
+        self.workers = workers
+        self.refresh_state = OverviewRefreshState()
+        # 最近一次類別更新的抓取與解析統計
+        self.last_run_stats: Dict = {}
+        
+        # 單一產品查詢時也共用連線，避免每次重新建立 TCP/TLS
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
 
-    def extract_detailed_overview(self, product_url: str) -> str:
+    def extract_detailed_overview(self, product_url: str, category: Optional[str] = None) -> str:
         """從產品 URL 提取詳細概覽"""
         try:
             print(f"🔍 提取概覽: {product_url[:80]}...")
             
-            # 發送 HTTP 請求
-            response = requests.get(product_url, headers=self.headers, timeout=30)
-            response.raise_for_status()
-            
-            # 解析 HTML
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # 嘗試多種選擇器來找到產品概覽區域
-            overview_selectors = [
-                '.rc-pdsection-mainpanel.column.large-9.small-12',
-                '.rc-pdsection-mainpanel',
-                '.pd-overview',
-                '.pd-highlights',
-                '[data-module-template="pd/overview"]',
-                '.pd-overview-content',
-                '.rf-pdp-overview',
-                '.rf-pdp-highlights',
-                '.rf-pdp-techspecs'
-            ]
-            
-            overview_text = ""
-            
-            for selector in overview_selectors:
-                try:
-                    elements = soup.select(selector)
-                    if elements:
-                        print(f"✅ 找到概覽區域: {selector}")
-                        
-                        for element in elements:
-                            text = element.get_text(strip=True, separator='\n')
-                            if text and len(text.strip()) > 50:
-                                overview_text += text.strip() + "\n\n"
-                        
-                        if overview_text:
-                            break
-                            
-                except Exception as e:
-                    print(f"選擇器 {selector} 失敗: {e}")
-                    continue
-            
-            # 如果沒有找到概覽，嘗試提取產品規格
-            if not overview_text:
-                print("🔄 嘗試提取產品規格...")
-                overview_text = self.extract_product_specs(soup)
-            
-            # 清理和格式化文字
-            if overview_text:
-                overview_text = self.clean_overview_text(overview_text)
-                print(f"✅ 成功提取概覽 ({len(overview_text)} 字元)")
-                return overview_text
-            else:
-                print("⚠️ 未能提取到詳細概覽")
-                return ""
+            return self.parse_overview_html(self.fetch_page(product_url), category) or ""
                 
         except Exception as e:
             print(f"❌ 提取概覽失敗: {e}")
             return ""
 
-    def extract_product_specs(self, soup) -> str:
-        """提取產品規格資訊"""
-        specs_text = ""
-        
-        # 嘗試多種規格選擇器
-        spec_selectors = [
-            '.rf-pdp-techspecs',
-            '.pd-techspecs',
-            '.rf-pdp-highlights',
-            '.pd-highlights',
-            '.rf-pdp-overview-content',
-            '.pd-overview-content',
-            '[data-module-template="pd/techspecs"]',
-            '.rf-pdp-content',
-            '.pd-features',
-            '.product-features',
-            '.tech-specs',
-            '.product-highlights'
-        ]
-        
-        for selector in spec_selectors:
-            try:
-                elements = soup.select(selector)
-                if elements:
-                    print(f"✅ 找到規格區域: {selector}")
-                    
-                    for element in elements:
-                        text = element.get_text(strip=True, separator='\n')
-                        if text and len(text.strip()) > 30:
-                            specs_text += text.strip() + "\n\n"
-                    
-                    if specs_text:
-                        break
-                        
-            except Exception as e:
-                print(f"規格選擇器 {selector} 失敗: {e}")
+    def fetch_page(self, product_url: str) -> bytes:
+        """取得產品頁面，頁面未變更時 (304) 直接使用快取內容"""
+        if self.offline:
+            cached = self.page_cache.get(product_url)
+            if cached is None:
+                raise LookupError(f"離線模式下沒有快取: {product_url}")
+            return cached
+        
+        # 發送條件式 HTTP 請求，遇到限流或連線錯誤時以指數退避重試
+        conditional_headers = self.page_cache.conditional_headers(product_url)
+        attempt = 0
+        while True:
+            with self.controller.slot_sync(product_url) as ticket:
+                try:
+                    response = self.session.get(product_url, timeout=30, headers=conditional_headers)
+                    ticket.status = response.status_code
+                    ticket.retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                except requests.RequestException:
+                    if not self.controller.should_retry(None, attempt, product_url):
+                        raise
+            
+            if ticket.status == 304:
+                cached = self.page_cache.get(product_url)
+                if cached is not None:
+                    self.page_cache.mark_validated(product_url)
+                    return cached
+                if not conditional_headers:
+                    raise requests.HTTPError(f"304 Not Modified 但沒有快取內容: {product_url}", response=response)
+                # 快取內容已不存在，不帶條件標頭重新請求一次
+                conditional_headers = {}
                 continue
-        
-        return specs_text
+            
+            if not self.controller.should_retry(ticket.status, attempt, product_url):
+                break
+            time.sleep(self.controller.retry_delay(attempt, ticket.retry_after))
+            attempt += 1
+        
+        response.raise_for_status()
+        self.page_cache.store(product_url, response.content, response.headers, response.encoding)
+        self.page_cache.save()
+        return response.content
 
-    def clean_overview_text(self, text: str) -> str:
-        """清理和格式化概覽文字"""
-        if not text:
-            return ""
-        
-        # 移除多餘的空白和換行
-        text = re.sub(r'\n\s*\n', '\n', text)
-        text = re.sub(r'\s+', ' ', text)
-        
-        # 移除不需要的內容
-        unwanted_patterns = [
-            r'加入購物車.*',
-            r'立即購買.*',
-            r'選擇.*',
-            r'Cookie.*',
-            r'隱私權.*',
-            r'使用條款.*',
-            r'©.*Apple.*',
-            r'台灣.*',
-            r'Apple Store.*',
-            r'購買.*',
-            r'比較.*',
-            r'瞭解更多.*',
-            r'這會在新視窗開啟.*',
-            r'可另外.*'
-        ]
-        
-        for pattern in unwanted_patterns:
-            text = re.sub(pattern, '', text, flags=re.IGNORECASE)
-        
-        # 格式化文字，保留重要的換行
-        lines = text.split('\n')
-        formatted_lines = []
-        
-        for line in lines:
-            line = line.strip()
-            if line and len(line) > 5:  # 過濾太短的行
-                formatted_lines.append(line)
-        
-        # 重新組合，限制長度
-        formatted_text = '\n'.join(formatted_lines)
-        
-        if len(formatted_text) > 800:
-            formatted_text = formatted_text[:800] + "..."
-        
-        return formatted_text.strip()
+    def parse_overview_html(self, html, category: Optional[str] = None) -> Optional[str]:
+        """從產品頁面 HTML 提取詳細概覽，解析失敗時回傳 None"""
+        return parse_overview_page(html, self.parser_backend, category, self.overview_extractor)
 
     def load_products(self, category: str) -> List[Dict]:
         """載入指定類別的產品"""
@@ -222,48 +187,155 @@ class ProductionOverviewUpdater:
             print(f"❌ 備份檔案失敗: {e}")
             return ""
 
-    def update_category_overview(self, category: str, limit: int = None, start_from: int = 0) -> bool:
+    def update_category_overview(self, category: str, limit: int = None, start_from: int = 0,
+                                 incremental: bool = False, targets: Optional[List[int]] = None,
+                                 deadline: Optional[float] = None) -> bool:
         """更新指定類別的產品概覽"""
+        return asyncio.run(self.update_category_overview_async(category, limit, start_from, incremental,
+                                                               targets, deadline))
+
+    async def update_category_overview_async(self, category: str, limit: int = None, start_from: int = 0,
+                                             incremental: bool = False, targets: Optional[List[int]] = None,
+                                             deadline: Optional[float] = None) -> bool:
+        """
+        以共用連線池同時抓取產品頁面，更新指定類別的產品概覽
+        
+        Args:
+            incremental: 只抓取新產品、列表資料有變動或過久未更新的產品，新產品優先
+            targets: 依序要更新的產品索引（例如更新規劃的結果），提供時忽略 limit、start_from 與 incremental
+            deadline: 停止發出新請求的時間點 (time.monotonic)，未抓取的產品保持原狀留給下次執行；
+                      設定時不使用多行程分片抓取
+        """
         print(f"\n🚀 開始更新 {category.upper()} 類別的產品概覽...")
         
         # 載入產品
-        products = self.load_products(category)
-        if not products:
+        original_products = self.load_products(category)
+        if not original_products:
             return False
         
+        # 決定處理範圍
+        if targets is not None:
+            print(f"📋 依更新規劃處理 {len(targets)}/{len(original_products)} 個產品")
+        elif incremental:
+            targets = [index for index, _ in self.refresh_state.plan(category, original_products, limit)]
+            print(f"📋 增量更新：{len(targets)}/{len(original_products)} 個產品需要重新抓取")
+            if not targets:
+                print("✅ 所有產品都在有效期限內，不需要更新")
+                return True
+        else:
+            targets = list(range(len(original_products)))
+            if start_from > 0:
+                targets = targets[start_from:]
+                print(f"🔢 從第 {start_from + 1} 個產品開始處理")
+            
+            if limit:
+                targets = targets[:limit]
+                print(f"🔢 限制處理 {limit} 個產品")
+        
+        # 類別持續失敗時直接略過，冷卻時間過後這次執行就是探測
+        breaker = self.controller.breakers.category(category)
+        if not self.offline and not breaker.allow():
+            print(f"⛔ {category.upper()} 斷路器開啟，{breaker.retry_in():.0f} 秒後再探測，略過這個類別")
+            return False
+        
+        # 上次中斷前已完成的產品直接使用日誌紀錄，不重新抓取
+        journal = CrawlJournal(category, JOURNAL_NAMESPACE)
+        recovered = journal.load()
+        if recovered:
+            print(f"🔁 從爬取日誌恢復 {len(recovered)} 個已完成的產品")
+        
         # 備份原始檔案
         backup_file = self.backup_original_file(category)
         if not backup_file:
             print("⚠️ 無法備份原始檔案，繼續執行...")
         
-        # 限制處理範圍
-        if start_from > 0:
-            products = products[start_from:]
-            print(f"🔢 從第 {start_from + 1} 個產品開始處理")
-        
-        if limit:
-            products = products[:limit]
-            print(f"🔢 限制處理 {limit} 個產品")
-        
-        updated_products = []
+        urls = [original_products[index].get('產品URL', '') for index in targets
+                if original_products[index].get('產品URL', '')
+                and normalize_url(original_products[index]['產品URL']) not in recovered]
+        sharded = self.workers > 1 and not self.offline and deadline is None
+        if self.offline:
+            print(f"📦 離線模式：從頁面快取重新解析 {len(urls)} 個產品頁面...")
+        elif sharded:
+            print(f"👷 以 {self.workers} 個工作行程分片抓取 {len(urls)} 個產品頁面...")
+        else:
+            print(f"🌐 同時抓取 {len(urls)} 個產品頁面 (同時 {self.concurrency} 個)，在子行程中解析...")
+        
+        started = time.perf_counter()
+        fetch_stats = pipeline_stats = None
+        coordinator = None
+        job = f'overview:{category}'
+        if sharded:
+            # 各工作行程自行抓取與解析，結果保存在佇列中，中斷後重新執行會跳過已完成的網址
+            coordinator = ShardedCrawlCoordinator(workers=self.workers,
+                                                  requests_per_second=self.governor.rate_per_second,
+                                                  parser_backend=self.parser_backend)
+            overview_by_url = await asyncio.get_running_loop().run_in_executor(
+                None, partial(coordinator.run, job, [(category, url) for url in urls]))
+            self.last_run_stats = {'queue': coordinator.stats}
+        else:
+            # 抓取與解析分離：解析在行程池中進行，不會卡住抓取
+            async with AsyncFetcher(headers=self.headers, concurrency=self.concurrency,
+                                    page_cache=self.page_cache, offline=self.offline,
+                                    controller=self.controller) as fetcher:
+                parse_func = partial(parse_overview_page, parser_backend=self.parser_backend, category=category)
+                pipeline = FetchParsePipeline(fetcher, parse_func, max_workers=self.parse_workers)
+                # 每解析完一個產品就寫入日誌，沒有擷取到概覽的產品下次重新抓取
+                def record_overview(url, overview):
+                    if overview:
+                        journal.record(url, overview)
+                
+                with journal:
+                    overview_by_url = await pipeline.run(urls, on_result=record_overview, deadline=deadline)
+                fetch_stats = fetcher.get_stats()
+            pipeline_stats = pipeline.get_stats()
+            self.last_run_stats = {'fetch': fetch_stats, 'pipeline': pipeline_stats}
+        
+        # 全部抓取失敗才算類別失敗，個別網址的失敗由主機斷路器處理；因時間到而未抓取的網址不計入
+        attempted = [url for url in urls if url in overview_by_url]
+        if attempted and not self.offline:
+            if any(overview_by_url.get(url) is not None for url in attempted):
+                breaker.record_success()
+            else:
+                breaker.record_failure(f"{len(attempted)} 個產品頁面全部抓取失敗")
+        
+        recovered_count = 0
+        for index in targets:
+            product_url = original_products[index].get('產品URL', '')
+            entry = recovered.get(normalize_url(product_url)) if product_url else None
+            if entry:
+                overview_by_url[product_url] = entry['overview']
+                recovered_count += 1
+        
+        final_products = list(original_products)
+        # 寫回類別 JSON 成功後才記錄為已更新，寫入失敗時下次增量更新會重新抓取
+        refreshed = []
         success_count = 0
         failed_count = 0
+        deferred_count = 0
         
-        for i, product in enumerate(products, start_from + 1):
+        for position, index in enumerate(targets, 1):
+            product = original_products[index]
             try:
                 print(f"\n{'='*80}")
-                print(f"處理產品 {i}/{len(products) + start_from}: {product.get('產品標題', '')[:60]}...")
+                print(f"處理產品 {index + 1} ({position}/{len(targets)}): {product.get('產品標題', '')[:60]}...")
                 print(f"{'='*80}")
                 
                 product_url = product.get('產品URL', '')
                 if not product_url:
                     print("⚠️ 產品沒有 URL，跳過")
-                    updated_products.append(product)
                     failed_count += 1
                     continue
                 
-                # 提取詳細概覽
-                detailed_overview = self.extract_detailed_overview(product_url)
+                if product_url not in overview_by_url and deadline is not None:
+                    print("⏰ 已用完時間預算，留給下次執行")
+                    deferred_count += 1
+                    continue
+                
+                detailed_overview = overview_by_url.get(product_url)
+                if detailed_overview is None:
+                    print("❌ 產品頁面抓取或解析失敗，保持原有內容")
+                    failed_count += 1
+                    continue
                 
                 # 更新產品資料
                 updated_product = product.copy()
@@ -275,38 +347,97 @@ class ProductionOverviewUpdater:
                     print(f"⚠️ 概覽提取失敗或未改善，保持原有內容")
                     failed_count += 1
                 
-                updated_products.append(updated_product)
-                
-                # 避免請求過於頻繁
-                if i < len(products) + start_from:
-                    print(f"⏳ 等待 2 秒...")
-                    time.sleep(2)
+                final_products[index] = updated_product
+                refreshed.append(updated_product)
                 
             except Exception as e:
-                print(f"❌ 處理產品 {i} 失敗: {e}")
-                updated_products.append(product)  # 保持原有資料
+                print(f"❌ 處理產品 {index + 1} 失敗: {e}")
                 failed_count += 1
                 continue
         
-        # 如果有 start_from，需要合併原始資料
-        if start_from > 0:
-            original_products = self.load_products(category)
-            final_products = original_products[:start_from] + updated_products
-        else:
-            final_products = updated_products
-        
-        # 儲存更新後的資料
+        # 儲存更新後的資料，寫回類別 JSON 後日誌就不再需要
         success = self.save_updated_products(final_products, category)
+        if success:
+            for product in refreshed:
+                self.refresh_state.mark_fetched(category, product)
+            self.refresh_state.save()
+            journal.clear()
+            if coordinator:
+                coordinator.clear(job)
         
         # 顯示統計
         print(f"\n📊 更新統計:")
-        print(f"   總處理產品: {len(products)}")
+        print(f"   總處理產品: {len(targets)}")
+        if recovered_count:
+            print(f"   從日誌恢復: {recovered_count}")
         print(f"   成功更新: {success_count}")
         print(f"   失敗/跳過: {failed_count}")
-        print(f"   成功率: {success_count/(success_count+failed_count)*100:.1f}%")
+        if deferred_count:
+            print(f"   超過時間預算未處理: {deferred_count}")
+        if success_count + failed_count:
+            print(f"   成功率: {success_count/(success_count+failed_count)*100:.1f}%")
+        print(f"   總耗時: {time.perf_counter() - started:.1f} 秒")
+        if fetch_stats:
+            print(f"   HTTP 請求: {fetch_stats['requests']} 個，失敗 {fetch_stats['errors']} 個，重試 {fetch_stats['retries']} 個，"
+                  f"未變更 (304) {fetch_stats['not_modified']} 個，離線讀取 {fetch_stats['offline_hits']} 個")
+            print(f"   請求延遲: 平均 {fetch_stats['latency_avg']}s / p50 {fetch_stats['latency_p50']}s / "
+                  f"p95 {fetch_stats['latency_p95']}s / 最大 {fetch_stats['latency_max']}s")
+            print(f"   解析: {pipeline_stats['workers']} 個行程，累計 {pipeline_stats['parse_seconds']} 秒，"
+                  f"抓取等待佇列 {pipeline_stats['producer_wait_seconds']} 秒")
+        if coordinator:
+            print(f"   分片佇列: {self.workers} 個工作行程，完成 {coordinator.stats.get(STATUS_DONE, 0)} 個，"
+                  f"失敗 {coordinator.stats.get(STATUS_FAILED, 0)} 個")
+        for host, stats in self.controller.get_stats().items():
+            print(f"   自適應控制 {host}: 同時請求數 {stats['limit']}，{stats['rate_per_second']} 個請求/秒，"
+                  f"限流 {stats['throttled']} 次")
         
         return success
 
+    def update_all_categories(self, incremental: bool = False, time_budget: Optional[float] = None,
+                              planner: Optional[RefreshPlanner] = None) -> Dict[str, bool]:
+        """
+        更新所有類別的產品概覽（離線模式下完全不需要網路）
+        
+        Args:
+            incremental: 只抓取新產品、列表資料有變動或過久未更新的產品
+            time_budget: 時間預算秒數；設定時跨類別依價值排序產品，時間到就停止並寫回已完成的結果
+            planner: 更新規劃，預設以 Firebase 的類別請求數作為需求
+        """
+        if time_budget is None:
+            results = {}
+            for category in self.categories:
+                results[category] = self.update_category_overview(category, incremental=incremental)
+        else:
+            results = self._update_within_budget(incremental, time_budget, planner)
+        
+        self.controller.breakers.log_report()
+        cache_stats = self.page_cache.get_stats()
+        print(f"\n📦 頁面快取: {cache_stats['urls']} 個網址，{cache_stats['unique_pages']} 份不同內容，"
+              f"壓縮後 {cache_stats['stored_bytes'] / 1024 / 1024:.1f} MB")
+        return results
+
+    def _update_within_budget(self, incremental: bool, time_budget: float,
+                              planner: Optional[RefreshPlanner]) -> Dict[str, bool]:
+        """依更新規劃由價值最高的產品開始更新，時間到時略過剩餘的類別"""
+        planner = planner or RefreshPlanner(self.refresh_state, category_demand=load_category_demand())
+        deadline = planner.start(time_budget)
+        print(f"⏱️ 時間預算 {time_budget:.0f} 秒，依價值排序所有類別的產品...")
+        
+        products_by_category = {category: self.load_products(category) for category in self.categories}
+        results = {}
+        for category, targets in planner.plan(products_by_category, incremental):
+            if planner.expired():
+                print(f"⏰ 已用完時間預算，略過 {category.upper()}")
+                continue
+            
+            started = time.perf_counter()
+            results[category] = self.update_category_overview(category, targets=targets, deadline=deadline)
+            pipeline_stats = self.last_run_stats.get('pipeline') or {}
+            planner.record_throughput(pipeline_stats.get('fetched', 0) + pipeline_stats.get('fetch_failed', 0),
+                                      time.perf_counter() - started)
+        
+        return results
+
     def save_updated_products(self, products: List[Dict], category: str) -> bool:
         """儲存更新後的產品資料"""
         if not products:
@@ -316,8 +447,8 @@ class ProductionOverviewUpdater:
         try:
             filename = f'data/apple_refurbished_{category}.json'
             
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(products, f, ensure_ascii=False, indent=2)
+            # 逐筆寫出後原子替換，中斷時不會留下寫到一半的 JSON
+            write_json_records(filename, products)
             
             print(f"💾 {category.upper()} 更新後資料已儲存到 {filename}")
             print(f"📊 共儲存 {len(products)} 個產品")
@@ -339,22 +470,62 @@ class ProductionOverviewUpdater:
             print(f"❌ 儲存更新後產品資料失敗: {e}")
             return False
 
+_worker_extractor: Optional[OverviewExtractor] = None
+
+def parse_overview_page(html, parser_backend: Optional[str] = None, category: Optional[str] = None,
+                        extractor: Optional[OverviewExtractor] = None) -> Optional[str]:
+    """
+    從產品頁面 HTML 提取詳細概覽（模組層級函式才能傳入 ProcessPoolExecutor）
+    
+    解析行程只建立一個概覽擷取器，不載入頁面快取、更新狀態或建立 HTTP 連線；
+    解析失敗時回傳 None，與頁面上確實沒有概覽的空字串區分
+    """
+    global _worker_extractor
+    if extractor is None:
+        if _worker_extractor is None:
+            _worker_extractor = OverviewExtractor(max_length=OVERVIEW_MAX_LENGTH,
+                                                  unwanted_patterns=PRODUCTION_UNWANTED_PATTERNS)
+        extractor = _worker_extractor
+    try:
+        document = parse_document(html, parser_backend)
+        return extractor.extract_from_document(document, category)
+    except Exception as e:
+        print(f"❌ 解析概覽失敗: {e}")
+        return None
+
 def main():
     """主程式"""
     print("🔄 生產版 Apple 產品概覽更新工具")
     print("從 rc-pdsection-mainpanel 區域提取詳細產品規格")
     print("=" * 80)
     
-    updater = ProductionOverviewUpdater()
-    
-    # 顯示可用類別
-    print("\n可用類別:")
-    for i, category in enumerate(updater.categories, 1):
-        print(f"{i}. {category.upper()}")
-    
     try:
+        offline = input("\n是否只使用頁面快取重新解析，不連網？(y/N): ").strip().lower() == 'y'
+        incremental = False
+        workers = 1
+        if not offline:
+            incremental = input("是否只更新新產品與有變動的產品？(y/N): ").strip().lower() == 'y'
+            workers_input = input("工作行程數 (預設 1，大於 1 時分片抓取): ").strip()
+            workers = int(workers_input) if workers_input.isdigit() and int(workers_input) > 0 else 1
+        updater = ProductionOverviewUpdater(offline=offline, workers=workers)
+        
+        # 顯示可用類別
+        print("\n可用類別:")
+        print("0. 全部類別")
+        for i, category in enumerate(updater.categories, 1):
+            print(f"{i}. {category.upper()}")
+        
         choice = input("\n請選擇類別 (輸入數字，或按 Enter 更新 Mac): ").strip()
         
+        if choice == '0':
+            time_budget = None
+            if not offline:
+                budget_input = input("時間預算分鐘數 (預設不限，設定時依價值排序並在時間到時停止): ").strip()
+                time_budget = float(budget_input) * 60 if budget_input.isdigit() and int(budget_input) > 0 else None
+            results = updater.update_all_categories(incremental=incremental, time_budget=time_budget)
+            print(f"\n🎉 完成 {sum(results.values())}/{len(results)} 個類別")
+            return
+        
         if not choice:
             category = 'mac'
         else:
@@ -374,7 +545,7 @@ def main():
             print(f"🔢 從第 {start_from + 1} 個產品開始")
         
         # 執行更新
-        success = updater.update_category_overview(category, limit, start_from)
+        success = updater.update_category_overview(category, limit, start_from, incremental)
         
         if success:
             print(f"\n🎉 更新完成！")
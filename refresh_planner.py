@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+有時間預算的概覽更新規劃
+依新產品、價格變動、類別的用戶需求與概覽過期程度計算每個產品頁面的價值，
+在時間預算內由價值最高的產品開始抓取；時間到時停止派發新的請求，保留時間寫回結果，
+執行被中斷時最重要的頁面也已經先更新
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from refresh_state import OverviewRefreshState
+from result_writer import write_json_atomic
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PLANNER_PATH = 'data/refresh_planner.json'
+# 時間到之後保留給寫回類別 JSON 與狀態檔的秒數
+DEFAULT_RESERVE_SECONDS = 30.0
+# 每個頁面平均耗時的移動平均權重
+THROUGHPUT_SMOOTHING = 0.3
+
+# 各項價值的權重
+VALUE_WEIGHTS = {
+    'new': 10.0,
+    'price_changed': 6.0,
+    'listing_changed': 3.0,
+    'stale': 2.0
+}
+
+
+def load_category_demand(days: int = 30) -> Dict[str, int]:
+    """最近 N 天各類別的用戶請求數，Firebase 無法使用時回傳空字典"""
+    try:
+        from firebase_enhanced_requests import EnhancedFirebaseRequests
+    except ImportError as e:
+        logger.info(f"ℹ️ 無法載入 Firebase，不考慮類別需求: {e}")
+        return {}
+    return EnhancedFirebaseRequests().get_category_request_counts(days)
+
+
+class RefreshPlanner:
+    def __init__(self, refresh_state: Optional[OverviewRefreshState] = None,
+                 category_demand: Optional[Dict[str, int]] = None,
+                 path: str = DEFAULT_PLANNER_PATH, reserve_seconds: float = DEFAULT_RESERVE_SECONDS):
+        """
+        初始化更新規劃
+
+        Args:
+            refresh_state: 增量更新狀態，提供每個產品上次抓取的時間、列表雜湊與價格
+            category_demand: 各類別的用戶請求數，需求越高的類別價值越高
+            path: 記錄每個頁面平均耗時的檔案，用來估計預算內能抓取的頁面數
+            reserve_seconds: 時間到之後保留給寫回結果的秒數
+        """
+        self.refresh_state = refresh_state or OverviewRefreshState()
+        self.category_demand = category_demand or {}
+        self.path = path
+        self.reserve_seconds = reserve_seconds
+        self.deadline: Optional[float] = None
+        self._lock = threading.Lock()
+        self.state: Dict = self._load()
+
+    def _load(self) -> Dict:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"⚠️ 載入更新規劃紀錄失敗: {e}")
+            return {}
+
+    def start(self, budget_seconds: float) -> float:
+        """開始計時，回傳停止派發新請求的時間點（time.monotonic）"""
+        self.deadline = time.monotonic() + max(budget_seconds - self.reserve_seconds, 0)
+        return self.deadline
+
+    def remaining(self) -> float:
+        """距離停止派發新請求還有幾秒，未開始計時時為無限"""
+        if self.deadline is None:
+            return float('inf')
+        return max(self.deadline - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        """已超過時間預算"""
+        return self.remaining() <= 0
+
+    def demand_factor(self, category: str) -> float:
+        """類別需求倍數：需求最高的類別為 2，沒有人查詢的類別為 1"""
+        highest = max(self.category_demand.values(), default=0)
+        if not highest:
+            return 1.0
+        return 1.0 + self.category_demand.get(category, 0) / highest
+
+    def value(self, category: str, product: Dict, now: Optional[datetime] = None) -> float:
+        """產品頁面的更新價值"""
+        now = now or datetime.now()
+        entry = self.refresh_state.get_entry(category, product)
+        if not entry:
+            return VALUE_WEIGHTS['new'] * self.demand_factor(category)
+
+        score = 0.0
+        price = product.get('產品售價', '')
+        if entry.get('price') is not None and entry['price'] != price:
+            score += VALUE_WEIGHTS['price_changed']
+        elif self.refresh_state.refresh_reason(category, product, now) == 'changed':
+            score += VALUE_WEIGHTS['listing_changed']
+
+        # 過期程度以最長更新間隔為單位，超過兩倍後不再增加
+        age = now - datetime.fromisoformat(entry['fetched_at'])
+        score += VALUE_WEIGHTS['stale'] * min(age / self.refresh_state.max_age, 2.0)
+        return score * self.demand_factor(category)
+
+    @property
+    def seconds_per_page(self) -> Optional[float]:
+        """過去執行時每個頁面的平均耗時（包含並行抓取的效果）"""
+        with self._lock:
+            return self.state.get('seconds_per_page')
+
+    def estimated_pages(self) -> Optional[int]:
+        """剩餘時間內大約能抓取的頁面數，沒有過去的紀錄時回傳 None"""
+        seconds_per_page = self.seconds_per_page
+        if not seconds_per_page or self.deadline is None:
+            return None
+        return int(self.remaining() / seconds_per_page)
+
+    def plan(self, products_by_category: Dict[str, List[Dict]],
+             incremental: bool = True) -> List[Tuple[str, List[int]]]:
+        """
+        依價值排序所有類別的產品，挑出預算內能抓取的頁面
+
+        類別依其中價值最高的產品排序，類別內依價值由高到低；
+        有過去的耗時紀錄時只保留預估能完成的數量
+
+        Args:
+            products_by_category: {類別: 產品列表}
+            incremental: 只考慮新產品、列表資料有變動或過久未更新的產品
+
+        Returns:
+            [(類別, [產品在列表中的索引])]
+        """
+        now = datetime.now()
+        candidates = []
+        for category, products in products_by_category.items():
+            for index, product in enumerate(products):
+                if not product.get('產品URL'):
+                    continue
+                if incremental and not self.refresh_state.refresh_reason(category, product, now):
+                    continue
+                candidates.append((self.value(category, product, now), category, index))
+
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        capacity = self.estimated_pages()
+        selected = candidates if capacity is None else candidates[:capacity]
+
+        by_category: Dict[str, List[int]] = {}
+        for _, category, index in selected:
+            by_category.setdefault(category, []).append(index)
+
+        logger.info(f"🗓️ 更新規劃: {len(candidates)} 個候選頁面，預算內排入 {len(selected)} 個"
+                    f"（剩餘 {self.remaining():.0f} 秒，"
+                    f"{'無耗時紀錄' if capacity is None else f'約可抓取 {capacity} 個'}）")
+        # 候選已依價值排序，各類別第一次出現的順序就是其最高價值的順序
+        return list(by_category.items())
+
+    def record_throughput(self, pages: int, seconds: float):
+        """記錄一次更新的頁面數與耗時，更新每頁平均耗時並寫入紀錄檔"""
+        if pages <= 0 or seconds <= 0:
+            return
+
+        observed = seconds / pages
+        with self._lock:
+            previous = self.state.get('seconds_per_page')
+            self.state['seconds_per_page'] = observed if previous is None else \
+                previous + THROUGHPUT_SMOOTHING * (observed - previous)
+            self.state['updated_at'] = datetime.now().isoformat()
+            snapshot = dict(self.state)
+
+        try:
+            write_json_atomic(self.path, snapshot)
+        except Exception as e:
+            logger.error(f"❌ 儲存更新規劃紀錄失敗: {e}")
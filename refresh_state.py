@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+產品概覽的增量更新狀態
+記錄每個產品最後一次抓取詳細頁面的時間與列表資料雜湊，只重新抓取新產品、列表資料有變動或過久未更新的產品
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from page_cache import normalize_url
+from product_key import product_key
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATE_PATH = 'data/overview_refresh_state.json'
+
+# 抓取後多久內一律不重新抓取
+DEFAULT_TTL_HOURS = 24
+# 列表資料未變動時，最久多久重新抓取一次
+DEFAULT_MAX_AGE_DAYS = 30
+
+# 重新抓取的原因，數字越小越優先
+REASON_PRIORITY = {
+    'new': 0,
+    'changed': 1,
+    'stale': 2
+}
+
+
+def listing_hash(product: Dict) -> str:
+    """列表資料的雜湊，標題、價格或網址改變時會不同"""
+    content = '\n'.join([
+        product.get('產品標題', ''),
+        product.get('產品售價', ''),
+        normalize_url(product.get('產品URL', ''))
+    ])
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+class OverviewRefreshState:
+    def __init__(self, path: str = DEFAULT_STATE_PATH, ttl_hours: float = DEFAULT_TTL_HOURS,
+                 max_age_days: float = DEFAULT_MAX_AGE_DAYS):
+        """
+        初始化增量更新狀態
+
+        Args:
+            path: 狀態檔路徑
+            ttl_hours: 抓取後多久內一律略過
+            max_age_days: 列表資料未變動時，超過多久仍重新抓取
+        """
+        self.path = path
+        self.ttl = timedelta(hours=ttl_hours)
+        self.max_age = timedelta(days=max_age_days)
+        self._lock = threading.Lock()
+        # {category: {key: {'fetched_at', 'listing_hash', 'price', 'overview_hash'}}}
+        self.state: Dict[str, Dict[str, Dict]] = self._load()
+
+    def _load(self) -> Dict:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"⚠️ 載入增量更新狀態失敗: {e}")
+            return {}
+
+    def get_entry(self, category: str, product: Dict) -> Optional[Dict]:
+        """產品上次抓取的紀錄，從未抓取時回傳 None"""
+        with self._lock:
+            entry = self.state.get(category, {}).get(product_key(product))
+        return dict(entry) if entry else None
+
+    def refresh_reason(self, category: str, product: Dict, now: Optional[datetime] = None) -> Optional[str]:
+        """
+        判斷產品是否需要重新抓取
+
+        Returns:
+            'new' / 'changed' / 'stale'，不需要抓取時回傳 None
+        """
+        now = now or datetime.now()
+        entry = self.get_entry(category, product)
+
+        if not entry:
+            return 'new'
+
+        age = now - datetime.fromisoformat(entry['fetched_at'])
+        if age < self.ttl:
+            return None
+        if entry.get('listing_hash') != listing_hash(product):
+            return 'changed'
+        if age >= self.max_age:
+            return 'stale'
+        return None
+
+    def plan(self, category: str, products: List[Dict],
+             limit: Optional[int] = None) -> List[Tuple[int, str]]:
+        """
+        挑出需要重新抓取的產品，新產品優先，其次是列表資料有變動的產品
+
+        Returns:
+            [(產品在列表中的索引, 原因)]
+        """
+        now = datetime.now()
+        targets = []
+        for index, product in enumerate(products):
+            if not product.get('產品URL'):
+                continue
+            reason = self.refresh_reason(category, product, now)
+            if reason:
+                targets.append((index, reason))
+
+        targets.sort(key=lambda target: REASON_PRIORITY[target[1]])
+        if limit:
+            targets = targets[:limit]
+
+        counts = {reason: sum(1 for _, r in targets if r == reason) for reason in REASON_PRIORITY}
+        logger.info(f"📋 {category.upper()} 增量更新: {len(targets)}/{len(products)} 個產品需要重新抓取 "
+                    f"(新產品 {counts['new']}，列表變動 {counts['changed']}，過久未更新 {counts['stale']})")
+        return targets
+
+    def mark_fetched(self, category: str, product: Dict):
+        """記錄產品已抓取詳細頁面"""
+        overview = product.get('產品概覽', '')
+        with self._lock:
+            self.state.setdefault(category, {})[product_key(product)] = {
+                'fetched_at': datetime.now().isoformat(),
+                'listing_hash': listing_hash(product),
+                'price': product.get('產品售價', ''),
+                'overview_hash': hashlib.sha1(overview.encode('utf-8')).hexdigest()
+            }
+
+    def save(self):
+        """以原子替換寫入狀態檔"""
+        with self._lock:
+            snapshot = json.dumps(self.state, ensure_ascii=False, indent=2)
+
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            temp_path = f'{self.path}.{os.getpid()}.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(snapshot)
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            logger.error(f"❌ 儲存增量更新狀態失敗: {e}")
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+apple.com 離線重播伺服器
+以錄製在頁面快取中的類別列表頁與產品頁面取代 apple.com，可設定延遲、錯誤率與 429 限流爆發，
+讓爬蟲不必連線到正式網站也能測試與測量效能
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from page_cache import PageCache, normalize_url
+
+logger = logging.getLogger(__name__)
+
+ORIGIN = 'https://www.apple.com'
+DEFAULT_RECORDINGS_DIR = 'data/replay_pages'
+STATS_PATH = '/__replay/stats'
+
+CATEGORY_URLS = {
+    'mac': 'https://www.apple.com/tw/shop/refurbished/mac',
+    'ipad': 'https://www.apple.com/tw/shop/refurbished/ipad',
+    'iphone': 'https://www.apple.com/tw/shop/refurbished/iphone',
+    'airpods': 'https://www.apple.com/tw/shop/refurbished/airpods',
+    'homepod': 'https://www.apple.com/tw/shop/refurbished/homepod',
+    'appletv': 'https://www.apple.com/tw/shop/refurbished/appletv',
+    'accessories': 'https://www.apple.com/tw/shop/refurbished/accessories'
+}
+
+
+class _ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.replay.handle(self)
+
+    def log_message(self, format, *args):
+        # 每個請求都輸出日誌會拖慢測量
+        pass
+
+
+class ReplayServer:
+    def __init__(self, recordings_dir: str = DEFAULT_RECORDINGS_DIR, host: str = '127.0.0.1', port: int = 0,
+                 latency: Tuple[float, float] = (0.05, 0.15), error_rate: float = 0.0,
+                 burst_every: int = 0, burst_length: int = 0, retry_after: float = 1.0,
+                 seed: Optional[int] = None):
+        """
+        初始化重播伺服器
+
+        Args:
+            recordings_dir: 錄製頁面的頁面快取目錄
+            host: 監聽位址
+            port: 監聽連接埠，0 表示自動選擇
+            latency: 每個回應的延遲秒數範圍 (最小, 最大)
+            error_rate: 回傳 500 的比例
+            burst_every: 每隔多少個請求開始一次 429 限流爆發，0 表示不限流
+            burst_length: 每次限流爆發連續回傳幾個 429
+            retry_after: 429 回應的 Retry-After 秒數
+            seed: 隨機種子，固定後延遲與錯誤的分布可重現
+        """
+        self.cache = PageCache(recordings_dir)
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.error_rate = error_rate
+        self.burst_every = burst_every
+        self.burst_length = burst_length
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._bodies: Dict[str, Dict] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self.reset_stats()
+
+    @property
+    def base_url(self) -> str:
+        return f'http://{self.host}:{self.port}'
+
+    def rewrite_url(self, url: str) -> str:
+        """將 apple.com 的網址換成重播伺服器上的網址（保留查詢字串）"""
+        parts = urlsplit(url)
+        return f"{self.base_url}{parts.path}{'?' + parts.query if parts.query else ''}"
+
+    def urls(self) -> List[str]:
+        """已錄製的網址"""
+        return self.cache.urls()
+
+    def reset_stats(self):
+        """重設統計資料"""
+        with self._lock:
+            self.stats = {
+                'requests': 0,
+                'ok': 0,
+                'not_modified': 0,
+                'not_found': 0,
+                'errors': 0,
+                'throttled': 0,
+                'bytes_sent': 0
+            }
+
+    def get_stats(self) -> Dict:
+        """取得統計資料"""
+        with self._lock:
+            return dict(self.stats)
+
+    def _body(self, url: str) -> Optional[Dict]:
+        """取得改寫過連結的頁面內容與 gzip 版本，每個網址只處理一次"""
+        key = normalize_url(url)
+        with self._lock:
+            cached = self._bodies.get(key)
+        if cached:
+            return cached
+
+        body = self.cache.get(url)
+        if body is None:
+            return None
+
+        # 頁面與內嵌 JSON 中的絕對網址都指向重播伺服器
+        origin = self.base_url.encode('ascii')
+        body = body.replace(ORIGIN.encode('ascii'), origin)
+        body = body.replace(ORIGIN.replace('/', '\\/').encode('ascii'), origin.replace(b'/', b'\\/'))
+        cached = {
+            'identity': body,
+            'gzip': gzip.compress(body, compresslevel=6),
+            'etag': f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+        }
+        with self._lock:
+            self._bodies[key] = cached
+        return cached
+
+    def _next_fault(self) -> Optional[int]:
+        """依設定決定這個請求是否回傳 429 或 500"""
+        with self._lock:
+            self.stats['requests'] += 1
+            position = self.stats['requests']
+            if self.burst_every and self.burst_length and position % self.burst_every < self.burst_length:
+                return 429
+            if self.error_rate and self._random.random() < self.error_rate:
+                return 500
+        return None
+
+    def _count(self, key: str, sent: int = 0):
+        with self._lock:
+            self.stats[key] += 1
+            self.stats['bytes_sent'] += sent
+
+    def handle(self, request: BaseHTTPRequestHandler):
+        """處理一個 GET 請求"""
+        if request.path == STATS_PATH:
+            self._send(request, 200, json.dumps(self.get_stats()).encode('utf-8'),
+                       {'Content-Type': 'application/json'})
+            return
+
+        low, high = self.latency
+        with self._lock:
+            delay = self._random.uniform(low, high) if high > 0 else 0
+        if delay:
+            time.sleep(delay)
+
+        fault = self._next_fault()
+        if fault == 429:
+            self._count('throttled')
+            self._send(request, 429, b'Too Many Requests', {'Retry-After': f'{self.retry_after:g}'})
+            return
+        if fault == 500:
+            self._count('errors')
+            self._send(request, 500, b'Internal Server Error')
+            return
+
+        page = self._body(ORIGIN + urlsplit(request.path).path)
+        if page is None:
+            self._count('not_found')
+            self._send(request, 404, b'Not Found')
+            return
+
+        if request.headers.get('If-None-Match') == page['etag']:
+            self._count('not_modified')
+            self._send(request, 304, b'', {'ETag': page['etag']})
+            return
+
+        headers = {'Content-Type': 'text/html; charset=utf-8', 'ETag': page['etag']}
+        body = page['identity']
+        if 'gzip' in (request.headers.get('Accept-Encoding') or ''):
+            body = page['gzip']
+            headers['Content-Encoding'] = 'gzip'
+        self._count('ok', len(body))
+        self._send(request, 200, body, headers)
+
+    def _send(self, request: BaseHTTPRequestHandler, status: int, body: bytes,
+              headers: Optional[Dict[str, str]] = None):
+        try:
+            request.send_response(status)
+            for name, value in (headers or {}).items():
+                request.send_header(name, value)
+            request.send_header('Content-Length', str(len(body)))
+            request.end_headers()
+            if body:
+                request.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # 用戶端逾時或取消請求
+            pass
+
+    def start(self):
+        """在背景執行緒啟動伺服器"""
+        self._server = ThreadingHTTPServer((self.host, self.port), _ReplayHandler)
+        self._server.daemon_threads = True
+        self._server.replay = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"🎞️ 重播伺服器已啟動 {self.base_url} ({len(self.urls())} 個錄製頁面)")
+        return self
+
+    def stop(self):
+        """關閉伺服器"""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def record_pages(categories: List[str], limit: int, recordings_dir: str = DEFAULT_RECORDINGS_DIR) -> int:
+    """
+    從 apple.com 錄製類別列表頁與各類別前幾個產品頁面
+
+    Returns:
+        錄製的頁面數量
+    """
+    from production_overview_updater import ProductionOverviewUpdater
+
+    # 沿用更新器的速率控制與重試，錄製時不會對 apple.com 造成額外壓力
+    updater = ProductionOverviewUpdater()
+    cache = PageCache(recordings_dir)
+    recorded = 0
+
+    for category in categories:
+        urls = [CATEGORY_URLS[category]]
+        urls += [product['產品URL'] for product in updater.load_products(category)[:limit]
+                 if product.get('產品URL')]
+        for url in urls:
+            try:
+                cache.store(url, updater.fetch_page(url))
+                recorded += 1
+                print(f"💾 {category}: {url[:80]}")
+            except Exception as e:
+                print(f"❌ 錄製失敗 {url[:80]}: {e}")
+
+    cache.save()
+    return recorded
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='apple.com 離線重播伺服器')
+    parser.add_argument('--recordings', default=DEFAULT_RECORDINGS_DIR, help='錄製頁面的頁面快取目錄')
+    parser.add_argument('--record', type=int, default=0, help='先從 apple.com 錄製每個類別前 N 個產品頁面')
+    parser.add_argument('--categories', nargs='*', default=list(CATEGORY_URLS), help='要錄製的類別')
+    parser.add_argument('--port', type=int, default=8765, help='監聽連接埠')
+    parser.add_argument('--latency', type=float, nargs=2, default=[0.05, 0.15], metavar=('MIN', 'MAX'),
+                        help='回應延遲秒數範圍')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='回傳 500 的比例')
+    parser.add_argument('--burst-every', type=int, default=0, help='每隔多少個請求開始一次 429 爆發')
+    parser.add_argument('--burst-length', type=int, default=0, help='每次 429 爆發的長度')
+    args = parser.parse_args()
+
+    if args.record:
+        print(f"🎬 錄製 {len(args.categories)} 個類別，每個類別 {args.record} 個產品頁面...")
+        print(f"✅ 錄製 {record_pages(args.categories, args.record, args.recordings)} 個頁面")
+
+    server = ReplayServer(args.recordings, port=args.port, latency=tuple(args.latency),
+                          error_rate=args.error_rate, burst_every=args.burst_every,
+                          burst_length=args.burst_length)
+    with server:
+        print(f"🎞️ 重播伺服器: {server.base_url}，統計資料: {server.base_url}{STATS_PATH}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+    print(f"📊 {server.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
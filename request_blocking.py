@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Playwright 請求攔截設定
+在瀏覽器上下文層級中止爬蟲不會解析的資源（圖片、字型、影片、追蹤請求），
+並統計每次爬取節省的請求數與流量
+"""
+
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 分析與追蹤請求的網址片段
+TRACKER_URL_PATTERNS = [
+    'google-analytics.com',
+    'googletagmanager.com',
+    'doubleclick.net',
+    'omtrdc.net',
+    'metrics.apple.com',
+    'securemetrics.apple.com',
+    'xp.apple.com',
+    '/b/ss/',
+    'mpsnare.iesnare.com'
+]
+
+# 各種攔截設定
+# - standard: 中止圖片、影片、字型與追蹤請求，保留樣式表以免影響 inner_text 的結果
+# - aggressive: 另外中止樣式表，適合只讀取 DOM 屬性的列表頁
+# - off: 不攔截任何請求，保留原本 networkidle 的等待方式
+INTERCEPTION_PROFILES = {
+    'standard': {
+        'resource_types': ['image', 'media', 'font'],
+        'url_patterns': TRACKER_URL_PATTERNS,
+        'wait_until': 'load'
+    },
+    'aggressive': {
+        'resource_types': ['image', 'media', 'font', 'stylesheet'],
+        'url_patterns': TRACKER_URL_PATTERNS,
+        'wait_until': 'domcontentloaded'
+    },
+    'off': {
+        'resource_types': [],
+        'url_patterns': [],
+        'wait_until': 'networkidle'
+    }
+}
+
+# 被中止的請求無法得知實際大小，以各類型的平均大小估算節省的流量
+ESTIMATED_RESOURCE_BYTES = {
+    'image': 80 * 1024,
+    'media': 800 * 1024,
+    'font': 40 * 1024,
+    'stylesheet': 30 * 1024,
+    'script': 20 * 1024,
+    'xhr': 2 * 1024,
+    'fetch': 2 * 1024,
+    'ping': 1024,
+    'other': 4 * 1024
+}
+
+
+class ResourceBlocker:
+    def __init__(self, profile: str = 'standard', resource_types: Optional[List[str]] = None,
+                 url_patterns: Optional[List[str]] = None):
+        """
+        初始化請求攔截器
+
+        Args:
+            profile: 攔截設定名稱 (standard / aggressive / off)
+            resource_types: 覆寫要中止的資源類型
+            url_patterns: 覆寫要中止的網址片段
+        """
+        if profile not in INTERCEPTION_PROFILES:
+            raise ValueError(f"未知的攔截設定: {profile}")
+
+        settings = INTERCEPTION_PROFILES[profile]
+        self.profile = profile
+        self.resource_types = set(resource_types if resource_types is not None else settings['resource_types'])
+        self.url_patterns = url_patterns if url_patterns is not None else settings['url_patterns']
+        self.wait_until = settings['wait_until']
+        self.reset()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.resource_types or self.url_patterns)
+
+    def reset(self):
+        """重設統計資料"""
+        self.stats = {
+            'requests_allowed': 0,
+            'requests_blocked': 0,
+            'bytes_loaded': 0,
+            'estimated_bytes_saved': 0,
+            'blocked_by_type': {}
+        }
+
+    def should_block(self, resource_type: str, url: str) -> bool:
+        """判斷請求是否應該中止"""
+        if resource_type == 'document':
+            return False
+        if resource_type in self.resource_types:
+            return True
+        return any(pattern in url for pattern in self.url_patterns)
+
+    async def attach(self, context):
+        """將攔截規則套用到瀏覽器上下文"""
+        if not self.enabled:
+            return
+
+        await context.route('**/*', self._handle_route)
+        context.on('requestfinished', self._record_finished)
+
+    async def _handle_route(self, route):
+        """處理每個請求：中止或放行"""
+        request = route.request
+        resource_type = request.resource_type
+
+        if self.should_block(resource_type, request.url):
+            self.stats['requests_blocked'] += 1
+            self.stats['estimated_bytes_saved'] += ESTIMATED_RESOURCE_BYTES.get(
+                resource_type, ESTIMATED_RESOURCE_BYTES['other']
+            )
+            blocked_by_type = self.stats['blocked_by_type']
+            blocked_by_type[resource_type] = blocked_by_type.get(resource_type, 0) + 1
+            await route.abort()
+        else:
+            self.stats['requests_allowed'] += 1
+            await route.continue_()
+
+    async def _record_finished(self, request):
+        """
+        記錄放行請求實際傳輸的大小
+
+        apple.com 的資源多半以 chunked 或壓縮傳送，沒有 content-length 標頭，
+        改用 Playwright 記錄的傳輸大小（壓縮後的內容加上回應標頭）
+        """
+        try:
+            sizes = await request.sizes()
+            self.stats['bytes_loaded'] += max(sizes.get('responseBodySize', 0), 0) + \
+                max(sizes.get('responseHeadersSize', 0), 0)
+        except Exception as e:
+            logger.debug(f"讀取回應大小失敗: {e}")
+
+    def get_report(self) -> Dict:
+        """取得本次爬取的攔截統計"""
+        total = self.stats['requests_allowed'] + self.stats['requests_blocked']
+        return {
+            'profile': self.profile,
+            'requests_total': total,
+            'requests_allowed': self.stats['requests_allowed'],
+            'requests_blocked': self.stats['requests_blocked'],
+            'blocked_by_type': dict(self.stats['blocked_by_type']),
+            'bytes_loaded': self.stats['bytes_loaded'],
+            'estimated_bytes_saved': self.stats['estimated_bytes_saved']
+        }
+
+    def log_report(self, label: str = ''):
+        """輸出攔截統計日誌"""
+        if not self.enabled:
+            return
+
+        report = self.get_report()
+        logger.info(f"🚫 請求攔截統計 {label}({report['profile']}): "
+                    f"中止 {report['requests_blocked']}/{report['requests_total']} 個請求，"
+                    f"約節省 {report['estimated_bytes_saved'] / 1024 / 1024:.1f} MB，"
+                    f"實際下載 {report['bytes_loaded'] / 1024 / 1024:.1f} MB")
+        if report['blocked_by_type']:
+            logger.info(f"   依類型: {report['blocked_by_type']}")
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+串流式爬取結果寫入
+爬取過程中每個產品以 JSON Lines 附加到暫存檔，結束時逐行轉換成原本的
+apple_refurbished_<category>.json 格式並以原子替換寫入，讀取端永遠不會讀到寫到一半的檔案
+"""
+
+import json
+import logging
+import os
+import threading
+from typing import Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+PARTIAL_SUFFIX = '.partial.jsonl'
+
+
+def _replace_atomically(temp_path: str, path: str):
+    """寫入磁碟後以 rename 取代目標檔案"""
+    with open(temp_path, 'rb+') as f:
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+def write_json_records(path: str, records: Iterable[Dict], indent: int = 2) -> int:
+    """
+    逐筆寫出 JSON 陣列並原子替換目標檔案，輸出與 json.dump(list, indent=2) 相同
+
+    Returns:
+        寫入的筆數
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    padding = ' ' * indent
+    count = 0
+
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for record in records:
+                text = json.dumps(record, ensure_ascii=False, indent=indent)
+                f.write('[\n' if count == 0 else ',\n')
+                f.write('\n'.join(padding + line for line in text.split('\n')))
+                count += 1
+            f.write('\n]' if count else '[]')
+        _replace_atomically(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    return count
+
+
+def write_json_atomic(path: str, data, indent: int = 2):
+    """以原子替換寫入 JSON 檔案"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_path = f'{path}.{os.getpid()}.tmp'
+
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=indent)
+        _replace_atomically(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class StreamingResultWriter:
+    def __init__(self, path: str):
+        """
+        初始化串流寫入器
+
+        Args:
+            path: 最終的 JSON 檔案路徑，爬取過程中寫入 <path>.partial.jsonl
+        """
+        self.path = path
+        self.partial_path = path + PARTIAL_SUFFIX
+        self.count = 0
+        self._lock = threading.Lock()
+        self._file = None
+
+    def open(self):
+        """開始新的寫入，捨棄上次未完成的暫存檔"""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with self._lock:
+            self._file = open(self.partial_path, 'w', encoding='utf-8')
+            self.count = 0
+        return self
+
+    def write(self, product: Dict):
+        """附加一個產品"""
+        line = json.dumps(product, ensure_ascii=False)
+        with self._lock:
+            if self._file is None:
+                raise RuntimeError("寫入器尚未開啟")
+            self._file.write(line + '\n')
+            self._file.flush()
+            self.count += 1
+
+    def _read_partial(self):
+        with open(self.partial_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def commit(self) -> int:
+        """
+        將暫存檔轉換成 JSON 陣列並原子替換目標檔案
+
+        Returns:
+            寫入的產品數量
+        """
+        self._close_file()
+        count = write_json_records(self.path, self._read_partial())
+        os.remove(self.partial_path)
+        logger.info(f"💾 已寫入 {self.path} ({count} 個產品)")
+        return count
+
+    def abort(self):
+        """捨棄這次寫入，目標檔案保持不變"""
+        self._close_file()
+        if os.path.exists(self.partial_path):
+            os.remove(self.partial_path)
+
+    def _close_file(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        # 發生錯誤時不覆蓋原本的檔案
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
@@ -5,16 +5,29 @@
 模擬從 Apple 產品頁面提取詳細概覽的過程
 """
 
+import asyncio
 import json
 import requests
-from bs4 import BeautifulSoup
-import re
-import time
+from functools import partial
 from typing import Dict, List, Optional
+from async_fetcher import AsyncFetcher
+from crawl_governor import HostRateGovernor
+from html_parser_backend import parse_document
+from overview_extractor import OverviewExtractor
+from parse_pipeline import FetchParsePipeline
 
 class SimpleOverviewExtractor:
-    def __init__(self):
-        """初始化簡化版概覽提取器"""
+    def __init__(self, parser_backend: Optional[str] = None):
+        """
+        初始化簡化版概覽提取器
+        
+        Args:
+            parser_backend: HTML 解析後端 (selectolax / lxml / html.parser)，預設使用最快的已安裝後端
+        """
+        self.parser_backend = parser_backend
+        self.overview_extractor = OverviewExtractor()
+        # 最近一次 test_products 的抓取與解析統計
+        self.last_pipeline_stats: Dict = {}
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
@@ -39,144 +52,20 @@ class SimpleOverviewExtractor:
             response = requests.get(product_url, headers=self.headers, timeout=30)
             response.raise_for_status()
             
-            # 解析 HTML
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # 嘗試多種選擇器來找到產品概覽區域
-            overview_selectors = [
-                '.rc-pdsection-mainpanel.column.large-9.small-12',
-                '.rc-pdsection-mainpanel',
-                '.pd-overview',
-                '.pd-highlights',
-                '[data-module-template="pd/overview"]',
-                '.pd-overview-content',
-                '.rf-pdp-overview',
-                '.rf-pdp-highlights',
-                '.rf-pdp-techspecs'
-            ]
-            
-            overview_text = ""
-            
-            for selector in overview_selectors:
-                try:
-                    elements = soup.select(selector)
-                    if elements:
-                        print(f"✅ 找到概覽區域: {selector}")
-                        
-                        for element in elements:
-                            text = element.get_text(strip=True, separator='\n')
-                            if text and len(text.strip()) > 50:
-                                overview_text += text.strip() + "\n\n"
-                        
-                        if overview_text:
-                            break
-                            
-                except Exception as e:
-                    print(f"選擇器 {selector} 失敗: {e}")
-                    continue
-            
-            # 如果沒有找到概覽，嘗試提取產品規格
-            if not overview_text:
-                print("🔄 嘗試提取產品規格...")
-                overview_text = self.extract_product_specs(soup)
-            
-            # 清理和格式化文字
-            if overview_text:
-                overview_text = self.clean_overview_text(overview_text)
-                print(f"✅ 成功提取概覽 ({len(overview_text)} 字元)")
-                return overview_text
-            else:
-                print("⚠️ 未能提取到詳細概覽")
-                return ""
+            return self.parse_overview_html(response.content)
                 
         except Exception as e:
             print(f"❌ 提取概覽失敗: {e}")
             return ""
 
-    def extract_product_specs(self, soup) -> str:
-        """提取產品規格資訊"""
-        specs_text = ""
-        
-        # 嘗試多種規格選擇器
-        spec_selectors = [
-            '.rf-pdp-techspecs',
-            '.pd-techspecs',
-            '.rf-pdp-highlights',
-            '.pd-highlights',
-            '.rf-pdp-overview-content',
-            '.pd-overview-content',
-            '[data-module-template="pd/techspecs"]',
-            '.rf-pdp-content',
-            '.pd-features',
-            '.product-features',
-            '.tech-specs',
-            '.product-highlights'
-        ]
-        
-        for selector in spec_selectors:
-            try:
-                elements = soup.select(selector)
-                if elements:
-                    print(f"✅ 找到規格區域: {selector}")
-                    
-                    for element in elements:
-                        text = element.get_text(strip=True, separator='\n')
-                        if text and len(text.strip()) > 30:
-                            specs_text += text.strip() + "\n\n"
-                    
-                    if specs_text:
-                        break
-                        
-            except Exception as e:
-                print(f"規格選擇器 {selector} 失敗: {e}")
-                continue
-        
-        return specs_text
-
-    def clean_overview_text(self, text: str) -> str:
-        """清理和格式化概覽文字"""
-        if not text:
+    def parse_overview_html(self, html) -> str:
+        """從產品頁面 HTML 提取詳細概覽"""
+        try:
+            document = parse_document(html, self.parser_backend)
+            return self.overview_extractor.extract_from_document(document, 'mac')
+        except Exception as e:
+            print(f"❌ 解析概覽失敗: {e}")
             return ""
-        
-        # 移除多餘的空白和換行
-        text = re.sub(r'\n\s*\n', '\n', text)
-        text = re.sub(r'\s+', ' ', text)
-        
-        # 移除不需要的內容
-        unwanted_patterns = [
-            r'加入購物車.*',
-            r'立即購買.*',
-            r'選擇.*',
-            r'Cookie.*',
-            r'隱私權.*',
-            r'使用條款.*',
-            r'©.*Apple.*',
-            r'台灣.*',
-            r'Apple Store.*',
-            r'購買.*',
-            r'比較.*',
-            r'瞭解更多.*'
-        ]
-        
-        for pattern in unwanted_patterns:
-            text = re.sub(pattern, '', text, flags=re.IGNORECASE)
-        
-        # 格式化文字，保留重要的換行
-        lines = text.split('\n')
-        formatted_lines = []
-        
-        for line in lines:
-            line = line.strip()
-            if line and len(line) > 5:  # 過濾太短的行
-                formatted_lines.append(line)
-        
-        # 重新組合，限制長度
-        formatted_text = '\n'.join(formatted_lines)
-        
-        if len(formatted_text) > 1000:
-            formatted_text = formatted_text[:1000] + "..."
-        
-        return formatted_text.strip()
 
     def test_single_product(self, product: Dict) -> Dict:
         """測試單一產品的概覽提取"""
@@ -200,6 +89,32 @@ class SimpleOverviewExtractor:
         
         return updated_product
 
+    async def test_products(self, products: List[Dict], requests_per_second: float = 1 / 3) -> List[Dict]:
+        """
+        同時抓取多個產品頁面，並在子行程中解析概覽
+        
+        Args:
+            requests_per_second: 請求速率，預設與原本逐一測試時每 3 秒一個請求的節奏相同
+        """
+        urls = [product.get('產品URL', '') for product in products if product.get('產品URL', '')]
+        
+        governor = HostRateGovernor(rate_per_second=requests_per_second)
+        async with AsyncFetcher(headers=self.headers, concurrency=3, governor=governor) as fetcher:
+            parse_func = partial(parse_overview_page, parser_backend=self.parser_backend)
+            pipeline = FetchParsePipeline(fetcher, parse_func)
+            overview_by_url = await pipeline.run(urls)
+        self.last_pipeline_stats = pipeline.get_stats()
+        
+        updated_products = []
+        for product in products:
+            updated_product = product.copy()
+            detailed_overview = overview_by_url.get(product.get('產品URL', ''))
+            if detailed_overview:
+                updated_product['產品概覽'] = detailed_overview
+            updated_products.append(updated_product)
+        
+        return updated_products
+
     def load_sample_products(self, limit: int = 3) -> List[Dict]:
         """載入範例產品"""
         try:
@@ -215,6 +130,14 @@ class SimpleOverviewExtractor:
             print(f"❌ 載入產品資料失敗: {e}")
             return []
 
+_worker_extractors = {}
+
+def parse_overview_page(html, parser_backend: Optional[str] = None) -> str:
+    """在解析行程中提取產品概覽（模組層級函式才能傳入 ProcessPoolExecutor）"""
+    if parser_backend not in _worker_extractors:
+        _worker_extractors[parser_backend] = SimpleOverviewExtractor(parser_backend=parser_backend)
+    return _worker_extractors[parser_backend].parse_overview_html(html)
+
 def main():
     """主測試程式"""
     print("🧪 簡化版 Apple 產品概覽提取測試")
@@ -229,9 +152,10 @@ def main():
         print("❌ 無法載入測試產品")
         return
     
-    updated_products = []
+    # 同時抓取所有範例產品，解析在子行程中進行
+    updated_products = asyncio.run(extractor.test_products(sample_products))
     
-    for i, product in enumerate(sample_products, 1):
+    for i, (product, updated_product) in enumerate(zip(sample_products, updated_products), 1):
         print(f"\n{'='*60}")
         print(f"測試產品 {i}/{len(sample_products)}")
         print(f"{'='*60}")
@@ -240,10 +164,6 @@ def main():
         print(f"📝 原始概覽:")
         print(f"   {product.get('產品概覽', 'N/A')}")
         
-        # 測試概覽提取
-        updated_product = extractor.test_single_product(product)
-        updated_products.append(updated_product)
-        
         # 顯示更新後的概覽
         new_overview = updated_product.get('產品概覽', '')
         if new_overview != product.get('產品概覽', ''):
@@ -252,11 +172,8 @@ def main():
                 print(f"   {new_overview[:200]}...")
             else:
                 print(f"   {new_overview}")
-        
-        # 避免請求過於頻繁
-        if i < len(sample_products):
-            print(f"\n⏳ 等待 3 秒...")
-            time.sleep(3)
+        else:
+            print(f"⚠️ 概覽提取失敗，保持原有內容")
     
     # 儲存測試結果
     try:
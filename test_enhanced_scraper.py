@@ -52,7 +52,7 @@ async def test_overview_updater():
     
     # 測試更新 Mac 類別的前 2 個產品
     print("\n🚀 測試更新 Mac 類別概覽 (限制 2 個產品)...")
-    updated_products = await updater.update_products_overview('mac', limit=2)
+    updated_products, _ = await updater.update_products_overview('mac', limit=2)
     
     if updated_products:
         print(f"\n✅ 成功更新 {len(updated_products)} 個產品")
@@ -0,0 +1,81 @@
+from email.utils import formatdate
+import time
+
+import pytest
+
+from adaptive_controller import AdaptiveCrawlController, parse_retry_after
+from circuit_breaker import BreakerRegistry
+from crawl_governor import HostRateGovernor
+
+URL = 'https://www.apple.com/tw/shop/product/FMFJ3TA/A/x'
+
+
+def _controller(**kwargs):
+    return AdaptiveCrawlController(breakers=BreakerRegistry(), **kwargs)
+
+
+def _respond(controller, status, retry_after=None):
+    with controller.slot_sync(URL) as ticket:
+        ticket.status = status
+        ticket.retry_after = retry_after
+
+
+def test_healthy_responses_increase_limit_additively():
+    controller = _controller(initial_limit=1, max_limit=3)
+    _respond(controller, 200)
+    assert controller.get_limit(URL) == pytest.approx(2.0)
+    _respond(controller, 200)
+    assert controller.get_limit(URL) == pytest.approx(2.5)
+
+    for _ in range(20):
+        _respond(controller, 200)
+    assert controller.get_limit(URL) == 3
+
+
+def test_throttling_halves_limit_and_cools_down_host():
+    governor = HostRateGovernor(rate_per_second=2, burst=1)
+    controller = _controller(governor=governor, initial_limit=4, max_limit=4)
+    _respond(controller, 429, retry_after=30)
+
+    assert controller.get_limit(URL) == 2
+    # 速率跟著名額一起減半：每個名額 0.5 個請求/秒
+    assert controller.get_stats()['www.apple.com']['rate_per_second'] == 1.0
+    assert controller._try_enter('www.apple.com') == pytest.approx(30, abs=0.5)
+
+    stats = controller.get_stats()['www.apple.com']
+    assert stats['throttled'] == 1 and stats['decreases'] == 1
+
+
+def test_limit_decreases_once_per_round_and_never_below_minimum():
+    controller = _controller(initial_limit=4, max_limit=4, min_limit=1)
+    state = controller._state('www.apple.com')
+    for _ in range(3):
+        state['cooldown_until'] = 0.0
+        _respond(controller, 503, retry_after=0)
+    # 同一秒內的連續錯誤只減半一次
+    assert controller.get_limit(URL) == 2
+
+    for _ in range(5):
+        state['cooldown_until'] = 0.0
+        state['last_decrease'] = 0.0
+        _respond(controller, 503, retry_after=0)
+    assert controller.get_limit(URL) == 1
+
+
+def test_retry_policy():
+    controller = _controller(max_retries=2, backoff_base=1, backoff_cap=10)
+    assert controller.should_retry(None, 0, URL)
+    assert controller.should_retry(503, 1, URL)
+    assert not controller.should_retry(503, 2, URL)
+    assert not controller.should_retry(404, 0, URL)
+
+    assert controller.retry_delay(0, retry_after=120) == 10
+    assert all(0 <= controller.retry_delay(3) <= 8 for _ in range(20))
+
+
+def test_parse_retry_after():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('12') == 12
+    assert parse_retry_after('-3') == 0
+    assert parse_retry_after(formatdate(time.time() + 60, usegmt=True)) == pytest.approx(60, abs=2)
+    assert parse_retry_after('soon') is None
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('aiohttp')
+
+from adaptive_controller import AdaptiveCrawlController
+from async_fetcher import AsyncFetcher
+from circuit_breaker import BreakerRegistry
+from page_cache import PageCache
+
+URL = 'https://www.apple.com/tw/shop/refurbished/mac'
+
+
+class FakeResponse:
+    def __init__(self, status, body=b''):
+        self.status = status
+        self.body = body
+        self.headers = {}
+        self.request_info = None
+        self.history = ()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    async def read(self):
+        return self.body
+
+    def get_encoding(self):
+        return 'utf-8'
+
+
+class FakeSession:
+    """依序回傳預先準備的回應，並記錄每次請求的標頭與當時佔用的名額"""
+
+    def __init__(self, controller, responses):
+        self.controller = controller
+        self.responses = list(responses)
+        self.calls = []
+
+    def get(self, url, headers=None):
+        in_flight = self.controller._hosts['www.apple.com']['in_flight']
+        self.calls.append((dict(headers or {}), in_flight))
+        return self.responses.pop(0)
+
+
+def _fetcher(tmp_path, responses):
+    controller = AdaptiveCrawlController(initial_limit=1, max_limit=1, breakers=BreakerRegistry())
+    fetcher = AsyncFetcher(page_cache=PageCache(str(tmp_path)), controller=controller)
+    fetcher.session = FakeSession(controller, responses)
+    fetcher._semaphore = asyncio.Semaphore(1)
+    return fetcher
+
+
+def test_not_modified_uses_cached_page(tmp_path):
+    fetcher = _fetcher(tmp_path, [FakeResponse(304)])
+    fetcher.page_cache.store(URL, '<html>快取</html>'.encode('utf-8'), {'ETag': '"v1"'}, 'utf-8')
+
+    assert asyncio.run(fetcher.fetch(URL)) == '<html>快取</html>'
+    assert fetcher.session.calls == [({'If-None-Match': '"v1"'}, 1)]
+    assert fetcher.stats['not_modified'] == 1
+
+
+def test_not_modified_without_cache_refetches_in_new_slot(tmp_path, monkeypatch):
+    fetcher = _fetcher(tmp_path, [FakeResponse(304), FakeResponse(200, b'<html>new</html>')])
+    # 模擬送出條件式請求後快取內容被其他行程清掉
+    monkeypatch.setattr(fetcher.page_cache, 'conditional_headers', lambda url: {'If-None-Match': '"v1"'})
+
+    assert asyncio.run(fetcher.fetch(URL)) == '<html>new</html>'
+    assert fetcher.session.calls == [({'If-None-Match': '"v1"'}, 1), ({}, 1)]
+    # 兩次請求各自取得名額，名額上限為 1 也不會卡住
+    assert fetcher.controller.get_stats()['www.apple.com']['requests'] == 2
+    assert fetcher.controller._hosts['www.apple.com']['in_flight'] == 0
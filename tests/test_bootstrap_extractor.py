@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+requests = pytest.importorskip('requests')
+pytest.importorskip('bs4')
+
+from bootstrap_extractor import BootstrapListingExtractor, find_bootstrap_json, parse_bootstrap_tiles
+
+CATEGORY_URL = 'https://www.apple.com/tw/shop/refurbished/mac'
+
+BOOTSTRAP = {
+    'tiles': [
+        {
+            'title': ' 整修品 13 吋 MacBook Air ',
+            'productDetailsUrl': '/tw/shop/product/FGN63TA/A/refurbished-macbook-air?fnode=1',
+            'price': {'currentPrice': {'amount': 'NT$24,490'}},
+            'image': {'srcSet': {'src': 'https://store.storeimages.cdn-apple.com/mba.jpg'}}
+        },
+        # 重複的產品格只保留第一個
+        {'title': 'dup', 'productDetailsUrl': '/tw/shop/product/FGN63TA/A/refurbished-macbook-air?fnode=1'},
+        {'title': '不是產品', 'productDetailsUrl': '/tw/shop/refurbished'},
+        {'title': 'Mac mini', 'url': 'https://www.apple.com/tw/shop/product/FMXY3TA/A/mac-mini',
+         'partNumber': 'FMXY3TA/A', 'price': 'NT$17,490', 'image': 'https://example.com/mini.jpg'}
+    ]
+}
+
+
+def _page(data):
+    return (f'<html><head><script>var other = 1;</script>'
+            f'<script>window.REFURB_GRID_BOOTSTRAP = {json.dumps(data, ensure_ascii=False)}; init();</script>'
+            f'</head><body></body></html>')
+
+
+def test_find_and_parse_bootstrap_tiles():
+    data = find_bootstrap_json(_page(BOOTSTRAP))
+    tiles = parse_bootstrap_tiles(data, base_url=CATEGORY_URL)
+
+    assert [tile['title'] for tile in tiles] == ['整修品 13 吋 MacBook Air', 'Mac mini']
+    assert tiles[0]['url'] == 'https://www.apple.com/tw/shop/product/FGN63TA/A/refurbished-macbook-air?fnode=1'
+    assert tiles[0]['price'] == 'NT$24,490'
+    assert tiles[0]['image'] == 'https://store.storeimages.cdn-apple.com/mba.jpg'
+    assert tiles[1]['part_number'] == 'FMXY3TA/A'
+    assert tiles[1]['price'] == 'NT$17,490'
+    assert len(parse_bootstrap_tiles(data, base_url=CATEGORY_URL, limit=1)) == 1
+
+
+def test_page_without_bootstrap_returns_none():
+    assert find_bootstrap_json('<html><script>var x = 1;</script></html>') is None
+    assert find_bootstrap_json('<script>window.REFURB_GRID_BOOTSTRAP = {broken</script>') is None
+
+
+def test_fetch_listing_reserves_none_for_missing_bootstrap(monkeypatch):
+    extractor = BootstrapListingExtractor()
+    monkeypatch.setattr(extractor, 'fetch_html', lambda url: '<html></html>')
+    assert extractor.fetch_listing(CATEGORY_URL) is None
+
+    def fail(url):
+        raise requests.HTTPError('503 Server Error')
+
+    monkeypatch.setattr(extractor, 'fetch_html', fail)
+    with pytest.raises(requests.HTTPError):
+        extractor.fetch_listing(CATEGORY_URL)
@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from change_rate_scheduler import ChangeRateScheduler, allocate_frequencies, estimate_change_rate
+
+
+def test_prior_without_observations_is_about_once_a_day():
+    rate = estimate_change_rate([])
+    assert 1 / 48 < rate < 1 / 12
+
+
+def test_rate_grows_with_observed_changes():
+    rarely = estimate_change_rate([(6.0, False)] * 20)
+    sometimes = estimate_change_rate([(6.0, i % 2 == 0) for i in range(20)])
+    always = estimate_change_rate([(6.0, True)] * 20)
+    assert rarely < sometimes < always
+
+
+def test_rate_ignores_non_positive_intervals():
+    assert estimate_change_rate([(0.0, True), (-1.0, True)]) == pytest.approx(estimate_change_rate([]))
+
+
+def test_allocation_spends_budget_within_bounds():
+    rates = {'mac': 1.0, 'ipad': 0.1, 'airpods': 0.001}
+    intervals = allocate_frequencies(rates, {}, requests_per_day=30,
+                                     min_interval_hours=1, max_interval_hours=48)
+
+    assert sum(24 / hours for hours in intervals.values()) == pytest.approx(30, rel=1e-3)
+    assert all(1 - 1e-9 <= hours <= 48 + 1e-9 for hours in intervals.values())
+    assert intervals['mac'] < intervals['airpods']
+
+
+def test_allocation_favours_heavier_categories():
+    rates = {'mac': 0.1, 'ipad': 0.1}
+    intervals = allocate_frequencies(rates, {'mac': 50, 'ipad': 1}, requests_per_day=20)
+    assert intervals['mac'] < intervals['ipad']
+
+
+@pytest.mark.parametrize('requests_per_day, expected', [(1000, 1.0), (1, 48.0)])
+def test_allocation_clamps_when_budget_is_out_of_range(requests_per_day, expected):
+    intervals = allocate_frequencies({'mac': 0.5, 'ipad': 0.01}, {}, requests_per_day,
+                                     min_interval_hours=1, max_interval_hours=48)
+    assert intervals == {'mac': expected, 'ipad': expected}
+
+
+def test_scheduler_records_checks_and_reports_due_categories(tmp_path):
+    scheduler = ChangeRateScheduler(categories=['mac', 'ipad'], state_path=str(tmp_path / 'rates.json'),
+                                    history_dir=str(tmp_path / 'history'))
+    start = datetime(2025, 6, 14, 9, 0)
+    assert set(scheduler.due_categories(start)) == {'mac', 'ipad'}
+
+    scheduler.record_check('mac', True, start)
+    scheduler.record_check('mac', True, start + timedelta(hours=2))
+    assert scheduler.state['mac']['observations'] == [[2.0, True]]
+    assert scheduler.due_categories(start + timedelta(hours=2)) == ['ipad']
+
+    reloaded = ChangeRateScheduler(categories=['mac', 'ipad'], state_path=str(tmp_path / 'rates.json'),
+                                   history_dir=str(tmp_path / 'history'))
+    assert reloaded.change_rate('mac') > reloaded.change_rate('ipad')
+
+
+def test_failed_category_backs_off_until_next_success(tmp_path):
+    scheduler = ChangeRateScheduler(categories=['mac', 'ipad'], state_path=str(tmp_path / 'rates.json'),
+                                    history_dir=str(tmp_path / 'history'), min_interval_hours=1)
+    start = datetime(2025, 6, 14, 9, 0)
+    scheduler.record_check('ipad', False, start)
+
+    assert scheduler.record_failure('mac', start) == 1
+    assert scheduler.record_failure('mac', start) == 2
+    assert 'mac' not in scheduler.due_categories(start + timedelta(hours=1))
+    assert scheduler.due_categories(start + timedelta(hours=2))[0] == 'mac'
+
+    scheduler.record_check('mac', True, start + timedelta(hours=2))
+    assert 'retry_at' not in scheduler.state['mac']
+    assert scheduler.record_failure('mac', start + timedelta(hours=3)) == 1
@@ -0,0 +1,45 @@
+from circuit_breaker import STATE_CLOSED, STATE_HALF_OPEN, STATE_OPEN, BreakerRegistry, CircuitBreaker
+
+
+def test_opens_after_threshold_and_recovers_after_probe():
+    breaker = CircuitBreaker('category:mac', failure_threshold=2, recovery_timeout=0)
+    breaker.record_failure('timeout')
+    assert breaker.state == STATE_CLOSED
+    breaker.record_failure('timeout')
+    assert breaker.state == STATE_OPEN
+
+    assert breaker.allow()
+    assert breaker.state == STATE_HALF_OPEN
+    breaker.record_success()
+    assert breaker.state == STATE_CLOSED
+    assert breaker.allow()
+
+
+def test_open_breaker_rejects_until_recovery():
+    breaker = CircuitBreaker('category:mac', failure_threshold=1, recovery_timeout=60)
+    breaker.record_failure('timeout')
+    assert not breaker.allow()
+    assert breaker.get_status()['rejected'] == 1
+
+
+def test_failed_probe_doubles_recovery_timeout():
+    breaker = CircuitBreaker('category:mac', failure_threshold=1, recovery_timeout=10)
+    breaker.record_failure('timeout')
+    breaker.opened_at -= 10
+
+    assert breaker.allow()
+    breaker.record_failure('timeout')
+    assert breaker.state == STATE_OPEN
+    assert breaker.recovery_timeout == 20
+
+
+def test_host_breaker_needs_distinct_urls():
+    registry = BreakerRegistry(host_threshold=2, recovery_timeout=60)
+    breaker = registry.host('https://www.apple.com/a')
+    breaker.record_failure('500', source='https://www.apple.com/a')
+    breaker.record_failure('500', source='https://www.apple.com/a')
+    assert breaker.state == STATE_CLOSED
+
+    breaker.record_failure('500', source='https://www.apple.com/b')
+    assert breaker.state == STATE_OPEN
+    assert registry.host('https://www.apple.com/c') is breaker
@@ -0,0 +1,29 @@
+import pytest
+
+from crawl_governor import HostRateGovernor
+
+
+def test_requests_to_one_host_are_spaced_out():
+    governor = HostRateGovernor(rate_per_second=2, burst=1)
+    waits = [governor.reserve('https://www.apple.com/tw/shop/product/1') for _ in range(3)]
+
+    assert waits[0] == 0
+    assert waits[1] == pytest.approx(0.5, abs=0.05)
+    assert waits[2] == pytest.approx(1.0, abs=0.05)
+
+
+def test_hosts_have_separate_buckets():
+    governor = HostRateGovernor(rate_per_second=1, burst=1)
+    assert governor.reserve('https://www.apple.com/a') == 0
+    assert governor.reserve('https://store.storeimages.cdn-apple.com/b') == 0
+    assert governor.get_stats()['www.apple.com']['requests'] == 1
+
+
+def test_burst_and_host_rates():
+    governor = HostRateGovernor(rate_per_second=1, burst=3, host_rates={'slow.example': 0.1})
+    assert [governor.reserve('https://fast.example/') for _ in range(3)] == [0, 0, 0]
+    assert governor.reserve('https://fast.example/') > 0
+
+    for _ in range(3):
+        governor.reserve('https://slow.example/')
+    assert governor.reserve('https://slow.example/') == pytest.approx(10, abs=0.1)
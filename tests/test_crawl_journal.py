@@ -0,0 +1,47 @@
+import json
+from datetime import datetime, timedelta
+
+from crawl_journal import CrawlJournal
+
+URL = 'https://www.apple.com/tw/shop/product/FMFJ3TA/A/x?fnode=1'
+NORMALIZED = 'https://www.apple.com/tw/shop/product/FMFJ3TA/A/x'
+
+
+def test_recovers_completed_entries_after_interrupted_write(tmp_path):
+    journal = CrawlJournal('mac', journal_dir=str(tmp_path), fsync=False)
+    journal.record(URL, '第一版')
+    journal.record(URL.replace('fnode=1', 'fnode=2'), '第二版')
+    journal.close()
+    # 模擬寫到一半被中斷的最後一行
+    with open(journal.path, 'a', encoding='utf-8') as f:
+        f.write('{"url": "https://www.apple.com/tw/shop/product/F')
+
+    recovered = CrawlJournal('mac', journal_dir=str(tmp_path)).load()
+    assert list(recovered) == [NORMALIZED]
+    assert recovered[NORMALIZED]['overview'] == '第二版'
+
+    # 新紀錄不會與寫到一半的行黏在一起
+    resumed = CrawlJournal('mac', journal_dir=str(tmp_path), fsync=False)
+    resumed.record('https://www.apple.com/tw/shop/product/FMXY3TA/A/y', '新產品')
+    resumed.close()
+    assert len(CrawlJournal('mac', journal_dir=str(tmp_path)).load()) == 2
+
+
+def test_expired_entries_are_ignored(tmp_path):
+    journal = CrawlJournal('mac', journal_dir=str(tmp_path), max_age_hours=1)
+    (tmp_path / 'mac.jsonl').write_text(json.dumps({
+        'url': URL, 'overview': '過期', 'completed_at': (datetime.now() - timedelta(hours=2)).isoformat()
+    }) + '\n', encoding='utf-8')
+    assert journal.load() == {}
+
+
+def test_namespaces_do_not_share_entries(tmp_path):
+    http = CrawlJournal('mac', 'http_overview', journal_dir=str(tmp_path), fsync=False)
+    http.record(URL, '800 字上限的概覽')
+    http.close()
+
+    assert CrawlJournal('mac', 'browser_overview', journal_dir=str(tmp_path)).load() == {}
+    assert NORMALIZED in CrawlJournal('mac', 'http_overview', journal_dir=str(tmp_path)).load()
+
+    http.clear()
+    assert CrawlJournal('mac', 'http_overview', journal_dir=str(tmp_path)).load() == {}
@@ -0,0 +1,115 @@
+import time
+
+import pytest
+
+from crawl_queue import CrawlQueue, STATUS_DONE, STATUS_FAILED, STATUS_LEASED, STATUS_PENDING
+
+JOB = 'overview:mac'
+
+
+@pytest.fixture
+def make_queue(tmp_path):
+    queues = []
+
+    def make(**kwargs):
+        queue = CrawlQueue(str(tmp_path / 'queue.sqlite'), **kwargs)
+        queues.append(queue)
+        return queue
+
+    yield make
+    for queue in queues:
+        queue.close()
+
+
+def test_enqueue_ignores_existing_urls(make_queue):
+    queue = make_queue()
+    assert queue.enqueue(JOB, [('mac', 'https://a/1'), ('mac', 'https://a/2')]) == 2
+    assert queue.enqueue(JOB, [('mac', 'https://a/2'), ('mac', 'https://a/3')]) == 1
+    assert queue.counts(JOB)[STATUS_PENDING] == 3
+
+
+def test_lease_hands_out_each_url_once(make_queue):
+    queue = make_queue()
+    queue.enqueue(JOB, [('mac', 'https://a/1'), ('mac', 'https://a/2')])
+
+    first = queue.lease(JOB, 'w1')
+    second = queue.lease(JOB, 'w2')
+    assert {first['url'], second['url']} == {'https://a/1', 'https://a/2'}
+    assert first['attempts'] == 1
+    assert queue.lease(JOB, 'w3') is None
+    assert queue.counts(JOB)[STATUS_LEASED] == 2
+
+
+def test_complete_and_results(make_queue):
+    queue = make_queue()
+    queue.enqueue(JOB, [('mac', 'https://a/1')])
+    task = queue.lease(JOB, 'w1')
+
+    assert queue.complete(task['id'], 'w1', {'overview': '產品概覽'})
+    assert queue.is_finished(JOB)
+    assert queue.results(JOB) == {'https://a/1': {'overview': '產品概覽'}}
+
+
+def test_fail_requeues_until_max_attempts(make_queue):
+    queue = make_queue(max_attempts=2)
+    queue.enqueue(JOB, [('mac', 'https://a/1')])
+
+    task = queue.lease(JOB, 'w1')
+    queue.fail(task['id'], 'w1', 'timeout')
+    assert queue.counts(JOB)[STATUS_PENDING] == 1
+
+    task = queue.lease(JOB, 'w1')
+    assert task['attempts'] == 2
+    queue.fail(task['id'], 'w1', 'timeout')
+    assert queue.counts(JOB)[STATUS_FAILED] == 1
+    assert queue.lease(JOB, 'w1') is None
+    assert queue.results(JOB) == {'https://a/1': None}
+
+
+def test_expired_lease_is_requeued_and_old_owner_loses_it(make_queue):
+    queue = make_queue(lease_seconds=0)
+    queue.enqueue(JOB, [('mac', 'https://a/1')])
+    stale = queue.lease(JOB, 'w1')
+    time.sleep(0.01)
+
+    assert not queue.is_finished(JOB)
+    fresh = queue.lease(JOB, 'w2')
+    assert fresh['id'] == stale['id']
+    assert fresh['attempts'] == 2
+
+    assert not queue.complete(stale['id'], 'w1', 'stale')
+    queue.fail(stale['id'], 'w1', 'stale')
+    assert queue.counts(JOB)[STATUS_LEASED] == 1
+
+    queue.lease_seconds = 60
+    assert queue.complete(fresh['id'], 'w2', 'fresh')
+    assert queue.counts(JOB)[STATUS_DONE] == 1
+
+
+def test_expired_lease_at_max_attempts_is_failed(make_queue):
+    queue = make_queue(lease_seconds=0, max_attempts=1)
+    queue.enqueue(JOB, [('mac', 'https://a/1')])
+    queue.lease(JOB, 'w1')
+    time.sleep(0.01)
+
+    assert queue.is_finished(JOB)
+    assert queue.counts(JOB)[STATUS_FAILED] == 1
+
+
+def test_lease_prefers_fewer_attempts(make_queue):
+    queue = make_queue()
+    queue.enqueue(JOB, [('mac', 'https://a/1'), ('mac', 'https://a/2')])
+    task = queue.lease(JOB, 'w1')
+    queue.fail(task['id'], 'w1', 'timeout')
+
+    assert queue.lease(JOB, 'w1')['url'] == 'https://a/2'
+
+
+def test_jobs_are_independent(make_queue):
+    queue = make_queue()
+    queue.enqueue(JOB, [('mac', 'https://a/1')])
+    queue.enqueue('overview:ipad', [('ipad', 'https://a/1')])
+
+    queue.clear(JOB)
+    assert queue.lease(JOB, 'w1') is None
+    assert queue.lease('overview:ipad', 'w1')['category'] == 'ipad'
@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('playwright')
+pytest.importorskip('requests')
+pytest.importorskip('bs4')
+
+import enhanced_apple_scraper
+from enhanced_apple_scraper import EnhancedAppleScraper
+
+
+class FakePool:
+    def __init__(self, max_contexts=4):
+        self.max_contexts = max_contexts
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+def test_run_pool_does_not_share_pools_between_concurrent_runs(monkeypatch):
+    monkeypatch.setattr(enhanced_apple_scraper, 'BrowserPool', FakePool)
+    scraper = EnhancedAppleScraper()
+    seen = {}
+
+    async def run(name):
+        async with scraper.run_pool() as pool:
+            # 巢狀呼叫沿用外層的池
+            async with scraper.run_pool() as nested:
+                assert nested is pool
+            await asyncio.sleep(0.01 if name == 'slow' else 0)
+            seen[name] = pool
+            assert not pool.closed
+
+    async def main():
+        await asyncio.gather(run('fast'), run('slow'))
+
+    asyncio.run(main())
+    assert seen['fast'] is not seen['slow']
+    assert seen['fast'].closed and seen['slow'].closed
+    assert scraper.browser_pool is None
+
+
+def test_run_pool_uses_provided_pool_without_closing_it(monkeypatch):
+    shared = FakePool()
+    scraper = EnhancedAppleScraper(browser_pool=shared)
+
+    async def main():
+        async with scraper.run_pool() as pool:
+            assert pool is shared
+
+    asyncio.run(main())
+    assert not shared.closed
@@ -0,0 +1,45 @@
+import pytest
+
+pytest.importorskip('bs4')
+
+from html_parser_backend import available_backends, default_backend, parse_document
+
+HTML = '''
+<html><body>
+  <div class="rc-pdsection-mainpanel">
+    <h2>概覽</h2>
+    <ul><li>8GB 統一記憶體</li><li>  </li><li>256GB SSD</li></ul>
+  </div>
+  <div class="rc-pdsection-mainpanel"><p>最初於 2023 年 1 月推出</p></div>
+</body></html>
+'''
+
+
+@pytest.mark.parametrize('backend', available_backends())
+def test_backends_select_and_extract_the_same_text(backend):
+    document = parse_document(HTML, backend)
+    elements = document.select('.rc-pdsection-mainpanel')
+
+    assert len(elements) == 2
+    assert elements[0].get_text(strip=True, separator='\n') == '概覽\n8GB 統一記憶體\n256GB SSD'
+    assert elements[1].get_text(strip=True) == '最初於 2023 年 1 月推出'
+    assert document.select('.pd-overview') == []
+
+
+def test_backends_accept_bytes():
+    for backend in available_backends():
+        document = parse_document(HTML.encode('utf-8'), backend)
+        assert document.select('p')[0].get_text() == '最初於 2023 年 1 月推出'
+
+
+def test_default_backend_prefers_fastest_and_honours_environment(monkeypatch):
+    monkeypatch.delenv('HTML_PARSER_BACKEND', raising=False)
+    assert default_backend() == available_backends()[0]
+
+    monkeypatch.setenv('HTML_PARSER_BACKEND', 'html.parser')
+    assert parse_document(HTML).backend == 'html.parser'
+
+
+def test_unknown_backend_raises():
+    with pytest.raises(ValueError):
+        parse_document(HTML, 'regex')
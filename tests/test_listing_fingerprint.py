@@ -0,0 +1,50 @@
+from listing_fingerprint import STAGE_FIRESTORE, ListingFingerprintStore, listing_fingerprint
+
+PRODUCTS = [
+    {'產品URL': 'https://www.apple.com/tw/shop/product/FMFJ3TA/A/a?fnode=1', '產品售價': 'NT$29,900'},
+    {'產品URL': 'https://www.apple.com/tw/shop/product/FMFK3TA/A/b?fnode=2', '產品售價': 'NT$35,900'},
+]
+
+
+def test_fingerprint_ignores_order_and_tracking_parameters():
+    shuffled = [dict(PRODUCTS[1], 產品URL=PRODUCTS[1]['產品URL'].replace('fnode=2', 'fnode=9')), PRODUCTS[0]]
+    assert listing_fingerprint(shuffled) == listing_fingerprint(PRODUCTS)
+
+
+def test_fingerprint_changes_with_price():
+    changed = [PRODUCTS[0], dict(PRODUCTS[1], 產品售價='NT$33,900')]
+    assert listing_fingerprint(changed) != listing_fingerprint(PRODUCTS)
+
+
+def test_store_persists_stages_and_pending(tmp_path):
+    path = str(tmp_path / 'fingerprints.json')
+    fingerprint = listing_fingerprint(PRODUCTS)
+    store = ListingFingerprintStore(path)
+    store.record('mac', fingerprint, len(PRODUCTS), pending=['FMFK3TA/A'])
+
+    reloaded = ListingFingerprintStore(path)
+    assert reloaded.unchanged('mac', fingerprint)
+    assert not reloaded.unchanged('mac', fingerprint, stage=STAGE_FIRESTORE)
+    assert reloaded.pending('mac') == ['FMFK3TA/A']
+
+    reloaded.invalidate('mac')
+    assert reloaded.get('mac') is None
+
+
+def test_stores_sharing_a_file_keep_each_others_stages(tmp_path):
+    path = str(tmp_path / 'fingerprints.json')
+    scraper = ListingFingerprintStore(path)
+    backup = ListingFingerprintStore(path)
+
+    scraper.record('mac', 'files-fingerprint', 2, pending=['FMFK3TA/A'])
+    backup.record('mac', 'firestore-fingerprint', 2, stage=STAGE_FIRESTORE)
+
+    reloaded = ListingFingerprintStore(path)
+    assert reloaded.get('mac') == 'files-fingerprint'
+    assert reloaded.pending('mac') == ['FMFK3TA/A']
+    assert reloaded.get('mac', STAGE_FIRESTORE) == 'firestore-fingerprint'
+
+    backup.invalidate('mac', STAGE_FIRESTORE)
+    reloaded = ListingFingerprintStore(path)
+    assert reloaded.get('mac') == 'files-fingerprint'
+    assert reloaded.get('mac', STAGE_FIRESTORE) is None
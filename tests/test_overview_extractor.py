@@ -0,0 +1,73 @@
+import json
+
+from overview_extractor import (BASIC_UNWANTED_PATTERNS, OVERVIEW_SELECTORS, OVERVIEW_UNWANTED_PATTERNS,
+                                PRODUCTION_UNWANTED_PATTERNS, OverviewExtractor, SelectorStats)
+
+# Mac mini (FMFJ3TA/A) 產品頁概覽區域以 get_text(separator='\n') 取得的原始文字
+RAW_OVERVIEW = (
+    "最初於 2023 年 1 月推出\n8GB 統一記憶體\n256GB SSD 1\n兩個 Thunderbolt 4 埠\nGigabit 乙太網路埠\n\n\n"
+    "合格產品，絕佳的價格\n銷售前\n嚴謹的\n整修程序\n享有 Apple 的一年\n有限保固\n這會在新視窗開啟。\n"
+    "受 Apple 的 14 天\n退貨政策\n這會在新視窗開啟。\n保障\n可另外\n選擇 AppleCare+ 加強保障\n\n加入購物車\n"
+)
+SPEC_PREFIX = "最初於 2023 年 1 月推出 8GB 統一記憶體 256GB SSD 1 兩個 Thunderbolt 4 埠 Gigabit 乙太網路埠"
+WARRANTY = "合格產品，絕佳的價格 銷售前 嚴謹的 整修程序 享有 Apple 的一年 有限保固"
+
+
+def _extractor(tmp_path, **kwargs):
+    return OverviewExtractor(SelectorStats(str(tmp_path / 'stats.json')), **kwargs)
+
+
+def test_each_updater_keeps_its_own_cleaning_rules(tmp_path):
+    links = "這會在新視窗開啟。 受 Apple 的 14 天 退貨政策 這會在新視窗開啟。 保障 可另外"
+    # 與 data/simple_overview_test_result.json 中同一產品的概覽相同
+    assert _extractor(tmp_path).clean(RAW_OVERVIEW) == f"{SPEC_PREFIX} {WARRANTY} {links}"
+    production = _extractor(tmp_path, max_length=800, unwanted_patterns=PRODUCTION_UNWANTED_PATTERNS)
+    assert production.clean(RAW_OVERVIEW) == f"{SPEC_PREFIX} {WARRANTY}"
+
+    # 列表爬蟲只套用基本規則，「瞭解更多」之後的規格不會被截掉
+    raw = "瞭解更多整修品\n" + RAW_OVERVIEW
+    basic = _extractor(tmp_path, unwanted_patterns=BASIC_UNWANTED_PATTERNS, filter_short_lines=False)
+    assert basic.clean(raw).startswith(f"瞭解更多整修品 {SPEC_PREFIX}")
+    assert _extractor(tmp_path).clean(raw) == ""
+
+
+def test_pattern_sets_only_extend_each_other():
+    assert OVERVIEW_UNWANTED_PATTERNS[:len(BASIC_UNWANTED_PATTERNS)] == BASIC_UNWANTED_PATTERNS
+    assert PRODUCTION_UNWANTED_PATTERNS[:len(OVERVIEW_UNWANTED_PATTERNS)] == OVERVIEW_UNWANTED_PATTERNS
+
+
+def test_clean_truncates_to_max_length(tmp_path):
+    assert _extractor(tmp_path, max_length=20).clean(RAW_OVERVIEW) == SPEC_PREFIX[:20] + "..."
+
+
+def test_selectors_ordered_by_hits_per_category(tmp_path):
+    stats = SelectorStats(str(tmp_path / 'stats.json'), save_every=100)
+    assert stats.ordered('overview', 'mac', OVERVIEW_SELECTORS) == OVERVIEW_SELECTORS
+
+    stats.record('overview', 'mac', '.rf-pdp-overview')
+    stats.record('overview', 'mac', '.rf-pdp-overview')
+    stats.record('overview', 'mac', '.pd-overview')
+    ordered = stats.ordered('overview', 'mac', OVERVIEW_SELECTORS)
+    assert ordered[:2] == ['.rf-pdp-overview', '.pd-overview']
+    # 沒有命中的選擇器維持預設順序
+    assert ordered[2:] == [s for s in OVERVIEW_SELECTORS if s not in ordered[:2]]
+    assert stats.ordered('overview', 'ipad', OVERVIEW_SELECTORS) == OVERVIEW_SELECTORS
+
+
+def test_save_merges_counts_from_other_processes(tmp_path):
+    path = str(tmp_path / 'stats.json')
+    first = SelectorStats(path, save_every=100)
+    second = SelectorStats(path, save_every=100)
+
+    first.record('overview', 'mac', '.pd-overview')
+    second.record('overview', 'mac', '.pd-overview')
+    second.record('specs', 'mac', '.tech-specs')
+    first.save()
+    second.save()
+    # 沒有新紀錄時不會覆寫檔案
+    first.save()
+
+    with open(path, encoding='utf-8') as f:
+        stored = json.load(f)
+    assert stored == {'overview': {'mac': {'.pd-overview': 2}}, 'specs': {'mac': {'.tech-specs': 1}}}
+    assert second.get_stats() == stored
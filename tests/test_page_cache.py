@@ -0,0 +1,40 @@
+from page_cache import PageCache, normalize_url
+
+URL = 'https://www.apple.com/tw/shop/product/FMFJ3TA/A/x?fnode=1'
+
+
+def test_normalize_url():
+    assert normalize_url('HTTPS://WWW.Apple.com/tw/shop/?fnode=1#top') == 'https://www.apple.com/tw/shop'
+    assert normalize_url('https://www.apple.com') == 'https://www.apple.com/'
+
+
+def test_store_and_conditional_headers(tmp_path):
+    cache = PageCache(str(tmp_path))
+    assert cache.conditional_headers(URL) == {}
+
+    cache.store(URL, '<html>產品</html>'.encode('utf-8'), {'ETag': '"v1"', 'Last-Modified': 'Sat, 14 Jun 2025 09:00:00 GMT'},
+                encoding='utf-8')
+    other_tracking = URL.replace('fnode=1', 'fnode=2')
+    assert cache.get_text(other_tracking) == '<html>產品</html>'
+    assert cache.conditional_headers(other_tracking) == {
+        'If-None-Match': '"v1"',
+        'If-Modified-Since': 'Sat, 14 Jun 2025 09:00:00 GMT'
+    }
+
+
+def test_missing_body_disables_revalidation(tmp_path):
+    cache = PageCache(str(tmp_path))
+    digest = cache.store(URL, b'<html></html>', {'ETag': '"v1"'})
+    (tmp_path / 'blobs' / digest[:2] / f'{digest}.html.gz').unlink()
+
+    assert cache.get(URL) is None
+    assert cache.conditional_headers(URL) == {}
+
+
+def test_index_survives_reload(tmp_path):
+    cache = PageCache(str(tmp_path))
+    cache.store(URL, b'<html></html>', {'ETag': '"v1"'})
+    cache.mark_validated(URL)
+    cache.save()
+
+    assert PageCache(str(tmp_path)).get(URL) == b'<html></html>'
@@ -0,0 +1,49 @@
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip('aiohttp')
+
+from parse_pipeline import FetchParsePipeline
+
+
+class FakeFetcher:
+    concurrency = 2
+
+    def __init__(self, pages, delay=0.0):
+        self.pages = pages
+        self.delay = delay
+
+    async def fetch(self, url):
+        await asyncio.sleep(self.delay)
+        page = self.pages[url]
+        if isinstance(page, Exception):
+            raise page
+        return page
+
+
+def test_results_and_failures_are_reported_per_url():
+    fetcher = FakeFetcher({'a': '1', 'b': '2', 'bad-page': 'x', 'down': ConnectionError('reset')})
+    pipeline = FetchParsePipeline(fetcher, int, max_workers=1, queue_size=1)
+    seen = []
+
+    results = asyncio.run(pipeline.run(['a', 'b', 'bad-page', 'down'],
+                                       on_result=lambda url, value: seen.append((url, value))))
+
+    assert results == {'a': 1, 'b': 2, 'bad-page': None, 'down': None}
+    assert sorted(seen) == [('a', 1), ('b', 2)]
+    stats = pipeline.get_stats()
+    assert (stats['fetched'], stats['parsed'], stats['parse_failed'], stats['fetch_failed']) == (3, 2, 1, 1)
+    assert stats['max_queue_depth'] <= 1
+
+
+def test_deadline_skips_remaining_urls():
+    fetcher = FakeFetcher({str(i): str(i) for i in range(6)}, delay=0.2)
+    pipeline = FetchParsePipeline(fetcher, int, max_workers=1)
+
+    results = asyncio.run(pipeline.run([str(i) for i in range(6)], deadline=time.monotonic() + 0.3))
+
+    # 第一批兩個網址在期限內完成，其餘的不會出現在結果中，留給下次執行
+    assert results == {'0': 0, '1': 1}
+    assert pipeline.stats['deadline_skipped'] == 4
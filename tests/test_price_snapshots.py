@@ -0,0 +1,40 @@
+from datetime import date, timedelta
+
+from price_snapshots import daily_snapshot_files, recent_snapshot_files
+
+
+def _touch(directory, *names):
+    for name in names:
+        (directory / name).write_text('{}', encoding='utf-8')
+
+
+def test_recent_files_filter_by_date_in_name(tmp_path):
+    today = date.today().isoformat()
+    old = (date.today() - timedelta(days=10)).isoformat()
+    _touch(tmp_path, f'price_tracking_{today}T120000.json', f'price_tracking_{today}.json',
+           f'price_tracking_{old}T080000.json', 'notes.json')
+
+    assert recent_snapshot_files(str(tmp_path)) == [
+        f'price_tracking_{old}T080000.json',
+        f'price_tracking_{today}.json',
+        f'price_tracking_{today}T120000.json',
+    ]
+    assert recent_snapshot_files(str(tmp_path), days=3) == [
+        f'price_tracking_{today}.json',
+        f'price_tracking_{today}T120000.json',
+    ]
+
+
+def test_daily_files_keep_last_snapshot_per_day(tmp_path):
+    today = date.today().isoformat()
+    yesterday = (date.today() - timedelta(days=1)).isoformat()
+    _touch(tmp_path, f'price_tracking_{yesterday}.json',
+           f'price_tracking_{today}T090000.json', f'price_tracking_{today}T180000.json',
+           f'price_tracking_{today}T130000.json')
+
+    assert daily_snapshot_files(str(tmp_path)) == [
+        f'price_tracking_{yesterday}.json',
+        f'price_tracking_{today}T180000.json',
+    ]
+    assert daily_snapshot_files(str(tmp_path), days=1) == [f'price_tracking_{today}T180000.json']
+    assert daily_snapshot_files(str(tmp_path / 'missing')) == []
@@ -0,0 +1,42 @@
+from dom_batch_extractor import extract_part_number
+from product_key import canonical_url, history_product_id, product_id, product_key
+
+URL = 'https://www.apple.com/tw/shop/product/FMFJ3TA/A/翻新-macbook-air?fnode=abc123'
+
+
+def test_extract_part_number():
+    assert extract_part_number(URL) == 'FMFJ3TA/A'
+    assert extract_part_number('https://www.apple.com/tw/shop/refurbished/mac') is None
+    assert extract_part_number('') is None
+    assert extract_part_number(None) is None
+
+
+def test_canonical_url_strips_tracking_parameters():
+    assert canonical_url('https://WWW.Apple.com/tw/shop/buy-mac/?fnode=1#top') == \
+        'https://www.apple.com/tw/shop/buy-mac'
+    assert canonical_url('') == ''
+
+
+def test_product_key_prefers_part_number():
+    assert product_key({'產品URL': URL}) == 'FMFJ3TA/A'
+    assert product_key({'url': URL.replace('abc123', 'other')}) == 'FMFJ3TA/A'
+    assert product_key('https://www.apple.com/tw/shop/mac?fnode=1') == 'https://www.apple.com/tw/shop/mac'
+
+
+def test_product_id_is_a_valid_document_id():
+    assert product_id({'產品URL': URL}, 'mac') == 'mac_FMFJ3TA-A'
+    assert product_id({'url': URL, 'category': 'ipad'}) == 'ipad_FMFJ3TA-A'
+
+
+def test_product_id_without_part_number():
+    by_url = product_id({'產品URL': 'https://www.apple.com/tw/shop/mac?fnode=1'}, 'mac')
+    assert by_url == product_id({'產品URL': 'https://www.apple.com/tw/shop/mac?fnode=2'}, 'mac')
+    assert '/' not in by_url
+
+    by_title = product_id({'產品標題': 'MacBook Air (整修品) NT$29,900'}, 'mac')
+    assert by_title == product_id({'產品標題': 'MacBook Air NT$31,900'}, 'mac')
+
+
+def test_history_product_id_maps_legacy_entries_with_url():
+    assert history_product_id({'url': URL, 'category': 'mac', 'product_id': 'mac_0123456789ab'}) == 'mac_FMFJ3TA-A'
+    assert history_product_id({'product_id': 'mac_0123456789ab'}) == 'mac_0123456789ab'
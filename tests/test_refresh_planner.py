@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+
+from product_key import product_key
+from refresh_planner import RefreshPlanner
+from refresh_state import OverviewRefreshState
+
+
+def _product(number: str, price: str = 'NT$29,900') -> dict:
+    return {'產品標題': f'MacBook {number}', '產品售價': price,
+            '產品URL': f'https://www.apple.com/tw/shop/product/{number}/A/x'}
+
+
+def _age(state: OverviewRefreshState, category: str, product: dict, days: float):
+    fetched_at = datetime.now() - timedelta(days=days)
+    state.state[category][product_key(product)]['fetched_at'] = fetched_at.isoformat()
+
+
+def test_plan_orders_by_value_and_skips_fresh_pages(tmp_path):
+    state = OverviewRefreshState(path=str(tmp_path / 'state.json'))
+    fresh, repriced, stale = _product('F1'), _product('F2'), _product('F3')
+    for product in (fresh, repriced, stale):
+        state.mark_fetched('mac', product)
+    _age(state, 'mac', repriced, 2)
+    _age(state, 'mac', stale, 40)
+
+    products = [fresh, dict(repriced, 產品售價='NT$27,900'), stale, _product('F4')]
+    planner = RefreshPlanner(state, path=str(tmp_path / 'planner.json'))
+    assert planner.plan({'mac': products}) == [('mac', [3, 1, 2])]
+
+
+def test_plan_prefers_categories_with_demand(tmp_path):
+    state = OverviewRefreshState(path=str(tmp_path / 'state.json'))
+    planner = RefreshPlanner(state, category_demand={'ipad': 5, 'mac': 1}, path=str(tmp_path / 'planner.json'))
+
+    plan = planner.plan({'mac': [_product('M1')], 'ipad': [_product('I1')]})
+    assert [category for category, _ in plan] == ['ipad', 'mac']
+
+
+def test_plan_is_capped_by_measured_throughput(tmp_path):
+    state = OverviewRefreshState(path=str(tmp_path / 'state.json'))
+    planner = RefreshPlanner(state, path=str(tmp_path / 'planner.json'), reserve_seconds=0)
+    planner.record_throughput(pages=10, seconds=20)
+    planner.start(budget_seconds=7)
+
+    plan = planner.plan({'mac': [_product(f'M{i}') for i in range(10)]})
+    assert sum(len(indexes) for _, indexes in plan) == 3
+    assert RefreshPlanner(state, path=str(tmp_path / 'planner.json')).seconds_per_page == 2
@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta
+
+from refresh_state import OverviewRefreshState
+
+PRODUCT = {'產品標題': 'MacBook Air', '產品售價': 'NT$29,900',
+           '產品URL': 'https://www.apple.com/tw/shop/product/FMFJ3TA/A/x?fnode=1'}
+
+
+def test_refresh_reasons(tmp_path):
+    state = OverviewRefreshState(path=str(tmp_path / 'state.json'), ttl_hours=24, max_age_days=30)
+    now = datetime.now()
+    assert state.refresh_reason('mac', PRODUCT, now) == 'new'
+
+    state.mark_fetched('mac', PRODUCT)
+    repriced = dict(PRODUCT, 產品售價='NT$27,900')
+    assert state.refresh_reason('mac', PRODUCT, now) is None
+    assert state.refresh_reason('mac', repriced, now) is None
+
+    later = now + timedelta(days=2)
+    assert state.refresh_reason('mac', PRODUCT, later) is None
+    assert state.refresh_reason('mac', repriced, later) == 'changed'
+    assert state.refresh_reason('mac', PRODUCT, now + timedelta(days=31)) == 'stale'
+
+
+def test_tracking_parameters_do_not_count_as_changes(tmp_path):
+    state = OverviewRefreshState(path=str(tmp_path / 'state.json'), ttl_hours=0)
+    state.mark_fetched('mac', PRODUCT)
+    retracked = dict(PRODUCT, 產品URL=PRODUCT['產品URL'].replace('fnode=1', 'fnode=2'))
+    assert state.refresh_reason('mac', retracked) is None
+
+
+def test_plan_puts_new_products_first_and_applies_limit(tmp_path):
+    state = OverviewRefreshState(path=str(tmp_path / 'state.json'), ttl_hours=0)
+    state.mark_fetched('mac', PRODUCT)
+    new_product = dict(PRODUCT, 產品URL='https://www.apple.com/tw/shop/product/FMFK3TA/A/y')
+    products = [dict(PRODUCT, 產品售價='NT$27,900'), {'產品標題': '沒有網址'}, new_product]
+
+    assert state.plan('mac', products) == [(2, 'new'), (0, 'changed')]
+    assert state.plan('mac', products, limit=1) == [(2, 'new')]
+
+
+def test_state_is_only_persisted_by_save(tmp_path):
+    path = str(tmp_path / 'state.json')
+    state = OverviewRefreshState(path=path)
+    state.mark_fetched('mac', PRODUCT)
+    assert OverviewRefreshState(path=path).refresh_reason('mac', PRODUCT) == 'new'
+
+    state.save()
+    assert OverviewRefreshState(path=path).refresh_reason('mac', PRODUCT) is None
@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+from result_writer import StreamingResultWriter, write_json_atomic, write_json_records
+
+PRODUCTS = [
+    {'序號': 1, '產品標題': 'Mac mini', '產品售價': 'NT$10,390', '規格': {'記憶體': '8GB'}},
+    {'序號': 2, '產品標題': 'MacBook Air', '產品售價': 'NT$24,490', '規格': {}}
+]
+
+
+@pytest.mark.parametrize('records', [PRODUCTS, []])
+def test_records_match_json_dump(tmp_path, records):
+    path = tmp_path / 'data' / 'products.json'
+    assert write_json_records(str(path), iter(records)) == len(records)
+    assert path.read_text(encoding='utf-8') == json.dumps(records, ensure_ascii=False, indent=2)
+    assert [p.name for p in path.parent.iterdir()] == ['products.json']
+
+
+def test_failed_write_keeps_original_file(tmp_path):
+    path = tmp_path / 'products.json'
+    write_json_atomic(str(path), PRODUCTS)
+
+    def broken():
+        yield PRODUCTS[0]
+        raise RuntimeError('爬取中斷')
+
+    with pytest.raises(RuntimeError):
+        write_json_records(str(path), broken())
+    assert json.loads(path.read_text(encoding='utf-8')) == PRODUCTS
+    assert [p.name for p in tmp_path.iterdir()] == ['products.json']
+
+
+def test_streaming_writer_commits_only_on_success(tmp_path):
+    path = tmp_path / 'apple_refurbished_mac.json'
+    write_json_atomic(str(path), [{'序號': 0}])
+
+    with pytest.raises(ValueError):
+        with StreamingResultWriter(str(path)) as writer:
+            writer.write(PRODUCTS[0])
+            raise ValueError('中斷')
+    assert json.loads(path.read_text(encoding='utf-8')) == [{'序號': 0}]
+    assert not (tmp_path / 'apple_refurbished_mac.json.partial.jsonl').exists()
+
+    with StreamingResultWriter(str(path)) as writer:
+        for product in PRODUCTS:
+            writer.write(product)
+    assert json.loads(path.read_text(encoding='utf-8')) == PRODUCTS
+    assert writer.count == 2
+    assert not (tmp_path / 'apple_refurbished_mac.json.partial.jsonl').exists()
+
+
+def test_write_before_open_raises(tmp_path):
+    with pytest.raises(RuntimeError):
+        StreamingResultWriter(str(tmp_path / 'x.json')).write({})
@@ -8,19 +8,47 @@
 import asyncio
 import json
 import os
-import re
 from datetime import datetime
-from playwright.async_api import async_playwright
 import logging
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+from browser_pool import BrowserPool
+from adaptive_controller import AdaptiveCrawlController, goto_with_backoff, resolve_controller
+from crawl_governor import HostRateGovernor
+from crawl_journal import CrawlJournal
+from request_blocking import ResourceBlocker
+from overview_extractor import OverviewExtractor
+from page_cache import normalize_url
+from refresh_state import OverviewRefreshState
+from result_writer import write_json_records
 
 # 設定日誌
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 與 HTTP 版概覽更新器（長度上限不同）分開記錄爬取日誌
+JOURNAL_NAMESPACE = 'browser_overview'
+
 class ProductOverviewUpdater:
-    def __init__(self):
-        """初始化概覽更新器"""
+    def __init__(self, browser_pool: Optional[BrowserPool] = None,
+                 governor: Optional[HostRateGovernor] = None,
+                 resource_blocker: Optional[ResourceBlocker] = None,
+                 controller: Optional[AdaptiveCrawlController] = None):
+        """
+        初始化概覽更新器
+        
+        Args:
+            browser_pool: 共用瀏覽器池，未提供時每次更新自行建立
+            governor: 主機速率控制器，未提供時使用所有爬蟲共用的控制器
+            resource_blocker: 請求攔截器，預設中止圖片、字型、影片與追蹤請求
+            controller: 自適應控制器，依伺服器回應調整速度；未提供時依 governor 建立或使用共用的控制器
+        """
+        self.browser_pool = browser_pool
+        self.controller = resolve_controller(controller, governor)
+        self.governor = self.controller.governor
+        self.resource_blocker = resource_blocker or ResourceBlocker()
+        self.overview_extractor = OverviewExtractor()
+        self.refresh_state = OverviewRefreshState()
+        
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
@@ -47,154 +75,27 @@ class ProductOverviewUpdater:
         )
         
         await context.set_geolocation({'latitude': 25.0330, 'longitude': 121.5654})
+        await self.resource_blocker.attach(context)
         return context
 
-    async def extract_detailed_overview(self, page, product_url: str) -> str:
+    async def extract_detailed_overview(self, page, product_url: str, category: Optional[str] = None) -> str:
         """從產品頁面提取詳細概覽"""
         try:
             logger.info(f"🔍 提取詳細概覽: {product_url}")
             
             # 訪問產品頁面
-            await page.goto(product_url, wait_until='networkidle', timeout=30000)
+            await goto_with_backoff(self.controller, page, product_url,
+                                    wait_until=self.resource_blocker.wait_until, timeout=30000)
+            # 等待頁面腳本完成渲染
             await asyncio.sleep(2)
             
-            # 嘗試多種選擇器來找到產品概覽區域
-            overview_selectors = [
-                '.rc-pdsection-mainpanel.column.large-9.small-12',
-                '.rc-pdsection-mainpanel',
-                '.pd-overview',
-                '.pd-highlights',
-                '[data-module-template="pd/overview"]',
-                '.pd-overview-content',
-                '.rf-pdp-overview',
-                '.rf-pdp-highlights',
-                '.rf-pdp-techspecs'
-            ]
-            
-            overview_text = ""
-            
-            for selector in overview_selectors:
-                try:
-                    elements = await page.query_selector_all(selector)
-                    if elements:
-                        logger.info(f"✅ 找到概覽區域: {selector}")
-                        
-                        for element in elements:
-                            # 提取文字內容
-                            text = await element.inner_text()
-                            if text and len(text.strip()) > 50:
-                                overview_text += text.strip() + "\n\n"
-                        
-                        if overview_text:
-                            break
-                            
-                except Exception as e:
-                    logger.debug(f"選擇器 {selector} 失敗: {e}")
-                    continue
-            
-            # 如果沒有找到概覽，嘗試提取產品特色和規格
-            if not overview_text:
-                logger.info("🔄 嘗試提取產品特色和規格...")
-                overview_text = await self.extract_product_features(page)
-            
-            # 清理和格式化文字
-            if overview_text:
-                overview_text = self.clean_overview_text(overview_text)
-                logger.info(f"✅ 成功提取概覽 ({len(overview_text)} 字元)")
-                return overview_text
-            else:
-                logger.warning("⚠️ 未能提取到詳細概覽")
-                return ""
+            # 依該類別學習到的順序嘗試概覽選擇器，找不到時改用特色和規格
+            return await self.overview_extractor.extract_from_page(page, category)
                 
         except Exception as e:
             logger.error(f"❌ 提取詳細概覽失敗: {e}")
             return ""
 
-    async def extract_product_features(self, page) -> str:
-        """提取產品特色和規格"""
-        features_text = ""
-        
-        # 嘗試多種特色和規格選擇器
-        feature_selectors = [
-            '.rf-pdp-techspecs',
-            '.pd-techspecs',
-            '.rf-pdp-highlights',
-            '.pd-highlights',
-            '.rf-pdp-overview-content',
-            '.pd-overview-content',
-            '[data-module-template="pd/techspecs"]',
-            '.rf-pdp-content',
-            '.pd-features',
-            '.product-features',
-            '.tech-specs',
-            '.product-highlights'
-        ]
-        
-        for selector in feature_selectors:
-            try:
-                elements = await page.query_selector_all(selector)
-                if elements:
-                    logger.info(f"✅ 找到特色區域: {selector}")
-                    
-                    for element in elements:
-                        text = await element.inner_text()
-                        if text and len(text.strip()) > 30:
-                            features_text += text.strip() + "\n\n"
-                    
-                    if features_text:
-                        break
-                        
-            except Exception as e:
-                logger.debug(f"特色選擇器 {selector} 失敗: {e}")
-                continue
-        
-        return features_text
-
-    def clean_overview_text(self, text: str) -> str:
-        """清理和格式化概覽文字"""
-        if not text:
-            return ""
-        
-        # 移除多餘的空白和換行
-        text = re.sub(r'\n\s*\n', '\n', text)
-        text = re.sub(r'\s+', ' ', text)
-        
-        # 移除不需要的內容
-        unwanted_patterns = [
-            r'加入購物車.*',
-            r'立即購買.*',
-            r'選擇.*',
-            r'Cookie.*',
-            r'隱私權.*',
-            r'使用條款.*',
-            r'©.*Apple.*',
-            r'台灣.*',
-            r'Apple Store.*',
-            r'購買.*',
-            r'比較.*',
-            r'瞭解更多.*'
-        ]
-        
-        for pattern in unwanted_patterns:
-            text = re.sub(pattern, '', text, flags=re.IGNORECASE)
-        
-        # 格式化文字，保留重要的換行
-        lines = text.split('\n')
-        formatted_lines = []
-        
-        for line in lines:
-            line = line.strip()
-            if line and len(line) > 5:  # 過濾太短的行
-                formatted_lines.append(line)
-        
-        # 重新組合，限制長度
-        formatted_text = '\n'.join(formatted_lines)
-        
-        if len(formatted_text) > 1000:
-            formatted_text = formatted_text[:1000] + "..."
-        
-        return formatted_text.strip()
-
     def load_existing_products(self, category: str) -> List[Dict]:
         """載入現有的產品資料"""
         filename = f'data/apple_refurbished_{category}.json'
@@ -214,83 +115,134 @@ class ProductOverviewUpdater:
             logger.error(f"❌ 載入產品資料失敗: {e}")
             return []
 
-    async def update_products_overview(self, category: str, limit: int = None) -> List[Dict]:
-        """更新產品的概覽欄位"""
+    async def update_products_overview(self, category: str, limit: int = None,
+                                       incremental: bool = False) -> Tuple[List[Dict], List[Dict]]:
+        """
+        更新產品的概覽欄位
+        
+        Args:
+            incremental: 只抓取新產品、列表資料有變動或過久未更新的產品，新產品優先
+        
+        Returns:
+            (完整的類別產品列表，未處理的產品保持原樣, 這次取得概覽的產品)；
+            取得概覽的產品交給 save_updated_products，寫回類別 JSON 後才記錄為已更新
+        """
         logger.info(f"🚀 開始更新 {category.upper()} 產品概覽...")
         
         # 載入現有產品
         products = self.load_existing_products(category)
         if not products:
-            return []
+            return [], []
         
-        # 限制處理數量
-        if limit:
-            products = products[:limit]
-            logger.info(f"🔢 限制處理 {limit} 個產品")
+        # 決定處理範圍
+        if incremental:
+            targets = [index for index, _ in self.refresh_state.plan(category, products, limit)]
+            if not targets:
+                logger.info("✅ 所有產品都在有效期限內，不需要更新")
+                return products, []
+        else:
+            targets = list(range(len(products)))
+            if limit:
+                targets = targets[:limit]
+                logger.info(f"🔢 限制處理 {limit} 個產品")
         
-        updated_products = []
+        self.resource_blocker.reset()
         
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(
-                headless=False,
-                args=[
-                    '--no-sandbox',
-                    '--disable-blink-features=AutomationControlled',
-                    '--disable-web-security'
-                ]
-            )
-            
-            context = await self.setup_browser_context(browser)
-            page = await context.new_page()
-            
-            try:
-                for i, product in enumerate(products, 1):
-                    try:
-                        logger.info(f"📦 處理產品 {i}/{len(products)}: {product.get('產品標題', '')[:50]}...")
-                        
-                        product_url = product.get('產品URL', '')
-                        if not product_url:
-                            logger.warning(f"⚠️ 產品 {i} 沒有 URL，跳過")
-                            updated_products.append(product)
-                            continue
+        refreshed = []
+        if self.browser_pool:
+            updated_products = await self._update_products_in_pool(self.browser_pool, products, targets, category,
+                                                                   refreshed)
+        else:
+            async with BrowserPool() as pool:
+                updated_products = await self._update_products_in_pool(pool, products, targets, category, refreshed)
+        
+        self.resource_blocker.log_report(f"{category.upper()} ")
+        self.controller.breakers.log_report()
+        self.overview_extractor.selector_stats.save()
+        logger.info(f"🎉 {category.upper()} 概覽更新完成，共處理 {len(targets)} 個產品")
+        return updated_products, refreshed
+
+    async def _update_products_in_pool(self, pool: BrowserPool, products: List[Dict], targets: List[int],
+                                       category: Optional[str] = None,
+                                       refreshed: Optional[List[Dict]] = None) -> List[Dict]:
+        """使用瀏覽器池逐一更新指定索引的產品概覽，每完成一個產品就寫入爬取日誌；取得概覽的產品附加到 refreshed"""
+        updated_products = list(products)
+        journal = CrawlJournal(category or 'default', JOURNAL_NAMESPACE)
+        # 上次中斷前已完成的產品直接使用日誌紀錄，不重新開啟頁面
+        recovered = journal.load()
+        # 持續失敗時略過剩餘產品，不再逐一等待逾時
+        breaker = self.controller.breakers.category(category) if category else None
+        
+        try:
+            for position, index in enumerate(targets, 1):
+                product = products[index]
+                try:
+                    logger.info(f"📦 處理產品 {position}/{len(targets)}: {product.get('產品標題', '')[:50]}...")
+                    
+                    product_url = product.get('產品URL', '')
+                    if not product_url:
+                        logger.warning(f"⚠️ 產品 {index + 1} 沒有 URL，跳過")
+                        continue
+                    
+                    entry = recovered.get(normalize_url(product_url))
+                    if entry:
+                        logger.info("🔁 使用爬取日誌中的紀錄")
+                        detailed_overview = entry['overview']
+                    else:
+                        if breaker and not breaker.allow():
+                            logger.warning(f"⛔ {category.upper()} 斷路器開啟，略過剩餘 {len(targets) - position + 1} 個產品")
+                            break
                         
                         # 提取詳細概覽
-                        detailed_overview = await self.extract_detailed_overview(page, product_url)
-                        
-                        # 更新產品資料
-                        updated_product = product.copy()
+                        async with pool.page(self.setup_browser_context, profile='overview') as page:
+                            detailed_overview = await self.extract_detailed_overview(page, product_url, category)
                         if detailed_overview:
-                            updated_product['產品概覽'] = detailed_overview
-                            logger.info(f"✅ 成功更新概覽 ({len(detailed_overview)} 字元)")
-                        else:
-                            logger.warning(f"⚠️ 未能提取概覽，保持原有標題")
-                            # 保持原有的產品標題作為概覽
-                        
-                        updated_products.append(updated_product)
-                        
-                        # 避免被封鎖
-                        await asyncio.sleep(3)
-                        
-                    except Exception as e:
-                        logger.error(f"❌ 處理產品 {i} 失敗: {e}")
-                        updated_products.append(product)  # 保持原有資料
-                        continue
-                
-            except Exception as e:
-                logger.error(f"❌ 更新過程中發生錯誤: {e}")
-            finally:
-                await page.close()
-                await context.close()
-                await browser.close()
+                            journal.record(product_url, detailed_overview)
+                        if breaker:
+                            if detailed_overview:
+                                breaker.record_success()
+                            else:
+                                breaker.record_failure(f"無法擷取 {product_url}")
+                    
+                    # 更新產品資料
+                    updated_product = product.copy()
+                    if detailed_overview:
+                        updated_product['產品概覽'] = detailed_overview
+                        logger.info(f"✅ 成功更新概覽 ({len(detailed_overview)} 字元)")
+                        if refreshed is not None:
+                            refreshed.append(updated_product)
+                    else:
+                        logger.warning(f"⚠️ 未能提取概覽，保持原有標題")
+                        # 保持原有的產品標題作為概覽
+                    
+                    updated_products[index] = updated_product
+                    
+                except Exception as e:
+                    logger.error(f"❌ 處理產品 {index + 1} 失敗: {e}")
+                    continue
+            
+        except Exception as e:
+            logger.error(f"❌ 更新過程中發生錯誤: {e}")
+        finally:
+            journal.close()
         
-        logger.info(f"🎉 {category.upper()} 概覽更新完成，共處理 {len(updated_products)} 個產品")
         return updated_products
 
-    def save_updated_products(self, products: List[Dict], category: str):
-        """儲存更新後的產品資料"""
+    def save_updated_products(self, products: List[Dict], category: str,
+                              refreshed: Optional[List[Dict]] = None) -> bool:
+        """
+        儲存更新後的產品資料
+        
+        Args:
+            refreshed: 這次取得概覽的產品，寫入成功後才記錄到增量更新狀態；
+                       寫入失敗時不記錄，下次增量更新會重新抓取
+        
+        Returns:
+            是否成功寫入
+        """
         if not products:
             logger.warning(f"⚠️ {category} 類別沒有產品資料可儲存")
-            return
+            return False
         
         try:
             # 備份原始檔案
@@ -302,9 +254,16 @@ class ProductOverviewUpdater:
                 shutil.copy2(original_filename, backup_filename)
                 logger.info(f"💾 原始檔案已備份到: {backup_filename}")
             
-            # 儲存更新後的資料
-            with open(original_filename, 'w', encoding='utf-8') as f:
-                json.dump(products, f, ensure_ascii=False, indent=2)
+            # 儲存更新後的資料，逐筆寫出後原子替換，中斷時不會留下寫到一半的 JSON
+            write_json_records(original_filename, products)
+            
+            # 結果已寫回類別 JSON，爬取日誌不再需要
+            CrawlJournal(category, JOURNAL_NAMESPACE).clear()
+            
+            for product in refreshed or []:
+                self.refresh_state.mark_fetched(category, product)
+            if refreshed:
+                self.refresh_state.save()
             
             logger.info(f"💾 {category.upper()} 更新後資料已儲存到 {original_filename}")
             logger.info(f"📊 共儲存 {len(products)} 個產品")
@@ -320,8 +279,11 @@ class ProductOverviewUpdater:
                 else:
                     logger.info(f"   概覽: {overview}")
             
+            return True
+            
         except Exception as e:
             logger.error(f"❌ 儲存更新後產品資料失敗: {e}")
+            return False
 
 async def main():
     """主程式"""
@@ -349,19 +311,21 @@ async def main():
         limit = input(f"\n請輸入要更新的產品數量 (預設全部，輸入數字限制數量): ").strip()
         limit = int(limit) if limit.isdigit() else None
         
+        incremental = input("是否只更新新產品與有變動的產品？(y/N): ").strip().lower() == 'y'
+        
         print(f"\n🚀 開始更新 {category.upper()} 類別的產品概覽...")
         if limit:
             print(f"🔢 限制更新 {limit} 個產品")
         
         # 執行更新
-        updated_products = await updater.update_products_overview(category, limit)
+        updated_products, refreshed = await updater.update_products_overview(category, limit, incremental)
         
         if updated_products:
             # 儲存結果
-            updater.save_updated_products(updated_products, category)
+            updater.save_updated_products(updated_products, category, refreshed)
             
             print(f"\n🎉 更新完成！")
-            print(f"📊 成功更新 {len(updated_products)} 個產品")
+            print(f"📊 共儲存 {len(updated_products)} 個產品")
             print(f"💾 資料已儲存，原始檔案已備份")
         else:
             print(f"\n❌ 未能更新任何產品資料")